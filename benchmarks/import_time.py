@@ -0,0 +1,52 @@
+"""
+Import time of the hyperbolic modules with the TorchScript functions compiled
+at import (HYPTORCH_JIT=eager, the previous behaviour), on first call (lazy,
+the default) or never (off), each in a fresh interpreter. `first call` is the
+time of a Poincaré ball expmap0 / dist right after the import, where the lazy
+mode pays for compiling what it uses.
+
+    python -m benchmarks.import_time --repeats 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODES = ['eager', 'lazy', 'off']
+
+MODULES = ['hyptorch.geoopt', 'hyptorch.lorentz.layers', 'hyptorch.poincare.layers']
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import torch
+torch_done = time.perf_counter()
+{imports}
+import_done = time.perf_counter()
+from hyptorch.geoopt import PoincareBall
+x = torch.randn(8, 16) * 0.1
+manifold = PoincareBall(c=1.0)
+manifold.dist(manifold.expmap0(x), x)
+print(torch_done - start, import_done - torch_done, time.perf_counter() - import_done)
+"""
+
+
+def measure(mode, modules):
+    env = dict(os.environ, HYPTORCH_JIT=mode)
+    script = SCRIPT.format(imports='\n'.join(f'import {module}' for module in modules))
+    out = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True)
+    return [float(value) for value in out.stdout.split()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"mode":>6} {"torch s":>8} {"import s":>9} {"first call s":>13}')
+    for mode in MODES:
+        runs = [measure(mode, args.modules) for _ in range(args.repeats)]
+        torch_s, import_s, first_s = (statistics.median(column) for column in zip(*runs))
+        print(f'{mode:>6} {torch_s:>8.3f} {import_s:>9.3f} {first_s:>13.3f}')
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of ITM hard-negative selection: the per-sample multinomial
+loop the models used against the batched `sample_negatives`, for one step
+(a negative image per text and a negative text per image).
+
+    python -m benchmarks.itm_negatives --batch_sizes 50 128 256 --device cuda
+"""
+import argparse
+import time
+
+import torch
+import torch.nn.functional as F
+
+from model.modules.negatives import sample_negatives
+
+
+def itm_weights(bs, device):
+    sims = torch.randn(bs, bs, device=device)
+    weights = F.softmax(sims, dim=1) + 1e-4
+    weights.masked_fill_(torch.eye(bs, dtype=torch.bool, device=device), 0)
+    return weights
+
+
+def loop_negatives(weights_t2i, weights_i2t, image_states, text_states):
+    bs = weights_t2i.shape[0]
+    image_embeds_neg = []
+    for b in range(bs):
+        neg_idx = torch.multinomial(weights_t2i[b], 1).item()
+        image_embeds_neg.append(image_states[neg_idx])
+    text_embeds_neg = []
+    for b in range(bs):
+        neg_idx = torch.multinomial(weights_i2t[b], 1).item()
+        text_embeds_neg.append(text_states[neg_idx])
+    return torch.stack(image_embeds_neg, dim=0), torch.stack(text_embeds_neg, dim=0)
+
+
+def batched_negatives(weights_t2i, weights_i2t, image_states, text_states, hard_topk=0):
+    return (
+        image_states[sample_negatives(weights_t2i, hard_topk)],
+        text_states[sample_negatives(weights_i2t, hard_topk)],
+    )
+
+
+def timeit(fn, repeats, device):
+    fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[50, 128, 256])
+    parser.add_argument('--seq_len', type=int, default=35)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--hard_topk', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    print(f'{"bs":>5} {"loop ms":>10} {"batched ms":>11} {"top-k ms":>9} {"speedup":>8}')
+    for bs in args.batch_sizes:
+        weights_t2i, weights_i2t = itm_weights(bs, device), itm_weights(bs, device)
+        image_states = torch.randn(bs, args.seq_len, args.dim, device=device)
+        text_states = torch.randn(bs, args.seq_len, args.dim, device=device)
+        inputs = (weights_t2i, weights_i2t, image_states, text_states)
+
+        loop = timeit(lambda: loop_negatives(*inputs), args.repeats, device)
+        batched = timeit(lambda: batched_negatives(*inputs), args.repeats, device)
+        topk = timeit(lambda: batched_negatives(*inputs, hard_topk=args.hard_topk), args.repeats, device)
+        print(f'{bs:>5} {loop * 1e3:>10.2f} {batched * 1e3:>11.2f} {topk * 1e3:>9.2f} {loop / batched:>7.1f}x')
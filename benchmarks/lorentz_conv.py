@@ -0,0 +1,60 @@
+"""
+LorentzConv2d on CIFAR-sized inputs: the Unfold implementation against the
+F.conv2d one, forward + backward time per batch and, on CUDA, peak memory of
+a step, for the convolutions of the Lorentz ResNet stages.
+
+    python -m benchmarks.lorentz_conv --batch_size 128 --device cuda
+"""
+import argparse
+import time
+
+import torch
+
+from hyptorch.lorentz.layers import LorentzConv2d
+from hyptorch.lorentz.manifold import CustomLorentz
+
+# (channels, resolution, stride) of the 3x3 convolutions in the ResNet stages on 32x32 inputs
+STAGES = [(64, 32, 1), (128, 32, 2), (128, 16, 1), (256, 16, 2), (256, 8, 1), (512, 8, 2), (512, 4, 1)]
+
+
+def run(forward, x, steps, device):
+    def step():
+        x.grad = None
+        forward(x).sum().backward()
+
+    step()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        base = torch.cuda.memory_allocated(device)
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    latency = (time.perf_counter() - start) / steps
+    memory = (torch.cuda.max_memory_allocated(device) - base) / 2 ** 20 if device.type == 'cuda' else float('nan')
+    return latency, memory
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=128)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    device = torch.device(args.device)
+    manifold = CustomLorentz(k=torch.tensor(1.0, device=device))
+
+    print(f'{"channels":>8} {"res":>4} {"stride":>6} {"unfold ms":>10} {"conv ms":>8} {"speedup":>8} {"unfold MiB":>11} {"conv MiB":>9}')
+    for channels, res, stride in STAGES:
+        in_channels = channels // stride
+        conv = LorentzConv2d(manifold, in_channels + 1, channels + 1, 3, stride=stride, padding=1, dropout=0.0).to(device)
+        space = torch.randn(args.batch_size, res, res, in_channels, device=device) * 0.1
+        x = manifold.expmap0(manifold.add_time(space)).requires_grad_()
+        unfold, unfold_mem = run(conv.unfold_forward, x, args.steps, device)
+        fused, fused_mem = run(conv.conv_forward, x, args.steps, device)
+        print(
+            f'{channels:>8} {res:>4} {stride:>6} {unfold * 1e3:>10.2f} {fused * 1e3:>8.2f} '
+            f'{unfold / fused:>7.1f}x {unfold_mem:>11.1f} {fused_mem:>9.1f}'
+        )
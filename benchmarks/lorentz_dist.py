@@ -0,0 +1,64 @@
+"""
+CPU micro-benchmark of the pairwise Lorentz distance: the clone-based bmm +
+arcosh path against CustomLorentz.dist_batch (fused, chunked) and the
+torch.compile-friendly pairwise_dist.
+
+    python -m benchmarks.lorentz_dist --rows 256 --cols 75000 --dim 257
+"""
+import argparse
+import time
+
+import torch
+
+from hyptorch.geoopt.manifolds.lorentz import math
+from hyptorch.lorentz.manifold import CustomLorentz, pairwise_dist
+
+
+def dist_batch_clone(manifold, x, y):
+    # reference implementation: clone x, flip the time sign, matmul, double precision arcosh
+    x = x.clone()
+    x.narrow(-1, 0, 1).mul_(-1)
+    d = -(x @ y.transpose(-1, -2))
+    return torch.sqrt(manifold.k) * math.arcosh(d / manifold.k)
+
+
+def timeit(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        out = fn()
+    return out, (time.perf_counter() - start) / repeats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=256)
+    parser.add_argument('--cols', type=int, default=75000)
+    parser.add_argument('--dim', type=int, default=257)
+    parser.add_argument('--chunk_size', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--compile', action='store_true')
+    args = parser.parse_args()
+
+    manifold = CustomLorentz(k=2.0)
+    x = manifold.random(args.rows, args.dim)
+    y = manifold.random(args.cols, args.dim)
+    print(f'x: {tuple(x.shape)}, y: {tuple(y.shape)}')
+
+    with torch.no_grad():
+        ref, ref_time = timeit(lambda: dist_batch_clone(manifold, x, y), args.repeats)
+        print(f'clone + arcosh:      {ref_time * 1e3:8.2f} ms')
+
+        candidates = {
+            'fused dist_batch': lambda: manifold.dist_batch(x, y),
+            'chunked dist_batch': lambda: manifold.dist_batch(x, y, chunk_size=args.chunk_size),
+            'pairwise_dist': lambda: pairwise_dist(x, y, manifold.k),
+        }
+        if args.compile:
+            compiled = torch.compile(pairwise_dist)
+            candidates['compiled pairwise_dist'] = lambda: compiled(x, y, manifold.k)
+
+        for name, fn in candidates.items():
+            out, out_time = timeit(fn, args.repeats)
+            error = (out - ref).abs().max().item()
+            print(f'{name + ":":20s} {out_time * 1e3:8.2f} ms ({ref_time / out_time:.2f}x, max abs err {error:.2e})')
@@ -0,0 +1,96 @@
+"""
+Compare the per-row argsort recall loop with the chunked rank engine.
+
+    python -m benchmarks.recall --n_imgs 5000 --caps_per_img 5
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from utils.retrivial_utils import report_metrics
+
+
+def report_metrics_loop(scores_i2t, scores_t2i, txt2img, img2txt, mode='val'):
+    # reference implementation: one argsort and np.where scan per row
+    scores_i2t = scores_i2t.numpy()
+    scores_t2i = scores_t2i.numpy()
+
+    ranks = np.zeros(scores_i2t.shape[0])
+    for index, score in enumerate(scores_i2t):
+        inds = np.argsort(score)[::-1]
+        rank = 1e20
+        for i in img2txt[index]:
+            tmp = np.where(inds == i)[0][0]
+            if tmp < rank:
+                rank = tmp
+        ranks[index] = rank
+    tr1 = 100.0 * len(np.where(ranks < 1)[0]) / len(ranks)
+    tr5 = 100.0 * len(np.where(ranks < 5)[0]) / len(ranks)
+    tr10 = 100.0 * len(np.where(ranks < 10)[0]) / len(ranks)
+
+    ranks = np.zeros(scores_t2i.shape[0])
+    for index, score in enumerate(scores_t2i):
+        inds = np.argsort(score)[::-1]
+        ranks[index] = np.where(inds == txt2img[index])[0][0]
+    ir1 = 100.0 * len(np.where(ranks < 1)[0]) / len(ranks)
+    ir5 = 100.0 * len(np.where(ranks < 5)[0]) / len(ranks)
+    ir10 = 100.0 * len(np.where(ranks < 10)[0]) / len(ranks)
+    return {
+        f'{mode}/r1_i2t': tr1,
+        f'{mode}/r5_i2t': tr5,
+        f'{mode}/r10_i2t': tr10,
+        f'{mode}/r_i2t': tr1 + tr5 + tr10,
+        f'{mode}/r1_t2i': ir1,
+        f'{mode}/r5_t2i': ir5,
+        f'{mode}/r10_t2i': ir10,
+        f'{mode}/r_t2i': ir1 + ir5 + ir10,
+        f'{mode}/r_all': tr1 + tr5 + tr10 + ir1 + ir5 + ir10,
+    }
+
+
+def synthetic_scores(n_imgs, caps_per_img, noise=4.0, dim=64, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    image_embeds = torch.randn(n_imgs, dim, generator=generator)
+    text_embeds = image_embeds.repeat_interleave(caps_per_img, dim=0)
+    text_embeds = text_embeds + noise * torch.randn(text_embeds.shape, generator=generator)
+    scores_t2i = text_embeds @ image_embeds.T
+    txt2img = {t: t // caps_per_img for t in range(n_imgs * caps_per_img)}
+    img2txt = {i: list(range(caps_per_img * i, caps_per_img * (i + 1))) for i in range(n_imgs)}
+    return scores_t2i, txt2img, img2txt
+
+
+def timeit(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_imgs', type=int, default=5000)
+    parser.add_argument('--caps_per_img', type=int, default=5)
+    parser.add_argument('--chunk_size', type=int, default=1024)
+    parser.add_argument('--skip_loop', action='store_true')
+    args = parser.parse_args()
+
+    scores_t2i, txt2img, img2txt = synthetic_scores(args.n_imgs, args.caps_per_img)
+    print(f'scores_t2i: {tuple(scores_t2i.shape)}')
+
+    new, new_time = timeit(
+        report_metrics, scores_i2t=scores_t2i.T, scores_t2i=scores_t2i,
+        txt2img=txt2img, img2txt=img2txt, chunk_size=args.chunk_size,
+    )
+    print(f'chunked rank engine: {new_time:.3f}s')
+
+    if not args.skip_loop:
+        old, old_time = timeit(
+            report_metrics_loop, scores_i2t=scores_t2i.T.contiguous(), scores_t2i=scores_t2i,
+            txt2img=txt2img, img2txt=img2txt,
+        )
+        print(f'argsort loop: {old_time:.3f}s ({old_time / new_time:.1f}x)')
+        for key in old:
+            assert abs(old[key] - new[key]) < 1e-6, (key, old[key], new[key])
+        print('metrics match')
+    print(new)
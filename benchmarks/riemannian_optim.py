@@ -0,0 +1,71 @@
+"""
+Step time of RiemannianAdam / RiemannianSGD with the per-parameter loop against
+the multi-tensor (foreach) path, on a parameter set shaped like LoRA adapters on
+every layer of a CLIP tower plus a few Lorentz linear layers.
+
+    python -m benchmarks.riemannian_optim --layers 24 --rank 8 --device cuda
+"""
+import argparse
+import time
+
+import torch
+
+from hyptorch.geoopt import ManifoldParameter
+from hyptorch.geoopt.optim import RiemannianAdam, RiemannianSGD
+from hyptorch.lorentz.manifold import CustomLorentz
+
+
+def make_params(layers, dim, rank, lorentz_layers, device):
+    manifold = CustomLorentz(k=torch.tensor(1.0))
+    params = []
+    for _ in range(layers):
+        # lora_A / lora_B of q, k, v and out projections
+        for _ in range(4):
+            params.append(torch.nn.Parameter(torch.randn(rank, dim, device=device) * 0.01))
+            params.append(torch.nn.Parameter(torch.zeros(dim, rank, device=device)))
+    for _ in range(lorentz_layers):
+        params.append(ManifoldParameter(manifold.random((dim // 4, dim // 4 + 1), std=0.01).to(device), manifold=manifold))
+        params.append(ManifoldParameter(manifold.origin(dim // 4 + 1).to(device), manifold=manifold))
+    return params
+
+
+def run(optimizer_cls, foreach, args, device):
+    params = make_params(args.layers, args.dim, args.rank, args.lorentz_layers, device)
+    kwargs = dict(lr=1e-3, weight_decay=1e-4, stabilize=10, foreach=foreach)
+    if optimizer_cls is RiemannianSGD:
+        kwargs['momentum'] = 0.9
+    optimizer = optimizer_cls(params, **kwargs)
+    grads = [torch.randn_like(param) for param in params]
+
+    def step():
+        for param, grad in zip(params, grads):
+            param.grad = grad.clone()
+        optimizer.step()
+
+    step()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / args.steps, len(params)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--layers', type=int, default=24)
+    parser.add_argument('--dim', type=int, default=1024)
+    parser.add_argument('--rank', type=int, default=8)
+    parser.add_argument('--lorentz_layers', type=int, default=4)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    print(f'{"optimizer":>15} {"params":>7} {"loop ms":>9} {"foreach ms":>11} {"speedup":>8}')
+    for optimizer_cls in [RiemannianAdam, RiemannianSGD]:
+        loop, num_params = run(optimizer_cls, False, args, device)
+        foreach, _ = run(optimizer_cls, True, args, device)
+        print(f'{optimizer_cls.__name__:>15} {num_params:>7} {loop * 1e3:>9.2f} {foreach * 1e3:>11.2f} {loop / foreach:>7.1f}x')
@@ -0,0 +1,127 @@
+"""
+Graph-head GNN on the star graphs at COCO batch sizes: message passing over the
+batched edge list (GATv2Conv / LorentzGAT) against the dense star attention,
+forward + backward per batch and graphs/s, with the root and in train mode
+(edge and attention dropout on). Before timing, the dense outputs are checked
+against the message passing ones in float64 (eval mode, random edge mask).
+
+    python -m benchmarks.star_attention --batch_sizes 50 128 256 --tokens 197 --device cuda
+"""
+import argparse
+import time
+
+import torch
+
+from hyptorch.lorentz.manifold import CustomLorentz
+from model.modules.graphs import GNN, add_star_root, build_star_graph
+from model.modules.HypGAT import LorentzGAT
+from model.modules.star_attention import DenseStar, dense_star, star_edge_mask, star_gatv2, star_lorentz_gat
+
+
+def timeit(fn, steps, device):
+    fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / steps
+
+
+def sparse_graph(x, edge_mask, root):
+    """The edge-list graph of `DenseStar(x, edge_mask, root)`: star edges in `star_edge_index` order, filtered by the mask."""
+    bs = x.shape[0]
+    keep = torch.cat([
+        torch.stack([edge_mask[1, :, 1:], edge_mask[0, :, 1:]], dim=-1).flatten(1),
+        torch.cat([edge_mask[0, :, :1], edge_mask[2, :, 1:]], dim=1),
+    ], dim=1).flatten()
+    graph = build_star_graph(x)
+    graph = graph._replace(edge_index=graph.edge_index[:, keep])
+    return graph if root is None else add_star_root(graph, root, bs)
+
+
+@torch.no_grad()
+def max_errors(args, device, bs=8):
+    """Largest |dense - message passing| of GATv2Conv and LorentzGAT (nodes and root), in float64."""
+    nodes = args.tokens + 1
+    edge_mask = star_edge_mask(bs, nodes, 0.5, training=True, device=device)
+
+    gnn = GNN(ft_in=args.dim, hidden_channels=args.hidden, ft_out=args.dim).to(device).double().eval()
+    x = torch.randn(bs, nodes, args.dim, device=device, dtype=torch.float64)
+    root = torch.randn(1, args.dim, device=device, dtype=torch.float64)
+    graph = sparse_graph(x, edge_mask, root)
+    sparse = gnn.conv1(graph.x, graph.edge_index)
+    dense, dense_root = star_gatv2(gnn.conv1, DenseStar(x, edge_mask, root))
+    gat_error = max((dense.flatten(0, 1) - sparse[:-1]).abs().max().item(), (dense_root - sparse[-1:]).abs().max().item())
+
+    manifold = CustomLorentz(k=torch.tensor(1.0, device=device, dtype=torch.float64))
+    conv = LorentzGAT(manifold, args.dim, args.dim).to(device).double().eval()
+    x = manifold.random((bs, nodes, args.dim + 1), dtype=torch.float64, device=device)
+    root = manifold.random((1, args.dim + 1), dtype=torch.float64, device=device)
+    graph = sparse_graph(x, edge_mask, root)
+    sparse = conv(graph.x, graph.edge_index)
+    dense, dense_root = star_lorentz_gat(conv, DenseStar(x, edge_mask, root))
+    lorentz_error = max((dense.flatten(0, 1) - sparse[:-1]).abs().max().item(), (dense_root - sparse[-1:]).abs().max().item())
+    return gat_error, lorentz_error
+
+
+def gnn_steps(args, bs, device):
+    gnn = GNN(ft_in=args.dim, hidden_channels=args.hidden, ft_out=args.dim).to(device).train()
+    x = torch.randn(bs, args.tokens + 1, args.dim, device=device, requires_grad=True)
+    root = torch.zeros(1, args.dim, device=device, requires_grad=True)
+
+    def sparse():
+        graph = add_star_root(build_star_graph(x, args.dropout_edge, training=True), root, bs)
+        output, mean = gnn(graph, batch_size=bs, use_root=True)
+        (output.sum() + mean.sum()).backward()
+
+    def dense():
+        output, mean = gnn(dense_star(x, root, args.dropout_edge, training=True), batch_size=bs)
+        (output.sum() + mean.sum()).backward()
+
+    return sparse, dense
+
+
+def lorentz_gat_steps(args, bs, device):
+    manifold = CustomLorentz(k=torch.tensor(1.0, device=device))
+    conv = LorentzGAT(manifold, args.dim, args.dim, dropout=0.1).to(device).train()
+    x = manifold.random((bs, args.tokens + 1, args.dim + 1)).to(device).requires_grad_()
+    root = manifold.origin((1, args.dim + 1)).to(device)
+
+    def sparse():
+        graph = add_star_root(build_star_graph(x, args.dropout_edge, training=True), root, bs)
+        conv(graph.x, graph.edge_index).sum().backward()
+
+    def dense():
+        nodes, root_out = star_lorentz_gat(conv, dense_star(x, root, args.dropout_edge, training=True))
+        (nodes.sum() + root_out.sum()).backward()
+
+    return sparse, dense
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[50, 128, 256])
+    parser.add_argument('--tokens', type=int, default=197, help='tokens of the hidden states linked to the pooled one')
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--hidden', type=int, default=512)
+    parser.add_argument('--dropout_edge', type=float, default=0.1)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    gat_error, lorentz_error = max_errors(args, device)
+    print(f'float64 max |dense - message passing|: GATv2Conv {gat_error:.2e}, LorentzGAT {lorentz_error:.2e}')
+    print(f'{"layer":>11} {"bs":>5} {"sparse ms":>10} {"dense ms":>9} {"graphs/s":>9} {"speedup":>8}')
+    for name, make_steps in [('GNN', gnn_steps), ('LorentzGAT', lorentz_gat_steps)]:
+        for bs in args.batch_sizes:
+            sparse, dense = make_steps(args, bs, device)
+            sparse_time = timeit(sparse, args.steps, device)
+            dense_time = timeit(dense, args.steps, device)
+            print(
+                f'{name:>11} {bs:>5} {sparse_time * 1e3:>10.2f} {dense_time * 1e3:>9.2f} '
+                f'{bs / dense_time:>9.0f} {sparse_time / dense_time:>7.1f}x'
+            )
@@ -0,0 +1,55 @@
+"""
+Throughput of the Poincaré ball expmap0 / logmap0 / dist with the curvature
+sign checked at runtime (a host sync per tan_k / artan_k call) against the
+sign fixed at construction, on a batch of embeddings.
+
+    python -m benchmarks.stereographic --batch_size 4096 --dim 256 --device cuda
+"""
+import argparse
+import time
+
+import torch
+
+from hyptorch.geoopt import PoincareBall
+
+
+def timeit(fn, steps, device):
+    fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    return (time.perf_counter() - start) / steps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=4096)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    manifold = PoincareBall(c=1.0, learnable=True).to(device)
+    u = torch.randn(args.batch_size, args.dim, device=device) * 0.1
+    x, y = manifold.expmap0(u), manifold.expmap0(u.flip(0))
+    ops = {
+        'expmap0': lambda: manifold.expmap0(u),
+        'logmap0': lambda: manifold.logmap0(x),
+        'dist': lambda: manifold.dist(x, y),
+    }
+
+    print(f'{"op":>8} {"runtime Mrow/s":>15} {"fixed Mrow/s":>13} {"speedup":>8}')
+    for name, op in ops.items():
+        manifold.sign = None
+        runtime = timeit(op, args.steps, device)
+        manifold.sign = -1
+        fixed = timeit(op, args.steps, device)
+        print(
+            f'{name:>8} {args.batch_size / runtime / 1e6:>15.2f} '
+            f'{args.batch_size / fixed / 1e6:>13.2f} {runtime / fixed:>7.2f}x'
+        )
@@ -0,0 +1,78 @@
+"""
+Vision-tower throughput of the compressed backbones for every compress_method:
+images/s, latency per batch, the token-memory ratio (tokens kept / tokens without
+compression, summed over the compressed layers) and the estimated FLOPs of the
+compression schedule, for CLIP-B/16, CLIP-L/14 and LAVIS BLIP-base.
+
+    python -m benchmarks.token_merging --models clip_b16 clip_l14 blip_base --batch_size 64 --r 0.925
+    python -m benchmarks.token_merging --flops_budget 0.5
+    python -m benchmarks.token_merging --methods ToMe PiToMe --prop_attn
+"""
+import argparse
+import time
+
+import torch
+
+from config import CACHE_DIR, CLIP_BASE_PATCH_16, CLIP_LARGE_PATCH_14
+
+METHODS = ['none', 'dct', 'ToMe', 'PiToMe']
+
+
+def load_backbone(name, compress_method, r, cache_dir):
+    from model.modules.compressed_models import CompressedHFCLIP, CompressedLAVISBLIP
+    if name == 'blip_base':
+        from lavis.models import load_model_and_preprocess
+        model = load_model_and_preprocess('blip_retrieval', 'coco', is_eval=True)[0]
+        return CompressedLAVISBLIP(model, compress_method=compress_method, r=r), 384
+    from transformers import AutoModel
+    model = AutoModel.from_pretrained({'clip_b16': CLIP_BASE_PATCH_16, 'clip_l14': CLIP_LARGE_PATCH_14}[name], cache_dir=cache_dir)
+    return CompressedHFCLIP(model, compress_method=compress_method, r=r), model.config.vision_config.image_size
+
+
+@torch.no_grad()
+def run(backbone, image_size, batch_size, steps, device):
+    pixel_values = torch.randn(batch_size, 3, image_size, image_size, device=device)
+    with torch.autocast(device.type, dtype=torch.float16, enabled=device.type == 'cuda'):
+        memory_ratio = backbone.get_vision_features(pixel_values)[4]
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        start = time.perf_counter()
+        for _ in range(steps):
+            backbone.get_vision_features(pixel_values)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+    latency = (time.perf_counter() - start) / steps
+    return batch_size / latency, latency, memory_ratio
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', nargs='+', default=['clip_b16', 'clip_l14', 'blip_base'])
+    parser.add_argument('--methods', nargs='+', default=METHODS)
+    parser.add_argument('--r', type=float, default=0.925)
+    parser.add_argument('--compress_schedule', default=None, help='comma separated keep ratio per layer, overrides --r')
+    parser.add_argument('--flops_budget', type=float, default=None, help='fraction of the uncompressed FLOPs, overrides --r')
+    parser.add_argument('--prop_attn', action='store_true', help='proportional attention with the tracked token sizes')
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--cache_dir', default=CACHE_DIR)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    device = torch.device(args.device)
+
+    print(f'{"model":>10} {"method":>8} {"images/s":>10} {"ms/batch":>9} {"memory":>8} {"flops":>7} {"GFLOPs":>8}')
+    for name in args.models:
+        backbone, image_size = load_backbone(name, args.methods[0], args.r, args.cache_dir)
+        backbone = backbone.to(device).eval()
+        backbone.prop_attn = args.prop_attn
+        uniform = backbone.schedule
+        for method in args.methods:
+            backbone.compress_method = method
+            backbone.schedule = uniform
+            backbone.configure_schedule(args.compress_schedule, args.flops_budget)
+            images_per_s, latency, memory_ratio = run(backbone, image_size, args.batch_size, args.steps, device)
+            stats = backbone.compression_stats
+            print(
+                f'{name:>10} {method:>8} {images_per_s:>10.1f} {latency * 1e3:>9.1f} '
+                f'{memory_ratio:>8.3f} {stats["flops"]:>7.3f} {stats["gflops"]:>8.2f}'
+            )
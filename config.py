@@ -143,9 +143,14 @@ config_args = {
         "normalize_image_embed": (False,""),
         "shared_proj_layers": (False, "number of project layers"),
         "use_itm_head": (True, "use itm head"),
+        "itm_hard_topk": (0, "draw ITM negatives among the k hardest per row (0 samples over all)"),
         "use_fused_features": (False, "use fused features"),
         "use_root": (False, "use graph root"),
         "graph_hidden_channels": (512, "graph size"),
+        "eval_tile_size": (1024, "rows/columns per similarity tile during evaluation"),
+        "embedding_cache_dir": (None, "directory for cached evaluation embeddings (None to disable)"),
+        "teacher_cache_dir": (None, "directory for memory-mapped outputs of the frozen first encoder of fused models (None to run it every step)"),
+        "teacher_cache_dtype": ("fp16", "storage of the cached teacher outputs: fp32, fp16 or int8"),
     },
     "hybrid_model_config": {
         "model_ckt": (CLIP_BASE_PATCH_16, "model checkpoint on Hugging Face"),
@@ -156,6 +161,9 @@ config_args = {
         "curv": (1.0, "hyperbolic curvature"),
         "atol": (1e-1, "The relative tolerance parameter"),
         "rtol": (1e-1, "The absolute tolerance parameter"),
+        "manifold_check": ("off", "manifold validation policy: strict, sampled, subset or off"),
+        "manifold_check_every": (100, "check every n-th point in sampled mode"),
+        "manifold_check_rows": (64, "rows checked per call in subset mode"),
         "temp": (0.07, "distance temperature"),
         "clip_radius": (1.25, "clipping radius"),
         "vision_trainable_blocks": (6, "number of trainable blocks in vision model"),
@@ -164,17 +172,29 @@ config_args = {
         "num_text_hidden_states": (1, "number of trainable blocks in text model"),
         "ft_out": (768, "final project dimension"),
         "curv_learnable": (False, "is curvature learnable"),
+        "fuse_lorentz": (False, "fuse the Lorentz linear / norm layers while evaluating (undone by train())"),
+        "conv_dropout": (0.1, "dropout on the patches of the Lorentz ResNet convolutions (0 trains through F.conv2d without the patch tensor)"),
         "freeze_embedding": (True, "freeze embedding layers"),
         "fourier": (False, "fourier"),
         "use_last_signal": (False, "fourier"),
         "use_signal_loss": (True, "fourier"),
         "compress_method": ('std', "compress method"),
         "distil": (True, "use distil"),
-        "r": (0.925, "remain ratio")
+        "r": (0.925, "remain ratio"),
+        "compress_schedule": (None, "comma separated keep ratio before every vision layer (1.0 = no compression), overrides r"),
+        "flops_budget": (None, "fraction of the uncompressed vision FLOPs to solve r for (None to use r)"),
+        "prop_attn": (False, "proportional attention: track merged token sizes and add log(size) to the vision attention logits"),
     },
     "data_config": {
         "dataset": (COCO, "which dataset to use"),
         "cache_dir": (CACHE_DIR, "cache_dir"),
+        "num_workers": (4, "number of DataLoader worker processes (0 loads in the main process)"),
+        "pin_memory": (True, "pin DataLoader batches in page-locked memory"),
+        "persistent_workers": (True, "keep DataLoader workers alive between epochs"),
+        "prefetch_factor": (2, "batches prefetched per DataLoader worker"),
+        "caption_cache_dir": (None, "directory for pre-tokenized captions (None to tokenize every batch)"),
+        "image_shard_dir": (None, "root of packed image shards, one sub directory per dataset (None to read the image folders)"),
+        "unique_image_batches": (False, "train batches never hold two captions of the same image"),
     },
     "perceiver": {
         "num_latents": (12, "which dataset to use"),
@@ -5,6 +5,7 @@ from . import samplers
 from . import linalg
 from . import utils
 from .utils import ismanifold
+from .manifolds.base import set_validation_policy, flush_validation
 
 from .tensor import ManifoldParameter, ManifoldTensor
 from .manifolds import (
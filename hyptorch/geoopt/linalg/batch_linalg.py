@@ -2,6 +2,7 @@ from typing import List, Callable, Tuple
 import torch
 import torch.jit
 from functools import lru_cache, partial
+from ..utils import jit_script
 
 __all__ = [
     "svd",
@@ -22,12 +23,12 @@ __all__ = [
 ]
 
 
-@torch.jit.script
+@jit_script
 def sym(x: torch.Tensor):  # pragma: no cover
     return 0.5 * (x.transpose(-1, -2) + x)
 
 
-@torch.jit.script
+@jit_script
 def extract_diag(x: torch.Tensor):  # pragma: no cover
     return torch.diagonal(x, 0, -1, -2)
 
@@ -37,7 +38,7 @@ matrix_rank = torch.linalg.matrix_rank
 expm = torch.matrix_exp
 
 
-@torch.jit.script
+@jit_script
 def block_matrix(blocks: List[List[torch.Tensor]], dim0: int = -2, dim1: int = -1):
     # [[A, B], [C, D]] ->
     # [AB]
@@ -48,7 +49,7 @@ def block_matrix(blocks: List[List[torch.Tensor]], dim0: int = -2, dim1: int = -
     return torch.cat(hblocks, dim=dim0)
 
 
-@torch.jit.script
+@jit_script
 def trace(x: torch.Tensor, keepdim: bool = False) -> torch.Tensor:
     r"""self-implemented matrix trace, since `torch.trace` only support 2-d input.
 
@@ -186,7 +187,7 @@ def sym_inv_sqrtm1(x: torch.Tensor) -> torch.Tensor:
     return _sym_funcm_impl(torch.pow, exponent=-0.5)(x)
 
 
-@torch.jit.script
+@jit_script
 def sym_inv_sqrtm2(x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
     """Symmetric matrix inverse square root, with square root return also.
 
@@ -3,7 +3,7 @@ import torch.nn
 import itertools
 from typing import Optional, Tuple, Union
 
-__all__ = ["Manifold", "ScalingInfo"]
+__all__ = ["Manifold", "ScalingInfo", "ValidationPolicy", "validation", "set_validation_policy", "flush_validation"]
 
 
 class ScalingInfo(object):
@@ -31,6 +31,107 @@ class ScalingInfo(object):
         self.kwargs = kwargs
 
 
+class ValidationPolicy(object):
+    """
+    Global policy for :meth:`Manifold.assert_check_point_on_manifold`.
+
+    Modes:
+
+    - ``"strict"``: check every point and raise right away (syncs with the device).
+    - ``"sampled"``: check every ``every``-th call.
+    - ``"subset"``: check ``rows`` random rows of every call.
+    - ``"off"``: no checks at all.
+
+    ``sampled`` and ``subset`` never sync: failures are or-ed into a flag on the
+    device. :meth:`flush` starts a non-blocking copy of the flags to the host and
+    raises for the flags copied by the previous flush, ``wait=True`` reports the
+    current ones as well.
+    """
+
+    OFF = "off"
+    SAMPLED = "sampled"
+    SUBSET = "subset"
+    STRICT = "strict"
+    MODES = (OFF, SAMPLED, SUBSET, STRICT)
+
+    def __init__(self, mode=STRICT, every=100, rows=64):
+        self.configure(mode, every, rows)
+
+    def configure(self, mode=STRICT, every=100, rows=64):
+        if mode not in self.MODES:
+            raise ValueError(
+                "Unknown validation mode {}, expected one of {}".format(mode, self.MODES)
+            )
+        self.mode = mode
+        self.every = every
+        self.rows = rows
+        self._calls = 0
+        self._flags = {}
+        self._inflight = []
+
+    def should_check(self) -> bool:
+        if self.mode == self.OFF:
+            return False
+        if self.mode == self.SAMPLED:
+            self._calls += 1
+            return (self._calls - 1) % self.every == 0
+        return True
+
+    def sample(self, x: torch.Tensor) -> torch.Tensor:
+        if self.mode != self.SUBSET:
+            return x
+        if x.dim() > 2:
+            x = x.reshape(-1, x.shape[-1])
+        if x.dim() < 2 or x.shape[0] <= self.rows:
+            return x
+        index = torch.randint(x.shape[0], (self.rows,), device=x.device)
+        return x.index_select(0, index)
+
+    def record(self, name: str, violation: torch.Tensor):
+        key = (name, violation.device)
+        flag = self._flags.get(key)
+        self._flags[key] = violation if flag is None else flag | violation
+
+    def flush(self, wait=False):
+        inflight, self._inflight = self._inflight, []
+        for (name, device), flag in self._flags.items():
+            host = torch.empty((), dtype=torch.bool, pin_memory=device.type == "cuda")
+            host.copy_(flag.detach(), non_blocking=True)
+            event = None
+            if device.type == "cuda":
+                event = torch.cuda.Event()
+                event.record(torch.cuda.current_stream(device))
+            self._inflight.append((name, host, event))
+        self._flags = {}
+        if wait:
+            inflight, self._inflight = inflight + self._inflight, []
+        failed = []
+        for name, host, event in inflight:
+            if event is not None:
+                event.synchronize()
+            if host.item() and name not in failed:
+                failed.append(name)
+        if failed:
+            raise ValueError(
+                "Points not lying on {} manifold were found since the last check".format(
+                    ", ".join(failed)
+                )
+            )
+
+
+validation = ValidationPolicy()
+
+
+def set_validation_policy(mode=ValidationPolicy.STRICT, every=100, rows=64):
+    """Configures the global :class:`ValidationPolicy` used by every manifold."""
+    validation.configure(mode, every, rows)
+
+
+def flush_validation(wait=False):
+    """Reports deferred manifold checks, see :meth:`ValidationPolicy.flush`."""
+    validation.flush(wait=wait)
+
+
 class ScalingStorage(dict):
     """
     Helper class to make implementation transparent.
@@ -278,7 +379,18 @@ class Manifold(torch.nn.Module, metaclass=abc.ABCMeta):
             absolute tolerance as in :func:`numpy.allclose`
         rtol: float
             relative tolerance as in :func:`numpy.allclose`
+
+        Notes
+        -----
+        Follows the global :class:`ValidationPolicy`, outside of ``"strict"`` mode
+        failures are only reported by :func:`flush_validation`.
         """
+        if validation.mode != validation.STRICT:
+            if validation.should_check():
+                self.assert_check_point(x)
+                violation = self._point_violation(validation.sample(x), atol=atol, rtol=rtol)
+                validation.record(self.name, violation)
+            return
         self.assert_check_point(x)
         ok, reason = self._check_point_on_manifold(x, atol=atol, rtol=rtol)
         if not ok:
@@ -822,6 +934,17 @@ class Manifold(torch.nn.Module, metaclass=abc.ABCMeta):
         # return True, None
         raise NotImplementedError
 
+    def _point_violation(self, x: torch.Tensor, *, atol=1e-5, rtol=1e-5) -> torch.Tensor:
+        """
+        Device side counterpart of :meth:`_check_point_on_manifold`.
+
+        Returns a scalar bool tensor that is ``True`` if :math:`x` is off the manifold,
+        without syncing with the device. The default falls back to
+        :meth:`_check_point_on_manifold`, manifolds on hot paths override it.
+        """
+        ok, _ = self._check_point_on_manifold(x, atol=atol, rtol=rtol)
+        return torch.tensor(not ok, device=x.device)
+
     @abc.abstractmethod
     def _check_vector_on_tangent(
         self, x: torch.Tensor, u: torch.Tensor, *, atol=1e-5, rtol=1e-5
@@ -4,7 +4,7 @@ from .base import Manifold
 from .. import linalg
 import torch.jit
 from ..tensor import ManifoldTensor
-from ..utils import make_tuple, size2shape
+from ..utils import make_tuple, size2shape, jit_script
 
 __all__ = ["BirkhoffPolytope"]
 
@@ -198,7 +198,7 @@ class BirkhoffPolytope(Manifold):
         return ManifoldTensor(eye, manifold=self)
 
 
-@torch.jit.script
+@jit_script
 def proj_doubly_stochastic(
     x, max_iter: int = 300, eps: float = 1e-5, tol: float = 1e-5
 ):
@@ -215,7 +215,7 @@ def proj_doubly_stochastic(
     return x * (r @ c)
 
 
-@torch.jit.script
+@jit_script
 def proj_tangent(x, u):
     assert x.shape[-2:] == u.shape[-2:], "Wrong shapes"
     x, u = torch.broadcast_tensors(x, u)
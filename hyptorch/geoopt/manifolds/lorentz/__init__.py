@@ -56,6 +56,16 @@ class Lorentz(Manifold):
             reason = None
         return ok, reason
 
+    def _point_violation(
+        self, x: torch.Tensor, *, atol=1e-5, rtol=1e-5, dim=-1
+    ) -> torch.Tensor:
+        dn = x.size(dim) - 1
+        x = x**2
+        quad_form = -x.narrow(dim, 0, 1) + x.narrow(dim, 1, dn).sum(
+            dim=dim, keepdim=True
+        )
+        return ~torch.isclose(quad_form, -self.k, atol=atol, rtol=rtol).all()
+
     def _check_vector_on_tangent(
         self, x: torch.Tensor, u: torch.Tensor, *, atol=1e-5, rtol=1e-5, dim=-1
     ) -> Tuple[bool, Optional[str]]:
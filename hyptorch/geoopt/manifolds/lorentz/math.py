@@ -1,5 +1,7 @@
 import torch.jit
 
+from ...utils import jit_script
+
 EXP_MAX_NORM = 10
 
 # @torch.jit.script
@@ -342,7 +344,7 @@ def expmap0(u, *, k, dim=-1):
     return _expmap0(u, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _expmap0(u, k: torch.Tensor, dim: int = -1):
     nomin = _norm(u, keepdim=True, dim=dim)
     l_v = torch.cosh(nomin / torch.sqrt(k)) * torch.sqrt(k)
@@ -158,6 +158,9 @@ class Scaled(Manifold):
     ) -> Union[Tuple[bool, Optional[str]], bool]:
         return self.base._check_point_on_manifold(x, atol=atol, rtol=rtol)
 
+    def _point_violation(self, x: torch.Tensor, *, atol=1e-5, rtol=1e-5) -> torch.Tensor:
+        return self.base._point_violation(x, atol=atol, rtol=rtol)
+
     def _check_vector_on_tangent(
         self, x: torch.Tensor, u: torch.Tensor, *, atol=1e-5, rtol=1e-5
     ) -> Union[Tuple[bool, Optional[str]], bool]:
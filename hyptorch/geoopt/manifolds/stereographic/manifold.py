@@ -108,6 +108,10 @@ class Stereographic(Manifold):
     reversible = False
     name = property(lambda self: self.__class__.__name__)
     __scaling__ = Manifold.__scaling__.copy()
+    # sign of the curvature, fixed at construction so the math functions pick the
+    # hyperbolic / Euclidean / spherical formula without syncing on k (None: runtime check);
+    # subclasses with a fixed sign set it here and skip `curvature_sign`
+    sign = None
 
     @property
     def radius(self):
@@ -119,6 +123,8 @@ class Stereographic(Manifold):
         if not torch.is_floating_point(k):
             k = k.to(torch.get_default_dtype())
         self.k = torch.nn.Parameter(k, requires_grad=learnable)
+        if not learnable and self.sign is None:
+            self.sign = math.curvature_sign(k)
 
     def _check_point_on_manifold(
         self, x: torch.Tensor, *, atol=1e-5, rtol=1e-5, dim=-1
@@ -131,6 +137,12 @@ class Stereographic(Manifold):
             reason = None
         return ok, reason
 
+    def _point_violation(
+        self, x: torch.Tensor, *, atol=1e-5, rtol=1e-5, dim=-1
+    ) -> torch.Tensor:
+        px = math.project(x, k=self.k, dim=dim)
+        return ~torch.isclose(x, px, atol=atol, rtol=rtol).all()
+
     def _check_vector_on_tangent(
         self, x: torch.Tensor, u: torch.Tensor, *, atol=1e-5, rtol=1e-5, dim=-1
     ) -> Tuple[bool, Optional[str]]:
@@ -139,14 +151,14 @@ class Stereographic(Manifold):
     def dist(
         self, x: torch.Tensor, y: torch.Tensor, *, keepdim=False, dim=-1
     ) -> torch.Tensor:
-        return math.dist(x, y, k=self.k, keepdim=keepdim, dim=dim)
+        return math.dist(x, y, k=self.k, sign=self.sign, keepdim=keepdim, dim=dim)
 
 
 
     def dist2(
         self, x: torch.Tensor, y: torch.Tensor, *, keepdim=False, dim=-1
     ) -> torch.Tensor:
-        return math.dist(x, y, k=self.k, keepdim=keepdim, dim=dim) ** 2
+        return math.dist(x, y, k=self.k, sign=self.sign, keepdim=keepdim, dim=dim) ** 2
 
     def egrad2rgrad(self, x: torch.Tensor, u: torch.Tensor, *, dim=-1) -> torch.Tensor:
         return math.egrad2rgrad(x, u, k=self.k, dim=dim)
@@ -184,14 +196,14 @@ class Stereographic(Manifold):
     def expmap(
         self, x: torch.Tensor, u: torch.Tensor, *, project=True, dim=-1
     ) -> torch.Tensor:
-        res = math.expmap(x, u, k=self.k, dim=dim)
+        res = math.expmap(x, u, k=self.k, sign=self.sign, dim=dim)
         if project:
             return math.project(res, k=self.k, dim=dim)
         else:
             return res
 
     def logmap(self, x: torch.Tensor, y: torch.Tensor, *, dim=-1) -> torch.Tensor:
-        return math.logmap(x, y, k=self.k, dim=dim)
+        return math.logmap(x, y, k=self.k, sign=self.sign, dim=dim)
 
     def transp(self, x: torch.Tensor, y: torch.Tensor, v: torch.Tensor, *, dim=-1):
         return math.parallel_transport(x, y, v, k=self.k, dim=dim)
@@ -273,7 +285,7 @@ class Stereographic(Manifold):
     def mobius_scalar_mul(
         self, r: torch.Tensor, x: torch.Tensor, *, dim=-1, project=True
     ) -> torch.Tensor:
-        res = math.mobius_scalar_mul(r, x, k=self.k, dim=dim)
+        res = math.mobius_scalar_mul(r, x, k=self.k, sign=self.sign, dim=dim)
         if project:
             return math.project(res, k=self.k, dim=dim)
         else:
@@ -282,7 +294,7 @@ class Stereographic(Manifold):
     def mobius_pointwise_mul(
         self, w: torch.Tensor, x: torch.Tensor, *, dim=-1, project=True
     ) -> torch.Tensor:
-        res = math.mobius_pointwise_mul(w, x, k=self.k, dim=dim)
+        res = math.mobius_pointwise_mul(w, x, k=self.k, sign=self.sign, dim=dim)
         if project:
             return math.project(res, k=self.k, dim=dim)
         else:
@@ -291,7 +303,7 @@ class Stereographic(Manifold):
     def mobius_matvec(
         self, m: torch.Tensor, x: torch.Tensor, *, dim=-1, project=True
     ) -> torch.Tensor:
-        res = math.mobius_matvec(m, x, k=self.k, dim=dim)
+        res = math.mobius_matvec(m, x, k=self.k, sign=self.sign, dim=dim)
         if project:
             return math.project(res, k=self.k, dim=dim)
         else:
@@ -312,7 +324,7 @@ class Stereographic(Manifold):
         dim=-1,
         project=True,
     ) -> torch.Tensor:
-        res = math.geodesic_unit(t, x, u, k=self.k, dim=dim)
+        res = math.geodesic_unit(t, x, u, k=self.k, sign=self.sign, dim=dim)
         if project:
             return math.project(res, k=self.k, dim=dim)
         else:
@@ -323,11 +335,11 @@ class Stereographic(Manifold):
 
     @__scaling__(ScalingInfo(1))
     def dist0(self, x: torch.Tensor, *, dim=-1, keepdim=False) -> torch.Tensor:
-        return math.dist0(x, k=self.k, dim=dim, keepdim=keepdim)
+        return math.dist0(x, k=self.k, sign=self.sign, dim=dim, keepdim=keepdim)
 
     @__scaling__(ScalingInfo(u=-1))
     def expmap0(self, u: torch.Tensor, *, dim=-1, project=True) -> torch.Tensor:
-        res = math.expmap0(u, k=self.k, dim=dim)
+        res = math.expmap0(u, k=self.k, sign=self.sign, dim=dim)
         if project:
             return math.project(res, k=self.k, dim=dim)
         else:
@@ -335,7 +347,7 @@ class Stereographic(Manifold):
 
     @__scaling__(ScalingInfo(1))
     def logmap0(self, x: torch.Tensor, *, dim=-1) -> torch.Tensor:
-        return math.logmap0(x, k=self.k, dim=dim)
+        return math.logmap0(x, k=self.k, sign=self.sign, dim=dim)
 
     def transp0(self, y: torch.Tensor, u: torch.Tensor, *, dim=-1) -> torch.Tensor:
         return math.parallel_transport0(y, u, k=self.k, dim=dim)
@@ -372,6 +384,7 @@ class Stereographic(Manifold):
             keepdim=keepdim,
             signed=signed,
             scaled=scaled,
+            sign=self.sign,
         )
 
     # this does not yet work with scaling
@@ -607,6 +620,8 @@ class PoincareBall(Stereographic):
     def c(self):
         return torch.nn.functional.softplus(self.isp_c)
 
+    sign = -1
+
     def __init__(self, c=1.0, learnable=False):
         super().__init__(k=c, learnable=learnable)
         k = self._parameters.pop("k")
@@ -631,15 +646,12 @@ class PoincareBall(Stereographic):
         return res
 
 
-    def dist_batch(self, x, y, dim=-1, keepdim = False, device='gpu'):
-        device = torch.device('cuda:0' if device=='gpu' else 'cpu')
-        x = x.to(device)
-        y = y.to(device)
-        k = self.k.to(device)
-        
-        return 2.0 * math.artan_k(
-            self.mobius_addition_batch(-x, y, k=k).norm(dim=dim, p=2, keepdim=keepdim ), k 
-        )
+    def dist_batch(self, x, y, device=None):
+        """Pairwise distances (N, M) between rows of x (N, D) and y (M, D), computed on the inputs' device unless `device` is given."""
+        if device is not None:
+            x = x.to(device)
+            y = y.to(device)
+        return math.pairwise_dist(x, y, k=self.k.to(x.device), sign=self.sign)
 
 
 
@@ -681,6 +693,8 @@ class SphereProjection(Stereographic):
     def k(self):
         return torch.nn.functional.softplus(self.isp_k)
 
+    sign = 1
+
     def __init__(self, k=1.0, learnable=False):
         super().__init__(k=k, learnable=learnable)
         k = self._parameters.pop("k")
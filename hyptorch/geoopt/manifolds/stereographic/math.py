@@ -23,32 +23,32 @@ following resources:
 import functools
 import torch.jit
 from typing import List, Optional
-from ...utils import list_range, drop_dims, sign, clamp_abs, sabs
+from ...utils import list_range, drop_dims, sign, clamp_abs, sabs, jit_script
 
 
-@torch.jit.script
+@jit_script
 def tanh(x):
     return x.clamp(-15, 15).tanh()
 
 
-@torch.jit.script
+@jit_script
 def artanh(x: torch.Tensor):
     x = x.clamp(-1 + 1e-7, 1 - 1e-7)
     return (torch.log(1 + x).sub(torch.log(1 - x))).mul(0.5)
 
 
-@torch.jit.script
+@jit_script
 def arsinh(x: torch.Tensor):
     return (x + torch.sqrt(1 + x.pow(2))).clamp_min(1e-15).log().to(x.dtype)
 
 
-@torch.jit.script
+@jit_script
 def abs_zero_grad(x):
     # this op has derivative equal to 1 at zero
     return x * sign(x)
 
 
-@torch.jit.script
+@jit_script
 def tan_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
     if order == 0:
         return x
@@ -86,7 +86,7 @@ def tan_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
         raise RuntimeError("order not in [-1, 5]")
 
 
-@torch.jit.script
+@jit_script
 def artan_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
     if order == 0:
         return x
@@ -121,7 +121,7 @@ def artan_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
         raise RuntimeError("order not in [-1, 5]")
 
 
-@torch.jit.script
+@jit_script
 def arsin_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
     if order == 0:
         return x
@@ -154,7 +154,7 @@ def arsin_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
         raise RuntimeError("order not in [-1, 5]")
 
 
-@torch.jit.script
+@jit_script
 def sin_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
     if order == 0:
         return x
@@ -187,71 +187,91 @@ def sin_k_zero_taylor(x: torch.Tensor, k: torch.Tensor, order: int = -1):
         raise RuntimeError("order not in [-1, 5]")
 
 
-@torch.jit.script
-def tan_k(x: torch.Tensor, k: torch.Tensor):
-    k_sign = k.sign()
+@jit_script
+def curvature_sign(k: torch.Tensor) -> Optional[int]:
+    """
+    -1, 0 or 1 if every entry of `k` is negative, close to zero or positive,
+    None for mixed signs. Reads `k` on the host, so it syncs with the device.
+    """
     zero = torch.zeros((), device=k.device, dtype=k.dtype)
     k_zero = k.isclose(zero)
-    # shrink sign
-    k_sign = torch.masked_fill(k_sign, k_zero, zero.to(k_sign.dtype))
     if torch.all(k_zero):
+        return 0
+    if torch.all(k.lt(0) & ~k_zero):
+        return -1
+    if torch.all(k.gt(0) & ~k_zero):
+        return 1
+    return None
+
+
+@jit_script
+def _mixed_sign(k: torch.Tensor):
+    zero = torch.zeros((), device=k.device, dtype=k.dtype)
+    k_zero = k.isclose(zero)
+    # shrink sign
+    k_sign = torch.masked_fill(k.sign(), k_zero, zero.to(k.dtype))
+    return k_sign, k_zero
+
+
+# A known `sign` of the curvature (see `curvature_sign`), e.g. from a manifold whose
+# sign is fixed, selects the formula without reading `k` on the host.
+
+
+@jit_script
+def tan_k(x: torch.Tensor, k: torch.Tensor, sign: Optional[int] = None):
+    if sign is None:
+        sign = curvature_sign(k)
+    if sign is not None and sign == 0:
         return tan_k_zero_taylor(x, k, order=1)
     k_sqrt = sabs(k).sqrt()
     scaled_x = x * k_sqrt
 
-    if torch.all(k_sign.lt(0)):
-        return k_sqrt.reciprocal() * tanh(scaled_x)
-    elif torch.all(k_sign.gt(0)):
-        return k_sqrt.reciprocal() * scaled_x.clamp_max(1e38).tan()
-    else:
+    if sign is None:
+        k_sign, k_zero = _mixed_sign(k)
         tan_k_nonzero = (
             torch.where(k_sign.gt(0), scaled_x.clamp_max(1e38).tan(), tanh(scaled_x))
             * k_sqrt.reciprocal()
         )
         return torch.where(k_zero, tan_k_zero_taylor(x, k, order=1), tan_k_nonzero)
+    elif sign < 0:
+        return k_sqrt.reciprocal() * tanh(scaled_x)
+    else:
+        return k_sqrt.reciprocal() * scaled_x.clamp_max(1e38).tan()
 
 
-@torch.jit.script
-def artan_k(x: torch.Tensor, k: torch.Tensor):
-    k_sign = k.sign()
-    zero = torch.zeros((), device=k.device, dtype=k.dtype)
-    k_zero = k.isclose(zero)
-    # shrink sign
-    k_sign = torch.masked_fill(k_sign, k_zero, zero.to(k_sign.dtype))
-    if torch.all(k_zero):
+@jit_script
+def artan_k(x: torch.Tensor, k: torch.Tensor, sign: Optional[int] = None):
+    if sign is None:
+        sign = curvature_sign(k)
+    if sign is not None and sign == 0:
         return artan_k_zero_taylor(x, k, order=1)
     k_sqrt = sabs(k).sqrt()
     scaled_x = x * k_sqrt
 
-    if torch.all(k_sign.lt(0)):
-        return k_sqrt.reciprocal() * artanh(scaled_x)
-    elif torch.all(k_sign.gt(0)):
-        return k_sqrt.reciprocal() * scaled_x.atan()
-    else:
+    if sign is None:
+        k_sign, k_zero = _mixed_sign(k)
         artan_k_nonzero = (
             torch.where(k_sign.gt(0), scaled_x.atan(), artanh(scaled_x))
             * k_sqrt.reciprocal()
         )
         return torch.where(k_zero, artan_k_zero_taylor(x, k, order=1), artan_k_nonzero)
+    elif sign < 0:
+        return k_sqrt.reciprocal() * artanh(scaled_x)
+    else:
+        return k_sqrt.reciprocal() * scaled_x.atan()
 
 
-@torch.jit.script
-def arsin_k(x: torch.Tensor, k: torch.Tensor):
-    k_sign = k.sign()
-    zero = torch.zeros((), device=k.device, dtype=k.dtype)
-    k_zero = k.isclose(zero)
-    # shrink sign
-    k_sign = torch.masked_fill(k_sign, k_zero, zero.to(k_sign.dtype))
-    if torch.all(k_zero):
+@jit_script
+def arsin_k(x: torch.Tensor, k: torch.Tensor, sign: Optional[int] = None):
+    if sign is None:
+        sign = curvature_sign(k)
+    if sign is not None and sign == 0:
         return arsin_k_zero_taylor(x, k)
     k_sqrt = sabs(k).sqrt()
     scaled_x = x * k_sqrt
 
-    if torch.all(k_sign.lt(0)):
-        return k_sqrt.reciprocal() * arsinh(scaled_x)
-    elif torch.all(k_sign.gt(0)):
-        return k_sqrt.reciprocal() * scaled_x.asin()
-    else:
+    if sign is None:
+        k_sign, k_zero = _mixed_sign(k)
         arsin_k_nonzero = (
             torch.where(
                 k_sign.gt(0),
@@ -261,30 +281,32 @@ def arsin_k(x: torch.Tensor, k: torch.Tensor):
             * k_sqrt.reciprocal()
         )
         return torch.where(k_zero, arsin_k_zero_taylor(x, k, order=1), arsin_k_nonzero)
+    elif sign < 0:
+        return k_sqrt.reciprocal() * arsinh(scaled_x)
+    else:
+        return k_sqrt.reciprocal() * scaled_x.asin()
 
 
-@torch.jit.script
-def sin_k(x: torch.Tensor, k: torch.Tensor):
-    k_sign = k.sign()
-    zero = torch.zeros((), device=k.device, dtype=k.dtype)
-    k_zero = k.isclose(zero)
-    # shrink sign
-    k_sign = torch.masked_fill(k_sign, k_zero, zero.to(k_sign.dtype))
-    if torch.all(k_zero):
+@jit_script
+def sin_k(x: torch.Tensor, k: torch.Tensor, sign: Optional[int] = None):
+    if sign is None:
+        sign = curvature_sign(k)
+    if sign is not None and sign == 0:
         return sin_k_zero_taylor(x, k)
     k_sqrt = sabs(k).sqrt()
     scaled_x = x * k_sqrt
 
-    if torch.all(k_sign.lt(0)):
-        return k_sqrt.reciprocal() * torch.sinh(scaled_x)
-    elif torch.all(k_sign.gt(0)):
-        return k_sqrt.reciprocal() * scaled_x.sin()
-    else:
+    if sign is None:
+        k_sign, k_zero = _mixed_sign(k)
         sin_k_nonzero = (
             torch.where(k_sign.gt(0), scaled_x.sin(), torch.sinh(scaled_x))
             * k_sqrt.reciprocal()
         )
         return torch.where(k_zero, sin_k_zero_taylor(x, k, order=1), sin_k_nonzero)
+    elif sign < 0:
+        return k_sqrt.reciprocal() * torch.sinh(scaled_x)
+    else:
+        return k_sqrt.reciprocal() * scaled_x.sin()
 
 
 def project(x: torch.Tensor, *, k: torch.Tensor, dim=-1, eps=-1):
@@ -310,7 +332,7 @@ def project(x: torch.Tensor, *, k: torch.Tensor, dim=-1, eps=-1):
     return _project(x, k, dim, eps)
 
 
-@torch.jit.script
+@jit_script
 def _project(x, k, dim: int = -1, eps: float = -1.0):
     if eps < 0:
         if x.dtype == torch.float32:
@@ -351,7 +373,7 @@ def lambda_x(x: torch.Tensor, *, k: torch.Tensor, keepdim=False, dim=-1):
     return _lambda_x(x, k, keepdim=keepdim, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _lambda_x(x: torch.Tensor, k: torch.Tensor, keepdim: bool = False, dim: int = -1):
     return 2 / (1 + k * x.pow(2).sum(dim=dim, keepdim=keepdim)).clamp_min(1e-15)
 
@@ -389,7 +411,7 @@ def inner(
     return _inner(x, u, v, k, keepdim=keepdim, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _inner(
     x: torch.Tensor,
     u: torch.Tensor,
@@ -432,7 +454,7 @@ def norm(x: torch.Tensor, u: torch.Tensor, *, k: torch.Tensor, keepdim=False, di
     return _norm(x, u, k, keepdim=keepdim, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _norm(
     x: torch.Tensor,
     u: torch.Tensor,
@@ -506,7 +528,7 @@ def mobius_add(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1):
     return _mobius_add(x, y, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _mobius_add(x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, dim: int = -1):
     x2 = x.pow(2).sum(dim=dim, keepdim=True)
     y2 = y.pow(2).sum(dim=dim, keepdim=True)
@@ -626,7 +648,7 @@ def gyration(
     return _gyration(a, b, u, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _gyration(
     u: torch.Tensor, v: torch.Tensor, w: torch.Tensor, k: torch.Tensor, dim: int = -1
 ):
@@ -700,7 +722,7 @@ def mobius_coadd(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1):
 
 
 # TODO: check numerical stability with Gregor's paper!!!
-@torch.jit.script
+@jit_script
 def _mobius_coadd(x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, dim: int = -1):
     # x2 = x.pow(2).sum(dim=dim, keepdim=True)
     # y2 = y.pow(2).sum(dim=dim, keepdim=True)
@@ -742,7 +764,7 @@ def mobius_cosub(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1):
     return _mobius_cosub(x, y, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _mobius_cosub(x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, dim: int = -1):
     return _mobius_coadd(x, -y, k, dim=dim)
 
@@ -753,7 +775,9 @@ def _mobius_cosub(x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, dim: int =
 # TODO: one could use the scalar associative law
 # TODO: s_1 (X) s_2 (X) x = (s_1*s_2) (X) x
 # TODO: to implement a more stable Möbius scalar mult
-def mobius_scalar_mul(r: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def mobius_scalar_mul(
+    r: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None
+):
     r"""
     Compute the Möbius scalar multiplication.
 
@@ -806,6 +830,8 @@ def mobius_scalar_mul(r: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=
         point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -814,19 +840,31 @@ def mobius_scalar_mul(r: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=
     tensor
         the result of the Möbius scalar multiplication
     """
-    return _mobius_scalar_mul(r, x, k, dim=dim)
+    return _mobius_scalar_mul(r, x, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
+@jit_script
 def _mobius_scalar_mul(
-    r: torch.Tensor, x: torch.Tensor, k: torch.Tensor, dim: int = -1
+    r: torch.Tensor,
+    x: torch.Tensor,
+    k: torch.Tensor,
+    dim: int = -1,
+    sign: Optional[int] = None,
 ):
     x_norm = x.norm(dim=dim, keepdim=True, p=2).clamp_min(1e-15)
-    res_c = tan_k(r * artan_k(x_norm, k), k) * (x / x_norm)
+    res_c = tan_k(r * artan_k(x_norm, k, sign), k, sign) * (x / x_norm)
     return res_c
 
 
-def dist(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, keepdim=False, dim=-1):
+def dist(
+    x: torch.Tensor,
+    y: torch.Tensor,
+    *,
+    k: torch.Tensor,
+    keepdim=False,
+    dim=-1,
+    sign=None,
+):
     r"""
     Compute the geodesic distance between :math:`x` and :math:`y` on the manifold.
 
@@ -844,6 +882,8 @@ def dist(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, keepdim=False, di
         point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     keepdim : bool
         retain the last dim? (default: false)
     dim : int
@@ -854,23 +894,76 @@ def dist(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, keepdim=False, di
     tensor
         geodesic distance between :math:`x` and :math:`y`
     """
-    return _dist(x, y, k, keepdim=keepdim, dim=dim)
+    return _dist(x, y, k, keepdim=keepdim, dim=dim, sign=sign)
 
 
-@torch.jit.script
+@jit_script
 def _dist(
     x: torch.Tensor,
     y: torch.Tensor,
     k: torch.Tensor,
     keepdim: bool = False,
     dim: int = -1,
+    sign: Optional[int] = None,
 ):
     return 2.0 * artan_k(
-        _mobius_add(-x, y, k, dim=dim).norm(dim=dim, p=2, keepdim=keepdim), k
+        _mobius_add(-x, y, k, dim=dim).norm(dim=dim, p=2, keepdim=keepdim), k, sign
     )
 
 
-def dist0(x: torch.Tensor, *, k: torch.Tensor, keepdim=False, dim=-1):
+def pairwise_dist(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, sign=None):
+    r"""
+    Compute the geodesic distance between every pair of rows of :math:`x` and :math:`y`.
+
+    The norm of :math:`(-x)\oplus_\kappa y` is expanded in terms of
+    :math:`\|x\|^2`, :math:`\|y\|^2` and :math:`\langle x, y\rangle`, so
+    the Möbius sums are never materialized and memory stays :math:`O(NM)`.
+
+    .. math::
+
+        \|(-x)\oplus_\kappa y\|_2^2 = \frac{
+            a^2\|x\|^2 - 2ab\langle x, y\rangle + b^2\|y\|^2
+        }{
+            (1 + 2\kappa\langle x, y\rangle + \kappa^2\|x\|^2\|y\|^2)^2
+        },\quad
+        a = 1 + 2\kappa\langle x, y\rangle - \kappa\|y\|^2,\quad
+        b = 1 + \kappa\|x\|^2
+
+    Parameters
+    ----------
+    x : tensor
+        points on manifold, shape :math:`(..., N, D)`
+    y : tensor
+        points on manifold, shape :math:`(..., M, D)`
+    k : tensor
+        sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
+
+    Returns
+    -------
+    tensor
+        geodesic distances, shape :math:`(..., N, M)`
+    """
+    return _pairwise_dist(x, y, k, sign=sign)
+
+
+@jit_script
+def _pairwise_dist(
+    x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, sign: Optional[int] = None
+):
+    x2 = x.pow(2).sum(dim=-1, keepdim=True)
+    y2 = y.pow(2).sum(dim=-1, keepdim=True).transpose(-1, -2)
+    xy = x @ y.transpose(-1, -2)
+    a = 1 + 2 * k * xy - k * y2
+    b = 1 + k * x2
+    num2 = a.pow(2) * x2 - 2 * a * b * xy + b.pow(2) * y2
+    denom = 1 + 2 * k * xy + k**2 * x2 * y2
+    norm = num2.clamp_min(0).sqrt() / denom.clamp_min(1e-15)
+    return 2.0 * artan_k(norm, k, sign)
+
+
+def dist0(x: torch.Tensor, *, k: torch.Tensor, keepdim=False, dim=-1, sign=None):
     r"""
     Compute geodesic distance to the manifold's origin.
 
@@ -880,6 +973,8 @@ def dist0(x: torch.Tensor, *, k: torch.Tensor, keepdim=False, dim=-1):
         point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     keepdim : bool
         retain the last dim? (default: false)
     dim : int
@@ -890,12 +985,18 @@ def dist0(x: torch.Tensor, *, k: torch.Tensor, keepdim=False, dim=-1):
     tensor
         geodesic distance between :math:`x` and :math:`0`
     """
-    return _dist0(x, k, keepdim=keepdim, dim=dim)
+    return _dist0(x, k, keepdim=keepdim, dim=dim, sign=sign)
 
 
-@torch.jit.script
-def _dist0(x: torch.Tensor, k: torch.Tensor, keepdim: bool = False, dim: int = -1):
-    return 2.0 * artan_k(x.norm(dim=dim, p=2, keepdim=keepdim), k)
+@jit_script
+def _dist0(
+    x: torch.Tensor,
+    k: torch.Tensor,
+    keepdim: bool = False,
+    dim: int = -1,
+    sign: Optional[int] = None,
+):
+    return 2.0 * artan_k(x.norm(dim=dim, p=2, keepdim=keepdim), k, sign)
 
 
 def geodesic(
@@ -961,7 +1062,7 @@ def geodesic(
     return _geodesic(t, x, y, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _geodesic(
     t: torch.Tensor, x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, dim: int = -1
 ):
@@ -972,7 +1073,7 @@ def _geodesic(
     return gamma_t
 
 
-def expmap(x: torch.Tensor, u: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def expmap(x: torch.Tensor, u: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None):
     r"""
     Compute the exponential map of :math:`u` at :math:`x`.
 
@@ -1005,6 +1106,8 @@ def expmap(x: torch.Tensor, u: torch.Tensor, *, k: torch.Tensor, dim=-1):
         speed vector in tangent space at x
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1013,19 +1116,25 @@ def expmap(x: torch.Tensor, u: torch.Tensor, *, k: torch.Tensor, dim=-1):
     tensor
         :math:`\gamma_{x, u}(1)` end point
     """
-    return _expmap(x, u, k, dim=dim)
+    return _expmap(x, u, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
-def _expmap(x: torch.Tensor, u: torch.Tensor, k: torch.Tensor, dim: int = -1):
+@jit_script
+def _expmap(
+    x: torch.Tensor,
+    u: torch.Tensor,
+    k: torch.Tensor,
+    dim: int = -1,
+    sign: Optional[int] = None,
+):
     u_norm = u.norm(dim=dim, p=2, keepdim=True).clamp_min(1e-15)
     lam = _lambda_x(x, k, dim=dim, keepdim=True)
-    second_term = tan_k((lam / 2.0) * u_norm, k) * (u / u_norm)
+    second_term = tan_k((lam / 2.0) * u_norm, k, sign) * (u / u_norm)
     y = _mobius_add(x, second_term, k, dim=dim)
     return y
 
 
-def expmap0(u: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def expmap0(u: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None):
     r"""
     Compute the exponential map of :math:`u` at the origin :math:`0`.
 
@@ -1041,6 +1150,8 @@ def expmap0(u: torch.Tensor, *, k: torch.Tensor, dim=-1):
         speed vector on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1049,18 +1160,26 @@ def expmap0(u: torch.Tensor, *, k: torch.Tensor, dim=-1):
     tensor
         :math:`\gamma_{0, u}(1)` end point
     """
-    return _expmap0(u, k, dim=dim)
+    return _expmap0(u, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
-def _expmap0(u: torch.Tensor, k: torch.Tensor, dim: int = -1):
+@jit_script
+def _expmap0(
+    u: torch.Tensor, k: torch.Tensor, dim: int = -1, sign: Optional[int] = None
+):
     u_norm = u.norm(dim=dim, p=2, keepdim=True).clamp_min(1e-15)
-    gamma_1 = tan_k(u_norm, k) * (u / u_norm)
+    gamma_1 = tan_k(u_norm, k, sign) * (u / u_norm)
     return gamma_1
 
 
 def geodesic_unit(
-    t: torch.Tensor, x: torch.Tensor, u: torch.Tensor, *, k: torch.Tensor, dim=-1
+    t: torch.Tensor,
+    x: torch.Tensor,
+    u: torch.Tensor,
+    *,
+    k: torch.Tensor,
+    dim=-1,
+    sign=None,
 ):
     r"""
     Compute the point on the unit speed geodesic.
@@ -1083,6 +1202,8 @@ def geodesic_unit(
         initial direction in tangent space at x
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1091,24 +1212,25 @@ def geodesic_unit(
     tensor
         the point on the unit speed geodesic
     """
-    return _geodesic_unit(t, x, u, k, dim=dim)
+    return _geodesic_unit(t, x, u, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
+@jit_script
 def _geodesic_unit(
     t: torch.Tensor,
     x: torch.Tensor,
     u: torch.Tensor,
     k: torch.Tensor,
     dim: int = -1,
+    sign: Optional[int] = None,
 ):
     u_norm = u.norm(dim=dim, p=2, keepdim=True).clamp_min(1e-15)
-    second_term = tan_k(t / 2.0, k) * (u / u_norm)
+    second_term = tan_k(t / 2.0, k, sign) * (u / u_norm)
     gamma_1 = _mobius_add(x, second_term, k, dim=dim)
     return gamma_1
 
 
-def logmap(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def logmap(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None):
     r"""
     Compute the logarithmic map of :math:`y` at :math:`x`.
 
@@ -1134,6 +1256,8 @@ def logmap(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1):
         target point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1142,18 +1266,24 @@ def logmap(x: torch.Tensor, y: torch.Tensor, *, k: torch.Tensor, dim=-1):
     tensor
         tangent vector :math:`u\in T_x M` that transports :math:`x` to :math:`y`
     """
-    return _logmap(x, y, k, dim=dim)
+    return _logmap(x, y, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
-def _logmap(x: torch.Tensor, y: torch.Tensor, k: torch.Tensor, dim: int = -1):
+@jit_script
+def _logmap(
+    x: torch.Tensor,
+    y: torch.Tensor,
+    k: torch.Tensor,
+    dim: int = -1,
+    sign: Optional[int] = None,
+):
     sub = _mobius_add(-x, y, k, dim=dim)
     sub_norm = sub.norm(dim=dim, p=2, keepdim=True).clamp_min(1e-15)
     lam = _lambda_x(x, k, keepdim=True, dim=dim)
-    return 2.0 * artan_k(sub_norm, k) * (sub / (lam * sub_norm))
+    return 2.0 * artan_k(sub_norm, k, sign) * (sub / (lam * sub_norm))
 
 
-def logmap0(y: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def logmap0(y: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None):
     r"""
     Compute the logarithmic map of :math:`y` at the origin :math:`0`.
 
@@ -1176,6 +1306,8 @@ def logmap0(y: torch.Tensor, *, k: torch.Tensor, dim=-1):
         target point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1184,16 +1316,18 @@ def logmap0(y: torch.Tensor, *, k: torch.Tensor, dim=-1):
     tensor
         tangent vector :math:`u\in T_0 M` that transports :math:`0` to :math:`y`
     """
-    return _logmap0(y, k, dim=dim)
+    return _logmap0(y, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
-def _logmap0(y: torch.Tensor, k, dim: int = -1):
+@jit_script
+def _logmap0(y: torch.Tensor, k, dim: int = -1, sign: Optional[int] = None):
     y_norm = y.norm(dim=dim, p=2, keepdim=True).clamp_min(1e-15)
-    return (y / y_norm) * artan_k(y_norm, k)
+    return (y / y_norm) * artan_k(y_norm, k, sign)
 
 
-def mobius_matvec(m: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def mobius_matvec(
+    m: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None
+):
     r"""
     Compute the generalization of matrix-vector multiplication in gyrovector spaces.
 
@@ -1216,6 +1350,8 @@ def mobius_matvec(m: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1):
         point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1224,11 +1360,17 @@ def mobius_matvec(m: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1):
     tensor
         Möbius matvec result
     """
-    return _mobius_matvec(m, x, k, dim=dim)
+    return _mobius_matvec(m, x, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
-def _mobius_matvec(m: torch.Tensor, x: torch.Tensor, k: torch.Tensor, dim: int = -1):
+@jit_script
+def _mobius_matvec(
+    m: torch.Tensor,
+    x: torch.Tensor,
+    k: torch.Tensor,
+    dim: int = -1,
+    sign: Optional[int] = None,
+):
     if m.dim() > 2 and dim != -1:
         raise RuntimeError(
             "broadcasted Möbius matvec is supported for the last dim only"
@@ -1239,7 +1381,7 @@ def _mobius_matvec(m: torch.Tensor, x: torch.Tensor, k: torch.Tensor, dim: int =
     else:
         mx = x @ m.transpose(-1, -2)
     mx_norm = mx.norm(dim=dim, keepdim=True, p=2).clamp_min(1e-15)
-    res_c = tan_k(mx_norm / x_norm * artan_k(x_norm, k), k) * (mx / mx_norm)
+    res_c = tan_k(mx_norm / x_norm * artan_k(x_norm, k, sign), k, sign) * (mx / mx_norm)
     cond = (mx == 0).prod(dim=dim, keepdim=True, dtype=torch.bool)
     res_0 = torch.zeros(1, dtype=res_c.dtype, device=res_c.device)
     res = torch.where(cond, res_0, res_c)
@@ -1250,7 +1392,9 @@ def _mobius_matvec(m: torch.Tensor, x: torch.Tensor, k: torch.Tensor, dim: int =
 
 # TODO: check if this extends to gyrovector spaces for positive curvature
 # TODO: add plot
-def mobius_pointwise_mul(w: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1):
+def mobius_pointwise_mul(
+    w: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, dim=-1, sign=None
+):
     r"""
     Compute the generalization for point-wise multiplication in gyrovector spaces.
 
@@ -1271,6 +1415,8 @@ def mobius_pointwise_mul(w: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, d
         point on manifold
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     dim : int
         reduction dimension for operations
 
@@ -1279,17 +1425,21 @@ def mobius_pointwise_mul(w: torch.Tensor, x: torch.Tensor, *, k: torch.Tensor, d
     tensor
         Möbius point-wise mul result
     """
-    return _mobius_pointwise_mul(w, x, k, dim=dim)
+    return _mobius_pointwise_mul(w, x, k, dim=dim, sign=sign)
 
 
-@torch.jit.script
+@jit_script
 def _mobius_pointwise_mul(
-    w: torch.Tensor, x: torch.Tensor, k: torch.Tensor, dim: int = -1
+    w: torch.Tensor,
+    x: torch.Tensor,
+    k: torch.Tensor,
+    dim: int = -1,
+    sign: Optional[int] = None,
 ):
     x_norm = x.norm(dim=dim, keepdim=True, p=2).clamp_min(1e-15)
     wx = w * x
     wx_norm = wx.norm(dim=dim, keepdim=True, p=2).clamp_min(1e-15)
-    res_c = tan_k(wx_norm / x_norm * artan_k(x_norm, k), k) * (wx / wx_norm)
+    res_c = tan_k(wx_norm / x_norm * artan_k(x_norm, k, sign), k, sign) * (wx / wx_norm)
     zero = torch.zeros((), dtype=res_c.dtype, device=res_c.device)
     cond = wx.isclose(zero).prod(dim=dim, keepdim=True, dtype=torch.bool)
     res = torch.where(cond, zero, res_c)
@@ -1433,6 +1583,7 @@ def dist2plane(
     signed=False,
     scaled=False,
     dim=-1,
+    sign=None,
 ):
     r"""
     Geodesic distance from :math:`x` to a hyperplane :math:`H_{a, b}`.
@@ -1547,6 +1698,8 @@ def dist2plane(
         point on manifold lying on the hyperplane
     k : tensor
         sectional curvature of manifold
+    sign : int, optional
+        sign of the curvature if known (see :func:`curvature_sign`)
     keepdim : bool
         retain the last dim? (default: false)
     signed : bool
@@ -1562,11 +1715,11 @@ def dist2plane(
         distance to the hyperplane
     """
     return _dist2plane(
-        x, a, p, k, keepdim=keepdim, signed=signed, dim=dim, scaled=scaled
+        x, a, p, k, keepdim=keepdim, signed=signed, dim=dim, scaled=scaled, sign=sign
     )
 
 
-@torch.jit.script
+@jit_script
 def _dist2plane(
     x: torch.Tensor,
     a: torch.Tensor,
@@ -1576,6 +1729,7 @@ def _dist2plane(
     signed: bool = False,
     scaled: bool = False,
     dim: int = -1,
+    sign: Optional[int] = None,
 ):
     diff = _mobius_add(-p, x, k, dim=dim)
     diff_norm2 = diff.pow(2).sum(dim=dim, keepdim=keepdim).clamp_min(1e-15)
@@ -1585,7 +1739,7 @@ def _dist2plane(
     a_norm = a.norm(dim=dim, keepdim=keepdim, p=2)
     num = 2.0 * sc_diff_a
     denom = clamp_abs((1 + k * diff_norm2) * a_norm)
-    distance = arsin_k(num / denom, k)
+    distance = arsin_k(num / denom, k, sign)
     if scaled:
         distance = distance * a_norm
     return distance
@@ -1660,7 +1814,7 @@ def parallel_transport(
     return _parallel_transport(x, y, v, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _parallel_transport(
     x: torch.Tensor, y: torch.Tensor, u: torch.Tensor, k: torch.Tensor, dim: int = -1
 ):
@@ -1697,7 +1851,7 @@ def parallel_transport0(y: torch.Tensor, v: torch.Tensor, *, k: torch.Tensor, di
     return _parallel_transport0(y, v, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _parallel_transport0(
     y: torch.Tensor, v: torch.Tensor, k: torch.Tensor, dim: int = -1
 ):
@@ -1731,7 +1885,7 @@ def parallel_transport0back(
     return _parallel_transport0back(x, v, k=k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _parallel_transport0back(
     x: torch.Tensor, v: torch.Tensor, k: torch.Tensor, dim: int = -1
 ):
@@ -1765,7 +1919,7 @@ def egrad2rgrad(x: torch.Tensor, grad: torch.Tensor, *, k: torch.Tensor, dim=-1)
     return _egrad2rgrad(x, grad, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _egrad2rgrad(x: torch.Tensor, grad: torch.Tensor, k: torch.Tensor, dim: int = -1):
     return grad / _lambda_x(x, k, keepdim=True, dim=dim) ** 2
 
@@ -1791,7 +1945,7 @@ def sproj(x: torch.Tensor, *, k: torch.Tensor, dim: int = -1):
     return _sproj(x, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _sproj(x: torch.Tensor, k: torch.Tensor, dim: int = -1):
     inv_r = torch.sqrt(sabs(k))
     factor = 1.0 / (1.0 + inv_r * x.narrow(dim, -1, 1))
@@ -1820,7 +1974,7 @@ def inv_sproj(x: torch.Tensor, *, k: torch.Tensor, dim: int = -1):
     return _inv_sproj(x, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _inv_sproj(x: torch.Tensor, k: torch.Tensor, dim: int = -1):
     inv_r = torch.sqrt(sabs(k))
     lam_x = _lambda_x(x, k, keepdim=True, dim=dim)
@@ -1861,7 +2015,7 @@ def antipode(x: torch.Tensor, *, k: torch.Tensor, dim: int = -1):
     return _antipode(x, k, dim=dim)
 
 
-@torch.jit.script
+@jit_script
 def _antipode(x: torch.Tensor, k: torch.Tensor, dim: int = -1):
     # NOTE: implementation that uses stereographic projections seems to be less accurate
     # sproj(-inv_sproj(x))
@@ -1,7 +1,19 @@
 from ..manifolds import Euclidean
+from ..tensor import ManifoldParameter, ManifoldTensor
 import torch
 
 
+def cat_rows(tensors):
+    """Concatenates tensors sharing their last dimension into one `(rows, dim)` matrix."""
+    return torch.cat([tensor.reshape(-1, tensor.shape[-1]) for tensor in tensors])
+
+
+def split_rows(matrix, like):
+    """Inverse of :func:`cat_rows`: views of ``matrix`` shaped like the tensors in ``like``."""
+    chunks = matrix.split([tensor.numel() // tensor.shape[-1] for tensor in like])
+    return [chunk.view(tensor.shape) for chunk, tensor in zip(chunks, like)]
+
+
 class OptimMixin(object):
     _default_manifold = Euclidean()
 
@@ -16,6 +28,41 @@ class OptimMixin(object):
     def stabilize_group(self, group):
         pass
 
+    def _use_foreach(self, group):
+        """
+        Whether to take the multi-tensor path, ``foreach=None`` (default) takes it
+        when every parameter of the group is on CUDA, like :mod:`torch.optim`.
+        """
+        foreach = group.get("foreach")
+        if foreach is None:
+            return all(p.is_cuda for p in group["params"])
+        return foreach
+
+    def _foreach_buckets(self, points, key=None):
+        """
+        Splits ``points`` into Euclidean ones (updated with ``torch._foreach_*`` ops),
+        buckets of points on the same manifold instance (hence curvature) with a
+        row-wise geometry (``ndim == 1``) and the same device, dtype, last dimension
+        and ``key(point)`` (updated as one concatenated matrix), and the rest
+        (updated one at a time).
+        """
+        euclidean, buckets, rest = [], {}, []
+        for point in points:
+            if isinstance(point, (ManifoldParameter, ManifoldTensor)):
+                manifold = point.manifold
+            else:
+                manifold = self._default_manifold
+            if isinstance(manifold, Euclidean):
+                euclidean.append(point)
+            elif manifold.ndim == 1 and point.dim() >= 1:
+                bucket = (id(manifold), point.device, point.dtype, point.shape[-1])
+                if key is not None:
+                    bucket += (key(point),)
+                buckets.setdefault(bucket, (manifold, []))[1].append(point)
+            else:
+                rest.append(point)
+        return euclidean, list(buckets.values()), rest
+
     def stabilize(self):
         """Stabilize parameters if they are off-manifold due to numerical reasons."""
         for group in self.param_groups:
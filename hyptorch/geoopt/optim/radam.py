@@ -1,6 +1,6 @@
 import torch.optim
 
-from .mixin import OptimMixin
+from .mixin import OptimMixin, cat_rows, split_rows
 from ..tensor import ManifoldParameter, ManifoldTensor
 
 
@@ -30,6 +30,10 @@ class RiemannianAdam(OptimMixin, torch.optim.Adam):
         whether to use the AMSGrad variant of this
         algorithm from the paper `On the Convergence of Adam and Beyond`_
         (default: False)
+    foreach : bool (optional)
+        update Euclidean parameters with multi-tensor ``torch._foreach_*`` ops and
+        parameters of the same row-wise manifold as one matrix, ``None`` does it
+        when all parameters are on CUDA (default: None)
 
     Other Parameters
     ----------------
@@ -55,7 +59,10 @@ class RiemannianAdam(OptimMixin, torch.optim.Adam):
                 learning_rate = group["lr"]
                 amsgrad = group["amsgrad"]
                 stablilize = False
-                for point in group["params"]:
+                points = group["params"]
+                if self._use_foreach(group):
+                    points, stablilize = self._foreach_step(group)
+                for point in points:
                     grad = point.grad
                     if grad is None:
                         continue
@@ -122,6 +129,104 @@ class RiemannianAdam(OptimMixin, torch.optim.Adam):
                     self.stabilize_group(group)
         return loss
 
+    def _foreach_step(self, group):
+        """
+        Multi-tensor version of the loop in :meth:`step` with the same numerics.
+        Returns the points left for the loop and whether the group is due for
+        stabilization.
+        """
+        points = []
+        for point in group["params"]:
+            if point.grad is None:
+                continue
+            if point.grad.is_sparse:
+                raise RuntimeError(
+                    "RiemannianAdam does not support sparse gradients, use SparseRiemannianAdam instead"
+                )
+            points.append(point)
+        # bias corrections are shared inside a bucket, so the step is part of its key
+        euclidean, buckets, rest = self._foreach_buckets(
+            points, key=lambda point: self.state[point].get("step", 0)
+        )
+        stablilize = False
+        for point in euclidean + [point for _, bucket in buckets for point in bucket]:
+            state = self.state[point]
+            if len(state) == 0:
+                state["step"] = 0
+                state["exp_avg"] = torch.zeros_like(point)
+                state["exp_avg_sq"] = torch.zeros_like(point)
+                if group["amsgrad"]:
+                    state["max_exp_avg_sq"] = torch.zeros_like(point)
+            state["step"] += 1
+            if group["stabilize"] is not None and state["step"] % group["stabilize"] == 0:
+                stablilize = True
+        if euclidean:
+            self._euclidean_step(group, euclidean)
+        for manifold, bucket in buckets:
+            self._manifold_step(group, manifold, bucket)
+        return rest, stablilize
+
+    def _euclidean_step(self, group, points):
+        betas = group["betas"]
+        states = [self.state[point] for point in points]
+        grads = [point.grad for point in points]
+        exp_avgs = [state["exp_avg"] for state in states]
+        exp_avg_sqs = [state["exp_avg_sq"] for state in states]
+        if group["weight_decay"] != 0:
+            torch._foreach_add_(grads, points, alpha=group["weight_decay"])
+        torch._foreach_mul_(exp_avgs, betas[0])
+        torch._foreach_add_(exp_avgs, grads, alpha=1 - betas[0])
+        torch._foreach_mul_(exp_avg_sqs, betas[1])
+        torch._foreach_add_(exp_avg_sqs, torch._foreach_mul(grads, grads), alpha=1 - betas[1])
+        bias_correction1 = [1 - betas[0] ** state["step"] for state in states]
+        bias_correction2 = [1 - betas[1] ** state["step"] for state in states]
+        if group["amsgrad"]:
+            max_exp_avg_sqs = [state["max_exp_avg_sq"] for state in states]
+            torch._foreach_maximum_(max_exp_avg_sqs, exp_avg_sqs)
+            denom = torch._foreach_div(max_exp_avg_sqs, bias_correction2)
+        else:
+            denom = torch._foreach_div(exp_avg_sqs, bias_correction2)
+        torch._foreach_sqrt_(denom)
+        torch._foreach_add_(denom, group["eps"])
+        direction = torch._foreach_div(exp_avgs, bias_correction1)
+        torch._foreach_div_(direction, denom)
+        # Euclidean retraction, the averages are transported as they are
+        torch._foreach_mul_(direction, -group["lr"])
+        torch._foreach_add_(points, direction)
+
+    def _manifold_step(self, group, manifold, points):
+        betas = group["betas"]
+        states = [self.state[point] for point in points]
+        names = ["exp_avg", "exp_avg_sq"] + (["max_exp_avg_sq"] if group["amsgrad"] else [])
+        buffers = {name: cat_rows([state[name] for state in states]) for name in names}
+        exp_avg, exp_avg_sq = buffers["exp_avg"], buffers["exp_avg_sq"]
+        point = cat_rows(points)
+        grad = cat_rows([p.grad for p in points])
+        # same as the loop in `step`, on the rows of every point at once
+        grad.add_(point, alpha=group["weight_decay"])
+        grad = manifold.egrad2rgrad(point, grad)
+        exp_avg.mul_(betas[0]).add_(grad, alpha=1 - betas[0])
+        exp_avg_sq.mul_(betas[1]).add_(
+            manifold.component_inner(point, grad), alpha=1 - betas[1]
+        )
+        bias_correction1 = 1 - betas[0] ** states[0]["step"]
+        bias_correction2 = 1 - betas[1] ** states[0]["step"]
+        if group["amsgrad"]:
+            max_exp_avg_sq = buffers["max_exp_avg_sq"]
+            torch.max(max_exp_avg_sq, exp_avg_sq, out=max_exp_avg_sq)
+            denom = max_exp_avg_sq.div(bias_correction2).sqrt_()
+        else:
+            denom = exp_avg_sq.div(bias_correction2).sqrt_()
+        direction = exp_avg.div(bias_correction1) / denom.add_(group["eps"])
+        new_point, buffers["exp_avg"] = manifold.retr_transp(
+            point, -group["lr"] * direction, exp_avg
+        )
+        for target, value in zip(points, split_rows(new_point, points)):
+            target.copy_(value)
+        for name in names:
+            for state, value in zip(states, split_rows(buffers[name], points)):
+                state[name].copy_(value)
+
     @torch.no_grad()
     def stabilize_group(self, group):
         for p in group["params"]:
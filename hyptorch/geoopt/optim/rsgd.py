@@ -1,6 +1,6 @@
 import torch.optim.optimizer
 from ..tensor import ManifoldParameter, ManifoldTensor
-from .mixin import OptimMixin
+from .mixin import OptimMixin, cat_rows, split_rows
 
 __all__ = ["RiemannianSGD"]
 
@@ -24,6 +24,10 @@ class RiemannianSGD(OptimMixin, torch.optim.Optimizer):
         dampening for momentum (default: 0)
     nesterov : bool (optional)
         enables Nesterov momentum (default: False)
+    foreach : bool (optional)
+        update Euclidean parameters with multi-tensor ``torch._foreach_*`` ops and
+        parameters of the same row-wise manifold as one matrix, ``None`` does it
+        when all parameters are on CUDA (default: None)
 
     Other Parameters
     ----------------
@@ -41,6 +45,7 @@ class RiemannianSGD(OptimMixin, torch.optim.Optimizer):
         weight_decay=0,
         nesterov=False,
         stabilize=None,
+        foreach=None,
     ):
         if lr < 0.0:
             raise ValueError("Invalid learning rate: {}".format(lr))
@@ -55,6 +60,7 @@ class RiemannianSGD(OptimMixin, torch.optim.Optimizer):
             dampening=dampening,
             weight_decay=weight_decay,
             nesterov=nesterov,
+            foreach=foreach,
         )
         if nesterov and (momentum <= 0 or dampening != 0):
             raise ValueError("Nesterov momentum requires a momentum and zero dampening")
@@ -74,7 +80,10 @@ class RiemannianSGD(OptimMixin, torch.optim.Optimizer):
                 nesterov = group["nesterov"]
                 learning_rate = group["lr"]
                 group["step"] += 1
-                for point in group["params"]:
+                points = group["params"]
+                if self._use_foreach(group):
+                    points = self._foreach_step(group)
+                for point in points:
                     grad = point.grad
                     if grad is None:
                         continue
@@ -120,6 +129,72 @@ class RiemannianSGD(OptimMixin, torch.optim.Optimizer):
                     self.stabilize_group(group)
         return loss
 
+    def _foreach_step(self, group):
+        """
+        Multi-tensor version of the loop in :meth:`step` with the same numerics.
+        Returns the points left for the loop.
+        """
+        points = []
+        for point in group["params"]:
+            if point.grad is None:
+                continue
+            if point.grad.is_sparse:
+                raise RuntimeError(
+                    "RiemannianSGD does not support sparse gradients, use SparseRiemannianSGD instead"
+                )
+            points.append(point)
+        euclidean, buckets, rest = self._foreach_buckets(points)
+        for point in euclidean + [point for _, bucket in buckets for point in bucket]:
+            state = self.state[point]
+            if len(state) == 0 and group["momentum"] > 0:
+                state["momentum_buffer"] = point.grad.clone()
+        if euclidean:
+            self._euclidean_step(group, euclidean)
+        for manifold, bucket in buckets:
+            self._manifold_step(group, manifold, bucket)
+        return rest
+
+    def _euclidean_step(self, group, points):
+        momentum = group["momentum"]
+        grads = [point.grad for point in points]
+        if group["weight_decay"] != 0:
+            torch._foreach_add_(grads, points, alpha=group["weight_decay"])
+        if momentum > 0:
+            momentum_buffers = [self.state[point]["momentum_buffer"] for point in points]
+            torch._foreach_mul_(momentum_buffers, momentum)
+            torch._foreach_add_(momentum_buffers, grads, alpha=1 - group["dampening"])
+            if group["nesterov"]:
+                torch._foreach_add_(grads, momentum_buffers, alpha=momentum)
+            else:
+                grads = momentum_buffers
+        # Euclidean retraction, the momentum is transported as it is
+        torch._foreach_add_(points, torch._foreach_mul(grads, -group["lr"]))
+
+    def _manifold_step(self, group, manifold, points):
+        momentum = group["momentum"]
+        point = cat_rows(points)
+        grad = cat_rows([p.grad for p in points])
+        # same as the loop in `step`, on the rows of every point at once
+        grad.add_(point, alpha=group["weight_decay"])
+        grad = manifold.egrad2rgrad(point, grad)
+        if momentum > 0:
+            states = [self.state[p] for p in points]
+            momentum_buffer = cat_rows([state["momentum_buffer"] for state in states])
+            momentum_buffer.mul_(momentum).add_(grad, alpha=1 - group["dampening"])
+            if group["nesterov"]:
+                grad = grad.add_(momentum_buffer, alpha=momentum)
+            else:
+                grad = momentum_buffer
+            new_point, new_momentum_buffer = manifold.retr_transp(
+                point, -group["lr"] * grad, momentum_buffer
+            )
+            for state, value in zip(states, split_rows(new_momentum_buffer, points)):
+                state["momentum_buffer"].copy_(value)
+        else:
+            new_point = manifold.retr(point, -group["lr"] * grad)
+        for target, value in zip(points, split_rows(new_point, points)):
+            target.copy_(value)
+
     @torch.no_grad()
     def stabilize_group(self, group):
         for p in group["params"]:
@@ -1,4 +1,5 @@
 import itertools
+import os
 from typing import Tuple, Any, Union, List
 import torch.jit
 import functools
@@ -20,8 +21,52 @@ __all__ = [
     "prod",
     "clamp_abs",
     "sabs",
+    "jit_script",
 ]
 
+# "lazy" (default) compiles the TorchScript functions on their first call, "eager"
+# at import as torch.jit.script does, "off" runs them as plain python functions
+JIT_MODE = os.environ.get("HYPTORCH_JIT", "lazy")
+
+
+class _LazyScript:
+    """`torch.jit.script(fn)`, compiled on the first call."""
+
+    def __init__(self, fn):
+        functools.update_wrapper(self, fn)
+        self.fn = fn
+        self.compiled = None
+        self.compiling = False
+
+    def script(self):
+        if self.compiled is None:
+            # TorchScript resolves callees through the module globals, it has to see
+            # them compiled, so the lazy ones are compiled and swapped in first
+            # (co_names also holds attribute names, e.g. `x.sign()` in `sign`)
+            self.compiling = True
+            try:
+                scope = self.fn.__globals__
+                for name in self.fn.__code__.co_names:
+                    callee = scope.get(name)
+                    if isinstance(callee, _LazyScript) and not callee.compiling:
+                        scope[name] = callee.script()
+                self.compiled = torch.jit.script(self.fn)
+            finally:
+                self.compiling = False
+        return self.compiled
+
+    def __call__(self, *args, **kwargs):
+        return self.script()(*args, **kwargs)
+
+
+def jit_script(fn):
+    """`torch.jit.script` that follows `HYPTORCH_JIT`, lazy by default to keep imports fast."""
+    if JIT_MODE == "eager":
+        return torch.jit.script(fn)
+    if JIT_MODE == "off":
+        return fn
+    return _LazyScript(fn)
+
 COMPLEX_DTYPES = {torch.complex64, torch.complex128}
 if hasattr(torch, "complex32"):
     COMPLEX_DTYPES.add(torch.complex32)
@@ -47,23 +92,23 @@ def prod(items):
     return functools.reduce(operator.mul, items, 1)
 
 
-@torch.jit.script
+@jit_script
 def sign(x):
     return torch.sign(x.sign() + 0.5)
 
 
-@torch.jit.script
+@jit_script
 def sabs(x, eps: float = 1e-15):
     return x.abs().add_(eps)
 
 
-@torch.jit.script
+@jit_script
 def clamp_abs(x, eps: float = 1e-15):
     s = sign(x)
     return s * sabs(x, eps=eps)
 
 
-@torch.jit.script
+@jit_script
 def idx2sign(idx: int, dim: int, neg: bool = True):
     """
     Unify idx to be negative or positive, that helps in cases of broadcasting.
@@ -90,7 +135,7 @@ def idx2sign(idx: int, dim: int, neg: bool = True):
         return idx % dim
 
 
-@torch.jit.script
+@jit_script
 def drop_dims(tensor: torch.Tensor, dims: List[int]):
     # Workaround to drop several dims in :func:`torch.squeeze`.
     seen: int = 0
@@ -100,7 +145,7 @@ def drop_dims(tensor: torch.Tensor, dims: List[int]):
     return tensor
 
 
-@torch.jit.script
+@jit_script
 def list_range(end: int):
     res: List[int] = []
     for d in range(end):
@@ -108,7 +153,7 @@ def list_range(end: int):
     return res
 
 
-@torch.jit.script
+@jit_script
 def canonical_dims(dims: List[int], maxdim: int):
     result: List[int] = []
     for idx in dims:
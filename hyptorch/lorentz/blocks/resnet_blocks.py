@@ -18,6 +18,7 @@ def get_Conv2d(
     padding=0,
     bias=True,
     LFC_normalize=False,
+    dropout=0.1,
 ):
     return LorentzConv2d(
         manifold=manifold,
@@ -28,6 +29,7 @@ def get_Conv2d(
         padding=padding,
         bias=bias,
         LFC_normalize=LFC_normalize,
+        dropout=dropout,
     )
 
 
@@ -42,14 +44,14 @@ def get_Activation(manifold):
 class LorentzInputBlock(nn.Module):
     """Input Block of ResNet model"""
 
-    def __init__(self, manifold: CustomLorentz, img_dim, in_channels, bias=True):
+    def __init__(self, manifold: CustomLorentz, img_dim, in_channels, bias=True, dropout=0.1):
         super(LorentzInputBlock, self).__init__()
 
         self.manifold = manifold
 
         self.conv = nn.Sequential(
             get_Conv2d(
-                self.manifold, img_dim, in_channels, kernel_size=3, padding=1, bias=bias
+                self.manifold, img_dim, in_channels, kernel_size=3, padding=1, bias=bias, dropout=dropout
             ),
             get_BatchNorm2d(self.manifold, in_channels),
             get_Activation(self.manifold),
@@ -67,7 +69,7 @@ class LorentzBasicBlock(nn.Module):
     expansion = 1
 
     def __init__(
-        self, manifold: CustomLorentz, in_channels, out_channels, stride=1, bias=True
+        self, manifold: CustomLorentz, in_channels, out_channels, stride=1, bias=True, dropout=0.1
     ):
         super(LorentzBasicBlock, self).__init__()
 
@@ -84,6 +86,7 @@ class LorentzBasicBlock(nn.Module):
                 stride=stride,
                 padding=1,
                 bias=bias,
+                dropout=dropout,
             ),
             get_BatchNorm2d(self.manifold, out_channels),
             get_Activation(self.manifold),
@@ -94,6 +97,7 @@ class LorentzBasicBlock(nn.Module):
                 kernel_size=3,
                 padding=1,
                 bias=bias,
+                dropout=dropout,
             ),
             get_BatchNorm2d(self.manifold, out_channels * LorentzBasicBlock.expansion),
         )
@@ -110,6 +114,7 @@ class LorentzBasicBlock(nn.Module):
                     stride=stride,
                     padding=0,
                     bias=bias,
+                    dropout=dropout,
                 ),
                 get_BatchNorm2d(
                     self.manifold, out_channels * LorentzBasicBlock.expansion
@@ -137,7 +142,7 @@ class LorentzBottleneck(nn.Module):
     expansion = 4
 
     def __init__(
-        self, manifold: CustomLorentz, in_channels, out_channels, stride=1, bias=False
+        self, manifold: CustomLorentz, in_channels, out_channels, stride=1, bias=False, dropout=0.1
     ):
         super(LorentzBottleneck, self).__init__()
 
@@ -153,6 +158,7 @@ class LorentzBottleneck(nn.Module):
                 kernel_size=1,
                 padding=0,
                 bias=bias,
+                dropout=dropout,
             ),
             get_BatchNorm2d(self.manifold, out_channels),
             get_Activation(self.manifold),
@@ -164,6 +170,7 @@ class LorentzBottleneck(nn.Module):
                 stride=stride,
                 padding=1,
                 bias=bias,
+                dropout=dropout,
             ),
             get_BatchNorm2d(self.manifold, out_channels),
             get_Activation(self.manifold),
@@ -174,6 +181,7 @@ class LorentzBottleneck(nn.Module):
                 kernel_size=1,
                 padding=0,
                 bias=bias,
+                dropout=dropout,
             ),
             get_BatchNorm2d(self.manifold, out_channels * LorentzBottleneck.expansion),
         )
@@ -190,6 +198,7 @@ class LorentzBottleneck(nn.Module):
                     stride=stride,
                     padding=0,
                     bias=bias,
+                    dropout=dropout,
                 ),
                 get_BatchNorm2d(
                     self.manifold, out_channels * LorentzBottleneck.expansion
@@ -3,7 +3,48 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 from hyptorch.geoopt import ManifoldParameter
+from hyptorch.geoopt.manifolds.lorentz.math import EXP_MAX_NORM
+from hyptorch.geoopt.utils import jit_script
 from hyptorch.lorentz.manifold import CustomLorentz
+from hyptorch.lorentz.layers.LFC import _add_time
+
+
+@jit_script
+def _frozen_batch_norm(
+    x: torch.Tensor,
+    mean: torch.Tensor,
+    mean_back: torch.Tensor,
+    mean_dir: torch.Tensor,
+    beta: torch.Tensor,
+    beta_back: torch.Tensor,
+    beta_dir: torch.Tensor,
+    factor: torch.Tensor,
+    sign: torch.Tensor,
+    k: torch.Tensor,
+    max_norm: float,
+):
+    """
+    Eval-mode Lorentz batch norm with the running mean `mean` and `beta` fixed.
+    Both parallel transports are rank-one updates `v - <a, v>_L c`, `sign` flips
+    the time component so Lorentz inner products with constants are dot products.
+    """
+    # logmap(mean, x)
+    mx = (x * (mean * sign)).sum(dim=-1, keepdim=True)
+    z = -mx / k
+    dist = torch.sqrt(k) * torch.log(z + torch.sqrt(torch.clamp_min(z.double().pow(2) - 1.0, 1e-15))).to(z.dtype)
+    x_T = x + mx / k * mean
+    x_T = dist * x_T / torch.sqrt(torch.clamp_min((x_T * x_T * sign).sum(dim=-1, keepdim=True), 1e-8))
+    # transp0back(mean), rescale, transp0(beta)
+    x_T = x_T - (x_T * mean_back).sum(dim=-1, keepdim=True) * mean_dir
+    x_T = x_T * factor
+    x_T = x_T - (x_T * beta_back).sum(dim=-1, keepdim=True) * beta_dir
+    # expmap(beta, proju(beta, x_T))
+    x_T = x_T + (x_T * (beta * sign)).sum(dim=-1, keepdim=True) / k * beta
+    norm = torch.sqrt(torch.clamp_min((x_T * x_T * sign).sum(dim=-1, keepdim=True), 1e-8))
+    x_T = x_T / norm
+    norm = (norm / torch.sqrt(k)).clamp_max(max_norm)
+    output = torch.cosh(norm) * beta + torch.sqrt(k) * torch.sinh(norm) * x_T
+    return _add_time(output.narrow(-1, 1, output.shape[-1] - 1), k)
 
 
 class LorentzBatchNorm(nn.Module):
@@ -23,12 +64,46 @@ class LorentzBatchNorm(nn.Module):
         # running statistics
         self.register_buffer("running_mean", torch.zeros(num_features))
         self.register_buffer("running_var", torch.ones((1,)))
+        self.fused = None
+
+    def _transport_constants(self, x, sign, back):
+        """`(a, c)` such that transp0(x, v) (transp0back if `back`) is `v - (v * a).sum(-1) * c`."""
+        lmap, other = self.manifold.logmap0(x), self.manifold.logmap0back(x)
+        if back:
+            lmap, other = other, lmap
+        return lmap * sign, (lmap + other) / self.manifold.dist0(x) ** 2
+
+    @torch.no_grad()
+    def fuse(self):
+        """
+        Precomputes the eval-mode constants (running mean on the manifold, both
+        transports and the rescaling) until the next `train()`. Call it again
+        after loading weights or moving the module.
+        """
+        mean = self.manifold.expmap0(self.running_mean)
+        sign = torch.ones_like(mean)
+        sign[0] = -1
+        beta = self.beta.detach().clone()
+        self.fused = (
+            mean, *self._transport_constants(mean, sign, back=True),
+            beta, *self._transport_constants(beta, sign, back=False),
+            self.gamma / (self.running_var + self.eps), sign,
+        )
+        return self
+
+    def train(self, mode=True):
+        if mode:
+            self.fused = None
+        return super().train(mode)
 
     def forward(self, x, momentum=0.1):
         assert (len(x.shape) == 2) or (
             len(x.shape) == 3
         ), "Wrong input shape in Lorentz batch normalization."
 
+        if self.fused is not None and not self.training:
+            return _frozen_batch_norm(x, *self.fused, self.manifold.k, float(EXP_MAX_NORM))
+
         beta = self.beta
 
         if self.training:
@@ -106,12 +181,25 @@ class LorentzLayerNorm(nn.Module):
         super(LorentzLayerNorm, self).__init__()
         self.manifold = manifold
         self.layernorm = nn.LayerNorm(num_features - 1)  
+        self.fused = False
+
+    def fuse(self):
+        """Scripted `add_time` in eval mode until the next `train()`."""
+        self.fused = True
+        return self
+
+    def train(self, mode=True):
+        if mode:
+            self.fused = False
+        return super().train(mode)
 
     def forward(self, x ):
         # x = self.manifold.logmap0(x)
         # print(x)
         dn = x.shape[-1] - 1
         x = self.layernorm(x.narrow(-1, 1, dn)) 
+        if self.fused and not self.training:
+            return _add_time(x, self.manifold.k)
         x = self.manifold.add_time(x) 
         # x = self.manifold.expmap0(x) 
         return x 
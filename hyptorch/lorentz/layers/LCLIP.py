@@ -189,7 +189,7 @@ class CLIPTextEmbeddings(nn.Module):
 
 
 
-class CLIPAttention(nn.Module):
+class HypCLIPAttention(nn.Module):
     """Multi-headed attention from 'Attention Is All You Need' paper"""
 
     def __init__(self, manifold:CustomLorentz, config):
@@ -215,10 +215,52 @@ class CLIPAttention(nn.Module):
 
     def _shape(self, tensor: torch.Tensor, seq_len: int, bsz: int):
         space = tensor.narrow(-1, 1, tensor.shape[-1] - 1)
-        space = space.view(bsz, seq_len, self.num_heads, self.head_dim).transpose(1, 2).contiguous()
+        space = space.view(bsz, seq_len, self.num_heads, self.head_dim).transpose(1, 2)
         tensor = self.manifold.add_time(space) 
         return tensor 
 
+    def _sdpa_forward(self, hidden_states: torch.Tensor, attention_mask: Optional[torch.Tensor] = None):
+        """
+        Same attention through `scaled_dot_product_attention`, which never materializes
+        the weights on the flash / memory-efficient kernels: the Minkowski inner product
+        <q, k>_L = q_s.k_s - q_t k_t is the dot product of k with q whose time channel is
+        negated, and the weighted sum of the values is the centroid before its
+        normalization. `bias` shifts every logit equally, which the softmax ignores,
+        it only enters with a zero factor.
+        """
+        bsz, tgt_len, embed_dim = hidden_states.size()
+
+        query_states = self._shape(self.q_proj(hidden_states), tgt_len, bsz)
+        key_states = self._shape(self.k_proj(hidden_states), -1, bsz)
+        value_states = self._shape(self.v_proj(hidden_states), -1, bsz)
+
+        self.manifold.assert_check_point_on_manifold(query_states)
+        self.manifold.assert_check_point_on_manifold(key_states)
+        self.manifold.assert_check_point_on_manifold(value_states)
+
+        # sign flip of the time channel and self.scale in place of the sdpa default 1/sqrt(head_dim + 1)
+        query_scale = torch.full((self.head_dim + 1,), self.scale * (self.head_dim + 1) ** 0.5, dtype=query_states.dtype, device=query_states.device)
+        query_scale[0] = -query_scale[0]
+        # keeps the trainable bias in the graph (zero gradient), DDP fails on parameters that never get one
+        query_scale = query_scale + 0 * self.bias
+        avg = F.scaled_dot_product_attention(
+            query_states * query_scale,
+            key_states,
+            value_states,
+            attn_mask=attention_mask,
+            dropout_p=self.dropout if self.training else 0.0,
+        )
+        attn_output = self.manifold.centroid_normalize(avg)
+        self.manifold.assert_check_point_on_manifold(attn_output)
+
+        space = attn_output.transpose(1, 2).narrow(-1, 1, self.head_dim)
+        attn_output = self.manifold.add_time(space.reshape(bsz, tgt_len, embed_dim - 1))
+        self.manifold.assert_check_point_on_manifold(attn_output)
+
+        attn_output = self.out_proj(attn_output)
+        self.manifold.assert_check_point_on_manifold(attn_output)
+        return attn_output
+
     def forward(
         self,
         hidden_states: torch.Tensor,
@@ -227,6 +269,9 @@ class CLIPAttention(nn.Module):
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[Tuple[torch.Tensor]]]:
         """Input shape: Batch x Time x Channel"""
 
+        if not output_attentions:
+            return self._sdpa_forward(hidden_states, attention_mask), None
+
         bsz, tgt_len, embed_dim = hidden_states.size()
 
         # get query proj
@@ -246,7 +291,7 @@ class CLIPAttention(nn.Module):
 
         src_len = key_states.size(1)
         attn_weights = (
-            self.manifold.bmm(query_states, key_states.transpose(1, 2))
+            self.manifold.bmm(query_states, key_states)
         ) * self.scale + self.bias
 
         if attn_weights.size() != (bsz * self.num_heads, tgt_len, src_len):
@@ -6,6 +6,7 @@ import math
 
 from hyptorch.lorentz.manifold import CustomLorentz
 from hyptorch.lorentz.layers import LorentzLinear
+from hyptorch.lorentz.layers.LFC import _add_time, _normalize_time
 
 class LorentzConv1d(nn.Module):
     """ Implements a fully hyperbolic 1D convolutional layer using the Lorentz model.
@@ -70,10 +71,15 @@ class LorentzConv1d(nn.Module):
 class LorentzConv2d(nn.Module):
     """ Implements a fully hyperbolic 2D convolutional layer using the Lorentz model.
 
+    Unless the dropout of the linearized kernel is active, the forward pass never
+    builds the patch tensor: the time rescaling is the squared time channel summed
+    by a ones kernel and the space part goes through F.conv2d.
+
     Args:
         manifold: Instance of Lorentz manifold
         in_channels, out_channels, kernel_size, stride, padding, dilation, bias: Same as nn.Conv2d (dilation not tested)
         LFC_normalize: If Chen et al.'s internal normalization should be used in LFC 
+        dropout: Dropout on the patches in training (0 keeps training on the conv path)
     """
     def __init__(
             self,
@@ -85,7 +91,8 @@ class LorentzConv2d(nn.Module):
             padding=0,
             dilation=1,
             bias=True,
-            LFC_normalize=False
+            LFC_normalize=False,
+            dropout=0.1
     ):
         super(LorentzConv2d, self).__init__()
 
@@ -125,7 +132,8 @@ class LorentzConv2d(nn.Module):
             lin_features, 
             self.out_channels, 
             bias=bias,
-            normalize=LFC_normalize
+            normalize=LFC_normalize,
+            dropout=dropout
         )
         self.unfold = torch.nn.Unfold(kernel_size=(self.kernel_size[0], self.kernel_size[1]), dilation=dilation, padding=padding, stride=stride)
 
@@ -139,6 +147,37 @@ class LorentzConv2d(nn.Module):
 
     def forward(self, x):
         """ x has to be in channel-last representation -> Shape = bs x H x W x C """
+        if self.training and self.linearized_kernel.dropout.p > 0:
+            return self.unfold_forward(x)
+        return self.conv_forward(x)
+
+    def conv_forward(self, x):
+        """ Same as `unfold_forward` without dropout, through F.conv2d. """
+        k = self.manifold.k
+        weight, bias = self.linearized_kernel.weight.weight, self.linearized_kernel.weight.bias
+        if not self.linearized_kernel.normalize:
+            weight = weight[1:]
+            bias = None if bias is None else bias[1:]
+
+        # sum of the squared times over each window minus (kernel_len - 1) * k, origin
+        # padding contributes k so zero padding of (time^2 - k) is the same
+        time = torch.clamp(x[..., 0], min=k.sqrt()).pow(2) - k
+        ones = time.new_ones(1, 1, *self.kernel_size)
+        time = F.conv2d(time.unsqueeze(1), ones, None, self.stride, self.padding, self.dilation)
+        time_rescaled = torch.sqrt(time + k).permute(0, 2, 3, 1)
+
+        # patch features are ordered (kernel position, channel), like the unfold path
+        space_weight = weight[:, 1:].reshape(weight.shape[0], *self.kernel_size, self.in_channels - 1).permute(0, 3, 1, 2)
+        space = x.permute(0, 3, 1, 2).narrow(1, 1, self.in_channels - 1)
+        space = F.conv2d(space, space_weight, bias, self.stride, self.padding, self.dilation).permute(0, 2, 3, 1)
+        out = space.addcmul(time_rescaled, weight[:, 0]).contiguous()
+
+        if self.linearized_kernel.normalize:
+            return _normalize_time(out, self.linearized_kernel.scale, k)
+        return _add_time(out, k)
+
+    def unfold_forward(self, x):
+        """ Reference implementation on the unfolded patches. """
         bsz = x.shape[0]
         h, w = x.shape[1:3]
 
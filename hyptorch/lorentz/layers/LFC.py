@@ -1,8 +1,10 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import math
 from hyptorch.lorentz.manifold import CustomLorentz
 from hyptorch.geoopt import ManifoldParameter 
+from hyptorch.geoopt.utils import jit_script
 
 
 class LorentzLinearCore(nn.Module):
@@ -72,6 +74,25 @@ class LorentzLinearCore(nn.Module):
             self.in_features, self.out_features, self.bias is not None
         )
 
+@jit_script
+def _add_time(space: torch.Tensor, k: torch.Tensor):
+    time = torch.sqrt(space.pow(2).sum(dim=-1, keepdim=True) + k)
+    return torch.cat([time, space], dim=-1)
+
+
+@jit_script
+def _normalize_time(x: torch.Tensor, log_scale: torch.Tensor, k: torch.Tensor):
+    """The internal normalization of `LorentzLinear` without in-place mask writes."""
+    x_space = x.narrow(-1, 1, x.shape[-1] - 1)
+    scale = x.narrow(-1, 0, 1).sigmoid() * log_scale.exp()
+    square_norm = (x_space * x_space).sum(dim=-1, keepdim=True)
+    mask = square_norm <= 1e-10
+    x_space = scale * x_space / torch.sqrt(square_norm.masked_fill(mask, 1.0))
+    x_space = x_space.masked_fill(mask, 0.0)
+    x_time = torch.sqrt(scale ** 2 + k + 1e-5).masked_fill(mask, k.sqrt())
+    return torch.cat([x_time, x_space], dim=-1)
+
+
 class LorentzLinear(nn.Module):
     """
         Modified Lorentz fully connected layer of Chen et al. (2022).
@@ -115,8 +136,28 @@ class LorentzLinear(nn.Module):
             self.scale = nn.Parameter(torch.ones(()) * init_scale, requires_grad=learn_scale)
         else:
             self.scale = nn.Parameter(torch.ones(()) * 2.3, requires_grad=learn_scale)
+        self.fused = False
+
+    def fuse(self):
+        """
+        Eval-mode fast path until the next `train()`: no dropout, and without
+        normalization only the space rows of the weight are applied before the
+        time component is added in one scripted op.
+        """
+        self.fused = True
+        return self
+
+    def train(self, mode=True):
+        if mode:
+            self.fused = False
+        return super().train(mode)
 
     def forward(self, x):
+        if self.fused and not self.training:
+            if self.normalize:
+                return _normalize_time(self.weight(x), self.scale, self.manifold.k)
+            bias = self.weight.bias[1:] if self.bias else None
+            return _add_time(F.linear(x, self.weight.weight[1:], bias), self.manifold.k)
 
         x = self.weight(self.dropout(x))
 
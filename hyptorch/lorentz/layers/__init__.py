@@ -3,3 +3,4 @@ from .LConv import LorentzConv1d, LorentzConv2d, LorentzConvTranspose2d
 from .LBnorm import LorentzBatchNorm1d, LorentzBatchNorm2d, LorentzLayerNorm
 from .LMLR import LorentzMLR
 from .LModules import LorentzAct, LorentzReLU, LorentzGlobalAvgPool2d
+from .utils import fuse_lorentz
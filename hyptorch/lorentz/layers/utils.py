@@ -0,0 +1,16 @@
+import torch.nn as nn
+
+from hyptorch.lorentz.layers.LFC import LorentzLinear
+from hyptorch.lorentz.layers.LBnorm import LorentzBatchNorm, LorentzLayerNorm
+
+
+def fuse_lorentz(model: nn.Module):
+    """
+    Switches `model` to eval mode and fuses every Lorentz linear / batch norm /
+    layer norm in it for inference, `model.train()` undoes it.
+    """
+    model.eval()
+    for module in model.modules():
+        if isinstance(module, (LorentzLinear, LorentzBatchNorm, LorentzLayerNorm)):
+            module.fuse()
+    return model
@@ -5,6 +5,16 @@ from hyptorch.geoopt.manifolds.lorentz import math
 from typing import Tuple, Optional
 
 
+def pairwise_dist(x: torch.Tensor, y: torch.Tensor, k: torch.Tensor):
+    """
+    Out-of-place pairwise Lorentz distance with no in-place ops, clones or
+    dtype round trips, so it can be wrapped in `torch.compile` as is.
+    """
+    inner = x[..., 1:] @ y[..., 1:].transpose(-1, -2) - x[..., :1] * y[..., :1].transpose(-1, -2)
+    d = -inner / k
+    return torch.sqrt(k) * torch.log(d + torch.sqrt(torch.clamp_min(d * d - 1.0, 1e-15)))
+
+
 class CustomLorentz(Lorentz):
 
     def __init__(self, k=1.0, learnable=False, atol=1e-5, rtol=1e-5):
@@ -24,13 +34,16 @@ class CustomLorentz(Lorentz):
 
     def calc_time(self, space):
         """Calculates time component from given space component."""
-        return torch.sqrt(torch.norm(space, dim=-1, keepdim=True) ** 2 + self.k)
+        return torch.sqrt(space.pow(2).sum(dim=-1, keepdim=True) + self.k)
 
 
     def bmm(self, x: torch.Tensor, y: torch.Tensor):
-        x = x.clone()
-        x.narrow(-1, 0, 1).mul_(-1)
-        return x @ y.transpose(-1, -2)
+        return self.pairwise_inner(x, y)
+
+    def pairwise_inner(self, x: torch.Tensor, y: torch.Tensor):
+        """Minkowski inner product between all pairs of x (..., N, D) and y (..., M, D), computed as space @ space.T - time * time.T without cloning x."""
+        inner = self.get_space(x) @ self.get_space(y).transpose(-1, -2)
+        return inner.addcmul_(self.get_time(x), self.get_time(y).transpose(-1, -2), value=-1)
 
     def centroid(self, x, w=None, eps=1e-8):
         """Centroid implementation. Adapted the code from Chen et al. (2022)"""
@@ -38,7 +51,10 @@ class CustomLorentz(Lorentz):
             avg = w.matmul(x)
         else:
             avg = x.mean(dim=-2)
+        return self.centroid_normalize(avg, eps=eps)
 
+    def centroid_normalize(self, avg, eps=1e-8):
+        """Rescales a weighted sum of points (a time-like vector) back onto the hyperboloid."""
         denom = -self.inner(avg, avg, keepdim=True)
         denom = denom.abs().clamp_min(eps).sqrt()
 
@@ -58,13 +74,34 @@ class CustomLorentz(Lorentz):
 
         return self.expmap(x, z)
 
-    def sqdist_batch(self, p1_list:torch.Tensor, p2_list:torch.Tensor, dim=-1):
-        return -2 * self.k - 2 * self.bmm(p1_list, p2_list)
+    def _needs_grad(self, *tensors):
+        return torch.is_grad_enabled() and any(t.requires_grad for t in (*tensors, self.k))
+
+    def _chunked(self, fn, p1_list:torch.Tensor, p2_list:torch.Tensor, chunk_size:int):
+        """Evaluates fn over row chunks of p1_list, writing into one preallocated (..., N, M) output."""
+        out = p1_list.new_empty((*p1_list.shape[:-1], p2_list.shape[-2]))
+        for start in range(0, p1_list.shape[-2], chunk_size):
+            end = min(start + chunk_size, p1_list.shape[-2])
+            out[..., start:end, :] = fn(p1_list[..., start:end, :], p2_list)
+        return out
+
+    def sqdist_batch(self, p1_list:torch.Tensor, p2_list:torch.Tensor, dim=-1, chunk_size:int=None):
+        if chunk_size is not None:
+            return self._chunked(self.sqdist_batch, p1_list, p2_list, chunk_size)
+        return self.pairwise_inner(p1_list, p2_list).mul_(-2).sub_(2 * self.k)
     
-    def dist_batch(self, p1_list:torch.Tensor, p2_list:torch.Tensor):
+    def dist_batch(self, p1_list:torch.Tensor, p2_list:torch.Tensor, chunk_size:int=None):
+        if chunk_size is not None:
+            return self._chunked(self.dist_batch, p1_list, p2_list, chunk_size)
 
-        d = - self.bmm(p1_list, p2_list)
-        return torch.sqrt(self.k) * math.arcosh(d / self.k)
+        d = self.pairwise_inner(p1_list, p2_list).div_(-self.k)
+        if self._needs_grad(p1_list, p2_list):
+            return torch.sqrt(self.k) * math.arcosh(d)
+        # same arcosh as math.arcosh (in double, fp16 d.pow(2) overflows past 256), evaluated in place
+        # when no graph has to be kept
+        d64 = d.double()
+        z = d64.pow(2).sub_(1.0).clamp_min_(1e-15).sqrt_()
+        return d64.add_(z).log_().to(d.dtype).mul_(torch.sqrt(self.k))
 
 
 
@@ -129,6 +166,11 @@ class CustomLorentz(Lorentz):
         else:
             reason = None
         return ok, reason
+
+    def _point_violation(
+        self, x: torch.Tensor, *, dim=-1, atol=1e-5, rtol=1e-5
+    ) -> torch.Tensor:
+        return super()._point_violation(x, atol=self.atol, rtol=self.rtol, dim=dim)
     
     def half_aperture(
         self, x: torch.Tensor, min_radius: float = 0.1, eps: float = 1e-8
@@ -27,6 +27,7 @@ class ResNet(nn.Module):
         num_classes=100,
         bias=True,
         remove_linear=False,
+        conv_dropout=0.1,
     ):
         super(ResNet, self).__init__()
 
@@ -38,6 +39,8 @@ class ResNet(nn.Module):
 
         self.bias = bias
         self.block = block
+        # dropout on the patches of the Lorentz convolutions, 0 trains on the F.conv2d path
+        self.conv_dropout = conv_dropout
 
         self.manifold = manifold
 
@@ -82,7 +85,8 @@ class ResNet(nn.Module):
                         self.in_channels,
                         out_channels,
                         stride,
-                        self.bias
+                        self.bias,
+                        dropout=self.conv_dropout,
                     )
                 )
             else:
@@ -113,7 +117,8 @@ class ResNet(nn.Module):
                 self.manifold, 
                 self.img_dim, 
                 self.in_channels, 
-                self.bias
+                self.bias,
+                dropout=self.conv_dropout,
             )
 
         else:
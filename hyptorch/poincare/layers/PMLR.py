@@ -2,6 +2,7 @@ import torch
 import torch.nn as nn
 
 from hyptorch.geoopt.manifolds.stereographic.math import arsinh, artanh
+from hyptorch.geoopt.utils import jit_script
 
 class UnidirectionalPoincareMLR(nn.Module):
     """ MLR in the Poincare model by Shimizu et al. (2020)
@@ -34,7 +35,7 @@ class UnidirectionalPoincareMLR(nn.Module):
             self.feat_dim, self.num_outcome, self.bias.requires_grad
         )
     
-@torch.jit.script
+@jit_script
 def unidirectional_poincare_mlr(x, z_norm, z_unit, r, c):
     # parameters
     rc = c.sqrt()
@@ -11,8 +11,44 @@ import math
 from typing import Optional, List
 from hyptorch.geoopt import ManifoldParameter
 from hyptorch.geoopt import PoincareBall 
+from hyptorch.geoopt.manifolds.stereographic.math import (
+    _expmap0, _logmap0, _mobius_add, _project, artan_k, tan_k
+)
+from hyptorch.geoopt.utils import jit_script
 from transformers import SwinModel
 
+@jit_script
+def _mobius_lowrank_matvec(
+    x: torch.Tensor, lora_A: torch.Tensor, lora_B: torch.Tensor, k: torch.Tensor, sign: Optional[int]
+):
+    """`mobius_matvec(lora_B @ lora_A, x)` (projected) without forming the product."""
+    x_norm = x.norm(dim=-1, keepdim=True, p=2).clamp_min(1e-15)
+    mx = (x @ lora_A.transpose(0, 1)) @ lora_B.transpose(0, 1)
+    mx_norm = mx.norm(dim=-1, keepdim=True, p=2).clamp_min(1e-15)
+    res = tan_k(mx_norm / x_norm * artan_k(x_norm, k, sign), k, sign) * (mx / mx_norm)
+    cond = (mx == 0).prod(dim=-1, keepdim=True, dtype=torch.bool)
+    return _project(torch.where(cond, torch.zeros_like(res), res), k)
+
+
+@jit_script
+def _lora_forward(
+    result: torch.Tensor,
+    x: torch.Tensor,
+    lora_A: torch.Tensor,
+    lora_B: torch.Tensor,
+    scaling: float,
+    k: torch.Tensor,
+    sign: Optional[int],
+    need_logmap: bool,
+):
+    """logmap0(expmap0(result) ⊕ (lora_B @ lora_A) ⊗ x * scaling) in one scripted function."""
+    result = _project(_expmap0(result, k, sign=sign), k)
+    result = _project(_mobius_add(result, _mobius_lowrank_matvec(x, lora_A, lora_B, k, sign) * scaling, k), k)
+    if need_logmap:
+        result = _logmap0(result, k, sign=sign)
+    return result
+
+
 class LoRALayer():
     def __init__(
         self, 
@@ -33,6 +69,38 @@ class LoRALayer():
         self.merged = False
         self.merge_weights = merge_weights
         self.manifold = manifold
+        self._cache = None
+
+    def cached(self, fn, *tensors):
+        """
+        `fn()`, kept until one of `tensors` or the manifold parameters changes (by
+        version counter). Recomputed on every call while gradients flow into them.
+        """
+        tensors = tensors + tuple(self.manifold.parameters())
+        if torch.is_grad_enabled() and any(t.requires_grad for t in tensors):
+            return fn()
+        key = tuple((t.data_ptr(), t._version) for t in tensors)
+        if self._cache is None or self._cache[0] != key:
+            with torch.no_grad():
+                self._cache = (key, fn())
+        return self._cache[1]
+
+    def hyperbolic_factors(self):
+        """
+        `(A, B)` with `B @ A` equal to the Möbius product of expmap0(lora_B) with the
+        expmap0(lora_A) columns (projected). That product only rescales the columns
+        of `B @ A`, so it stays rank r: the scales are computed from the r x r Gram
+        matrix of B and folded into A.
+        """
+        k, sign = self.manifold.k, self.manifold.sign
+        lora_B = self.manifold.expmap0(self.lora_B)
+        # (in, r): one point per column of the update
+        lora_A = self.manifold.expmap0(self.lora_A).transpose(0, 1)
+        a_norm = lora_A.norm(dim=-1, keepdim=True, p=2).clamp_min(1e-15)
+        ba_norm = ((lora_A @ (lora_B.transpose(0, 1) @ lora_B)) * lora_A).sum(-1, keepdim=True)
+        ba_norm = ba_norm.clamp_min(0).sqrt().clamp_min(1e-15)
+        res_norm = _project(tan_k(ba_norm / a_norm * artan_k(a_norm, k, sign), k, sign), k)
+        return (lora_A * (res_norm / ba_norm)).transpose(0, 1), lora_B
 
 
 class Embedding(nn.Embedding, LoRALayer):
@@ -44,11 +112,12 @@ class Embedding(nn.Embedding, LoRALayer):
         r: int = 0,
         lora_alpha: int = 1,
         merge_weights: bool = True,
+        manifold: PoincareBall = None,
         **kwargs
     ):
         nn.Embedding.__init__(self, num_embeddings, embedding_dim, **kwargs)
         LoRALayer.__init__(self, r=r, lora_alpha=lora_alpha, lora_dropout=0,
-                           merge_weights=merge_weights)
+                           merge_weights=merge_weights, manifold=manifold)
         # Actual trainable parameters
         if r > 0:
             self.lora_A = ManifoldParameter(self.weight.new_zeros((r, num_embeddings)))
@@ -67,33 +136,37 @@ class Embedding(nn.Embedding, LoRALayer):
 
     def train(self, mode: bool = True):
         nn.Embedding.train(self, mode)
-        if mode:
-            if self.merge_weights and self.merged:
-                # Make sure that the weights are not merged
-                if self.r > 0:
-                    self.weight.data -= (self.lora_B @ self.lora_A).transpose(0, 1) * self.scaling
-                self.merged = False
-        else:
-            if self.merge_weights and not self.merged:
-                # Merge the weights and mark it
-                if self.r > 0:
-                    self.weight.data += (self.lora_B @ self.lora_A).transpose(0, 1) * self.scaling
-                self.merged = True
-        
+        # the hyperbolic update cannot be added to the weight, eval bakes the whole table instead
+        self.merged = self.merge_weights and not mode and self.r > 0
+        if self.merged:
+            with torch.no_grad():
+                self.baked_weight()
+        return self
+
+    def adapted(self, x: torch.Tensor):
+        """LoRA embeddings of the token ids `x`."""
+        after_A = F.embedding(
+            x, self.lora_A.transpose(0, 1), self.padding_idx, self.max_norm,
+            self.norm_type, self.scale_grad_by_freq, self.sparse
+        )
+        after_A = self.manifold.expmap0(after_A)
+        lora_B = self.manifold.expmap0(self.lora_B)
+        result = self.manifold.expmap0(nn.Embedding.forward(self, x))
+        AB_mat = self.manifold.mobius_matvec(lora_B, after_A) * self.scaling
+        result = self.manifold.mobius_add(result, AB_mat)
+        return self.manifold.logmap0(result)
+
+    def baked_weight(self):
+        """The LoRA embedding of every token, cached until the weights change."""
+        ids = torch.arange(self.num_embeddings, device=self.weight.device)
+        return self.cached(lambda: self.adapted(ids), self.weight, self.lora_A, self.lora_B)
+
     def forward(self, x: torch.Tensor):
-        if self.r > 0 and not self.merged:
-            result = nn.Embedding.forward(self, x)
-            after_A = F.embedding(
-                x, self.lora_A.transpose(0, 1), self.padding_idx, self.max_norm,
-                self.norm_type, self.scale_grad_by_freq, self.sparse
-            )
-            after_A = self.manifold.expmap0(after_A)
-            lora_B = self.manifold.expmap0(self.lora_B)
-            result = self.manifold.expmap0(result)
-            AB_mat= self.manifold.mobius_matvec(after_A , lora_B.transpose(0, 1)) * self.scaling
-            result = self.manifold.mobius_add(result, AB_mat) 
-            result =  self.manifold.logmap0(result)
-            return result
+        if self.r > 0:
+            weights = (self.weight, self.lora_A, self.lora_B)
+            if self.max_norm is None and not (torch.is_grad_enabled() and any(w.requires_grad for w in weights)):
+                return F.embedding(x, self.baked_weight(), self.padding_idx)
+            return self.adapted(x)
         else:
             return nn.Embedding.forward(self, x)
             
@@ -110,11 +183,12 @@ class Linear(nn.Linear, LoRALayer):
         fan_in_fan_out: bool = False, # Set this to True if the layer to replace stores weight like (fan_in, fan_out)
         merge_weights: bool = True,
         need_logmap: bool = False,
+        manifold: PoincareBall = None,
         **kwargs
     ):
         nn.Linear.__init__(self, in_features, out_features, **kwargs)
         LoRALayer.__init__(self, r=r, lora_alpha=lora_alpha, lora_dropout=lora_dropout,
-                           merge_weights=merge_weights)
+                           merge_weights=merge_weights, manifold=manifold)
 
         self.fan_in_fan_out = fan_in_fan_out
         self.need_logmap = need_logmap
@@ -137,38 +211,25 @@ class Linear(nn.Linear, LoRALayer):
             nn.init.zeros_(self.lora_B)
 
     def train(self, mode: bool = True):
-        def T(w):
-            return w.transpose(0, 1) if self.fan_in_fan_out else w
         nn.Linear.train(self, mode)
-        if mode:
-            if self.merge_weights and self.merged:
-                # Make sure that the weights are not merged
-                if self.r > 0:
-                    self.weight.data -= T(self.lora_B @ self.lora_A) * self.scaling
-                self.merged = False
-        else:
-            if self.merge_weights and not self.merged:
-                # Merge the weights and mark it
-                if self.r > 0:
-                    self.weight.data += T(self.lora_B @ self.lora_A) * self.scaling
-                self.merged = True       
+        # the hyperbolic update cannot be added to the weight, eval bakes the factors instead
+        self.merged = self.merge_weights and not mode and self.r > 0
+        if self.merged:
+            with torch.no_grad():
+                self.cached(self.hyperbolic_factors, self.lora_A, self.lora_B)
+        return self
 
     def forward(self, x: torch.Tensor):
         def T(w):
             return w.transpose(0, 1) if self.fan_in_fan_out else w
-        if self.r > 0 and not self.merged:
-            result = F.linear(x, T(self.weight), bias=self.bias)            
-            result = self.manifold.expmap0(result)
-            lora_A = self.manifold.expmap0(self.lora_A)
-            lora_B = self.manifold.expmap0(self.lora_B)
-
-            mat_AB = self.manifold.mobius_matvec(self.lora_dropout(x), self.manifold.mobius_matvec(lora_A.transpose(0, 1) , lora_B.transpose(0, 1)))  * self.scaling
-            result = self.manifold.mobius_add(result, mat_AB) 
-            if self.need_logmap:
-                result = self.manifold.logmap0(result)
-            return result
-        else:
-            return F.linear(x, T(self.weight), bias=self.bias)
+        result = F.linear(x, T(self.weight), bias=self.bias)
+        if self.r > 0:
+            lora_A, lora_B = self.cached(self.hyperbolic_factors, self.lora_A, self.lora_B)
+            return _lora_forward(
+                result, self.lora_dropout(x), lora_A, lora_B, self.scaling,
+                self.manifold.k, self.manifold.sign, self.need_logmap
+            )
+        return result
 
 
 class MergedLinear(nn.Linear, LoRALayer):
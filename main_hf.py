@@ -7,7 +7,8 @@ from model.dctModel import DCTHFWithQueue
 from transformers import CLIPProcessor, BlipProcessor, CLIPModel
 from trainer_queue import MyTrainer as LavisTrainer
 from accelerate import find_executable_batch_size
-from utils.data_utils import get_loaders 
+from utils.data_utils import get_loaders, get_loader_kwargs
+from utils.image_shards import wrap_with_shards
 
 
 if __name__ == "__main__":
@@ -37,6 +38,7 @@ if __name__ == "__main__":
                 dataset = load_dataset("flickr30k", vis_path=FLICKR_PATH, cfg_path=None)
             else:
                 dataset = load_dataset("coco_retrieval", vis_path=COCO_PATH, cfg_path=None)
+            dataset = wrap_with_shards(dataset, config.image_shard_dir, config.dataset)
 
 
 
@@ -49,10 +51,16 @@ if __name__ == "__main__":
                     vis_processor=processor,
                     txt_processor=None,
                     tokenizer=processor,
-                    eval_batch_size=20
+                    eval_batch_size=20,
+                    caption_cache_dir=config.caption_cache_dir,
+                    max_txt_len=config.max_txt_len,
+                    unique_image_batches=config.unique_image_batches,
+                    **get_loader_kwargs(config)
                 )
 
                     # model = HypGraphCLIPWithQueue(config) if "clip" in config.model_ckt else HypGraphBLIPWithQueue(config)
+                # seeded so the randomly initialised adapters, and with them the embedding cache fingerprint, match across the sweep
+                torch.manual_seed(config.seed)
                 queue_model = DCTHFWithQueue(config) 
                 # model = BLIPWithQueue(config) 
                 trainer = LavisTrainer(
@@ -71,6 +79,7 @@ if __name__ == "__main__":
             config.epochs = 1
             config.enable_log = False 
             config.use_margin_loss = False 
+            # with --embedding_cache_dir set, the text embeddings are computed once per dataset and reused across the sweep
 
             for compress_method in [
                 # 'none', 
@@ -2,7 +2,8 @@ from model.dctModel import DCTLAVISLIPWithQueue
 from lavis.datasets.builders import load_dataset
 from trainer_queue import MyTrainer as LavisTrainer 
 from trainer import MyTrainer as Blip2Trainer 
-from utils.data_utils import  get_loaders
+from utils.data_utils import  get_loaders, get_loader_kwargs
+from utils.image_shards import wrap_with_shards
 from lavis.models import load_model_and_preprocess
 from config import parser
 from config import POINCARE, EUCLID, LORENTZ, LAVIS_BLIP_BASE_FLICKR, LAVIS_BLIP_BASE_COCO, COCO, FLICKR
@@ -24,6 +25,7 @@ if __name__ == "__main__":
             model, vis_processors, txt_processors = load_model_and_preprocess("blip_retrieval", "coco", is_eval=False)
             config.model_ckt = LAVIS_BLIP_BASE_COCO 
             dataset = load_dataset("coco_retrieval", vis_path=COCO_PATH, cfg_path=None)
+        dataset = wrap_with_shards(dataset, config.image_shard_dir, config.dataset)
 
 
         def inner_training_loop(batch_size):
@@ -34,7 +36,11 @@ if __name__ == "__main__":
                 vis_processor=vis_processors['eval'],
                 txt_processor=txt_processors['eval'],
                 tokenizer=model.tokenizer,
-                eval_batch_size=20
+                eval_batch_size=20,
+                caption_cache_dir=config.caption_cache_dir,
+                max_txt_len=config.max_txt_len,
+                unique_image_batches=config.unique_image_batches,
+                **get_loader_kwargs(config)
             )
 
             queue_model = DCTLAVISLIPWithQueue(config, model)
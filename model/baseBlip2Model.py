@@ -3,6 +3,7 @@ import torch.nn as nn
 from .modules.discriminator import Discriminator as DisModel
 from .modules.hyp_discriminator import LorentzDiscriminator as LorentzDisModel
 from .modules.hyp_discriminator import HypDiscriminator 
+from .modules.negatives import sample_negatives
 from hyptorch.lorentz.manifold import CustomLorentz as Lorentz 
 from hyptorch.geoopt.manifolds.lorentz import math as lmath 
 
@@ -78,22 +79,13 @@ class BaseModel(nn.Module):
             weights_t2i.masked_fill_(mask, 0) 
 
         # select a negative image for each text
-        image_embeds_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-            image_embeds_neg.append(image_embeds_world[neg_idx])
-        image_embeds_neg = torch.stack(image_embeds_neg, dim=0)
+        neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+        image_embeds_neg = image_embeds_world[neg_idx]
 
         # select a negative text for each image
-        text_ids_neg = []
-        text_atts_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-            text_ids_neg.append(text_input_ids_world[neg_idx])
-            text_atts_neg.append(text_attention_mask_world[neg_idx])
-
-        text_ids_neg = torch.stack(text_ids_neg, dim=0)
-        text_atts_neg = torch.stack(text_atts_neg, dim=0)
+        neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+        text_ids_neg = text_input_ids_world[neg_idx]
+        text_atts_neg = text_attention_mask_world[neg_idx]
 
         text_ids_all = torch.cat(
             [input_ids, input_ids, text_ids_neg], dim=0
@@ -20,6 +20,7 @@ from .modules.utils import (
     ManifoldMapper
 ) 
 from .modules.fuseModel import FuseEncoder
+from .modules.negatives import sample_negatives
 from lavis import BlipRetrieval
 
 EUCLID = 'euclidean'
@@ -174,7 +175,7 @@ class BaseModelWithQueue(BlipBase, MomentumDistilationMixin, SharedQueueMixin):
             eu_dis = torch.matmul(x, y.T) 
             return  eu_dis 
         elif self.config.manifold == POINCARE: 
-            hyp_dist = -self.manifold.dist_batch(x, y, device=f'{"gpu" if self.training else "cpu"}')
+            hyp_dist = -self.manifold.dist_batch(x, y)
             return hyp_dist
         else: 
             hyp_dist = -self.manifold.dist_batch(x, y)
@@ -238,19 +239,12 @@ class BaseModelWithQueue(BlipBase, MomentumDistilationMixin, SharedQueueMixin):
             weights_t2i.masked_fill_(mask, 0) 
 
         # select a negative image for each text
-        image_embeds_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-            image_embeds_neg.append(image_hidden_states[neg_idx])
+        neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+        image_embeds_neg = image_hidden_states[neg_idx]
 
         # select a negative text for each image
-        text_ids_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-            text_ids_neg.append(text_hidden_states[neg_idx])
-
-        text_ids_neg = torch.stack(text_ids_neg, dim=0)
-        image_embeds_neg = torch.stack(image_embeds_neg, dim=0)
+        neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+        text_ids_neg = text_hidden_states[neg_idx]
 
         text_hidden_states = torch.cat(
             [text_hidden_states, text_hidden_states, text_ids_neg], dim=0
@@ -302,11 +296,13 @@ class BaseModelWithQueue(BlipBase, MomentumDistilationMixin, SharedQueueMixin):
         text_output  = self.model(
             input_ids=input_ids,
             attention_masks=attention_masks,
-            num_hidden_states=self.num_hidden_states
+            num_hidden_states=self.num_hidden_states,
+            teacher_keys=data.get('caption_index'),
         )
         image_output = self.model(
             pixel_values=pixel_values,
-            num_hidden_states=self.num_hidden_states
+            num_hidden_states=self.num_hidden_states,
+            teacher_keys=idx,
         )
         text_embeds = text_output[1] 
         image_embeds = image_output[1] 
@@ -339,13 +335,15 @@ class BaseModelWithQueue(BlipBase, MomentumDistilationMixin, SharedQueueMixin):
             self._momentum_update()
             image_output_m = self.model_m(
                 pixel_values=pixel_values, 
-                num_hidden_states=self.num_hidden_states
+                num_hidden_states=self.num_hidden_states,
+                teacher_keys=data['img_id'],
             )
 
             text_output_m = self.model_m(
                 input_ids=input_ids,
                 attention_masks=attention_masks,
-                num_hidden_states=self.num_hidden_states
+                num_hidden_states=self.num_hidden_states,
+                teacher_keys=data.get('caption_index'),
             )
 
             image_feat_m = self.postprocess_embeds(image_output_m[1])
@@ -415,6 +413,12 @@ class BaseModelWithQueue(BlipBase, MomentumDistilationMixin, SharedQueueMixin):
         self._dequeue_and_enqueue(image_feat_m, text_feat_m, image_feat_ori, text_feat_ori, idx)
         return  loss, stats
 
+    def build_teacher_cache(self, loader, root, model_id, num_images, num_captions, dtype='fp16', device=None):
+        """Caches the frozen first encoder over the train `loader`, shared with the momentum model."""
+        caches = self.model.build_teacher_cache(loader, root, model_id, num_images, num_captions, dtype=dtype, device=device)
+        self.model_m.teacher_caches = caches
+        return caches
+
     def reset_queue_ptr(self):
         self.queue_ptr = torch.zeros(1, dtype=torch.long)
     
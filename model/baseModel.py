@@ -3,6 +3,7 @@ import torch.nn as nn
 from .modules.discriminator import Discriminator as DisModel
 from .modules.hyp_discriminator import LorentzDiscriminator as LorentzDisModel
 from .modules.hyp_discriminator import HypDiscriminator 
+from .modules.negatives import sample_negatives
 from hyptorch.lorentz.manifold import CustomLorentz as Lorentz 
 from hyptorch.geoopt.manifolds.lorentz import math as lmath 
 
@@ -67,7 +68,7 @@ class BaseModel(nn.Module):
         return num_params
 
         
-    def dist_func(self, x, y, device='gpu'):
+    def dist_func(self, x, y, device=None):
         if self.manifold_name == EUCLID:
             x = F.normalize(x,p=2, dim=-1) 
             y = F.normalize(y,p=2, dim=-1) 
@@ -97,18 +98,12 @@ class BaseModel(nn.Module):
         weights_i2t.masked_fill_(mask, 0)
         weights_t2i.masked_fill_(mask, 0) 
         # select a negative image for each text
-        img_enc_neg = []    
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-            img_enc_neg.append(imgs[neg_idx])
-        img_enc_neg = torch.stack(img_enc_neg,dim=0) 
+        neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+        img_enc_neg = imgs[neg_idx]
 
         # select a negative text for each image
-        cap_enc_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-            cap_enc_neg.append(cap[neg_idx])
-        cap_enc_neg = torch.stack(cap_enc_neg,dim=0)   
+        neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+        cap_enc_neg = cap[neg_idx]
 
         cap_enc_all = torch.cat([cap, cap, cap_enc_neg],dim=0)     
         img_enc_all = torch.cat([imgs, img_enc_neg, imgs],dim=0)
@@ -137,7 +137,7 @@ class BaseModelWithQueue(BlipBase, MomentumDistilationMixin, SharedQueueMixin):
             eu_dis = torch.matmul(x, y.T) 
             return  eu_dis 
         elif self.config.manifold == POINCARE: 
-            hyp_dist = -self.manifold.dist_batch(x, y, device='cpu')
+            hyp_dist = -self.manifold.dist_batch(x, y)
             return hyp_dist
         else: 
             hyp_dist = -self.manifold.dist_batch(x, y)
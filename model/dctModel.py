@@ -173,6 +173,8 @@ class DCTHFWithQueue(BaseModelWithQueue):
         else:
             model = get_lora_blip(config, model=model) 
             self.model = CompressedHFBLIP(model, compress_method=config.compress_method, r=config.r)
+        self.model.configure_schedule(config.compress_schedule, config.flops_budget)
+        self.model.prop_attn = config.prop_attn
 
         
         self._init_queue(config, model.config.projection_dim)
@@ -187,6 +189,8 @@ class DCTLAVISLIPWithQueue(BaseModelWithQueue):
         super(DCTLAVISLIPWithQueue, self).__init__(config)
         model = get_lora_lavis_blip(config, model=model) 
         self.model = CompressedLAVISBLIP(model, compress_method=config.compress_method, r=config.r)
+        self.model.configure_schedule(config.compress_schedule, config.flops_budget)
+        self.model.prop_attn = config.prop_attn
         
         self._init_queue(config, 256)
     
@@ -200,6 +204,8 @@ class CompressedLAVISBLIP2WithQueue(Blip2Model):
         super(CompressedLAVISBLIP2WithQueue, self).__init__(config)
         model = get_lora_blip2(config, model=model) 
         self.model = CompressedLAVISBLIP2(model, compress_method=config.compress_method, r=config.r)
+        self.model.configure_schedule(config.compress_schedule, config.flops_budget)
+        self.model.prop_attn = config.prop_attn
         
     
     def get_vision_features(self, pixel_values: torch.Tensor, use_compressed_hidden_state=True):
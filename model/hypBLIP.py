@@ -12,6 +12,7 @@ import torch.nn.functional as F
 from lavis.models import BlipRetrieval
 from copy import deepcopy
 from .modules.graphs import GraphModel, LorentzGraphModel
+from .modules.negatives import sample_negatives
 EUCLID = "euclidean"
 POINCARE = "poincare"
 LORENTZ = "lorentz"
@@ -282,22 +283,13 @@ class LavisHypGraphBLIPWithQueue(BaseModelWithQueue):
             weights_t2i.masked_fill_(mask, 0)
 
             # select a negative image (from same rank) for each text
-            image_embeds_neg = []
-            for b in range(bs):
-                neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-                image_embeds_neg.append(image_embeds[neg_idx])
-            image_embeds_neg = torch.stack(image_embeds_neg, dim=0)
+            neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+            image_embeds_neg = image_embeds[neg_idx]
 
             # select a negative text (from same rank) for each image
-            text_ids_neg = []
-            text_atts_neg = []
-            for b in range(bs):
-                neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-                text_ids_neg.append(encoder_input_ids[neg_idx])
-                text_atts_neg.append(attention_mask[neg_idx])
-
-            text_ids_neg = torch.stack(text_ids_neg, dim=0)
-            text_atts_neg = torch.stack(text_atts_neg, dim=0)
+            neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+            text_ids_neg = encoder_input_ids[neg_idx]
+            text_atts_neg = attention_mask[neg_idx]
 
             text_ids_all = torch.cat([encoder_input_ids, text_ids_neg], dim=0)
             text_atts_all = torch.cat([attention_mask, text_atts_neg], dim=0)
@@ -327,19 +319,12 @@ class LavisHypGraphBLIPWithQueue(BaseModelWithQueue):
                 dim=0,
             ).to(self.device)
         
-        image_embeds_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-            image_embeds_neg.append(image_hidden_states[neg_idx])
+        neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+        image_embeds_neg = image_hidden_states[neg_idx]
 
         # select a negative text for each image
-        text_ids_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-            text_ids_neg.append(text_hidden_states[neg_idx])
-
-        text_ids_neg = torch.stack(text_ids_neg, dim=0)
-        image_embeds_neg = torch.stack(image_embeds_neg, dim=0)
+        neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+        text_ids_neg = text_hidden_states[neg_idx]
 
         text_hidden_states = torch.cat(
             [text_hidden_states, text_hidden_states, text_ids_neg], dim=0
@@ -9,7 +9,11 @@ from transformers import (
 import math
 from lavis import BlipRetrieval, Blip2Qformer
 from transformers import AutoModel 
-from .dct import dct, idct
+from .token_merging import (
+    bipartite_plan, pitome_plan, merge, dct_compress, num_merged,
+    spread_size, size_bias, vit_block_forward, blip_layer_forward,
+)
+from .compression_schedule import CompressionSchedule, COMPRESS_METHODS
 from .utils import ManifoldMapper
 from hyptorch.lorentz.manifold import CustomLorentz as Lorentz 
 from hyptorch.geoopt import PoincareBall 
@@ -19,7 +23,7 @@ EUCLID = 'euclidean'
 POINCARE = 'poincare'
 LORENTZ = 'lorentz'
 class CompressedModel(nn.Module):
-    def __init__(self, compress_method='dct', r=0.95, window_size=2, manifold=None):
+    def __init__(self, compress_method='dct', r=0.95, window_size=2, manifold=None, prop_attn=False):
         super().__init__()
         self.r = r
         self.mapper = None 
@@ -28,6 +32,31 @@ class CompressedModel(nn.Module):
         self.window_size=window_size
         self.compress_method = compress_method
         self.num_reduced_token = 32 
+        self.schedule = None
+        self.compression_stats = {}
+        # track how many patches every token stands for and add log(size) to the attention logits
+        self.prop_attn = prop_attn
+
+    def configure_schedule(self, ratios=None, flops_budget=None):
+        """
+        Replaces the uniform `r` schedule by explicit per-layer keep ratios (a list or a
+        comma separated string) or by the ratio that meets `flops_budget`, a fraction
+        of the uncompressed FLOPs.
+        """
+        if isinstance(ratios, str):
+            ratios = [float(ratio) for ratio in ratios.split(',')]
+        if ratios is not None:
+            self.schedule = self.schedule.with_ratios(ratios)
+        elif flops_budget is not None and self.compress_method in COMPRESS_METHODS:
+            self.schedule = self.schedule.with_budget(float(flops_budget), self.compress_method)
+
+    def record_stats(self, token_counts):
+        """Estimated FLOPs of the last vision forward from the tokens that entered every block."""
+        flops = self.schedule.flops(token_counts)
+        self.compression_stats = {
+            'gflops': flops / 1e9,
+            'flops': flops / self.schedule.flops([self.schedule.num_tokens] * self.schedule.num_layers),
+        }
     
     def dist_func(self, x:torch.Tensor, y:torch.Tensor): 
         dis = 0
@@ -42,100 +71,6 @@ class CompressedModel(nn.Module):
         return dis 
 
 
-    def bipartite_soft_matching(
-        self,
-        x: torch.Tensor,
-        r: int=None,
-    ):
-        T = x.shape[1]
-
-        protected = 0
-        if r is None:
-            r = math.floor(T- T*self.r)
-            # print(r)
-        else:
-            # We can only reduce by a maximum of 50% tokens
-            r = min(r, (T - protected) // 2)
-
-        if r <= 0:
-            return x, x
-
-        with torch.no_grad():
-            x = F.normalize(x, p=2, dim=-1) 
-            a, b = x[..., ::2, :], x[..., 1::2, :]
-            scores = a @ b.transpose(-1, -2)
-
-       
-
-            node_max, node_idx = scores.max(dim=-1)
-            edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
-            # print(node_max)
-
-            unm_idx = edge_idx[..., r:, :]  # Unmerged Tokens
-            src_idx = edge_idx[..., :r, :]  # Merged Tokens
-            dst_idx = node_idx[..., None].gather(dim=-2, index=src_idx)
-
-
-        def merge(x: torch.Tensor, mode="mean") -> torch.Tensor:
-            src, dst = x[..., ::2, :], x[..., 1::2, :]
-            n, t1, c = src.shape
-            unm = src.gather(dim=-2, index=unm_idx.expand(n, t1 - r, c))
-            src = src.gather(dim=-2, index=src_idx.expand(n, r, c))
-            dst = dst.scatter_reduce(-2, dst_idx.expand(n, r, c), src, reduce=mode)
-
-            return torch.cat([unm, dst], dim=1)
-
-        return merge
-    
-
-    def pitome(self, x: torch.Tensor, r: int=None, margin:float=0.5):
-        B,T,_ = x.shape
-        r = math.floor(T- T*self.r)
-        with torch.no_grad():
-            batch_idx = torch.arange(B).unsqueeze_(1)
-            x_std =  x.std(-1, keepdim=True)
-
-            x = F.normalize(x, p=2, dim=-1)
-            ori_score =x@x.transpose(-1,-2) 
-            ori_score = torch.where(ori_score > margin, ori_score - margin, -1.0 * x_std)
-            min_indices =  torch.argsort(ori_score.mean(dim=-2), descending=True)[..., :2*r]
-            mask_to_keep = torch.ones_like(x, dtype=torch.bool).to(x.device)
-            mask_to_keep[batch_idx, min_indices,  :] = False
-            a_idx, b_idx = min_indices[..., ::2], min_indices[..., 1::2]
-            a, b = x[batch_idx, a_idx, :], x[batch_idx,  b_idx, :]
-            scores = a@b.transpose(-1,-2) 
-            _, dst_idx = scores.max(dim=-1) 
-
-        def merge(x: torch.Tensor, mode="mean") -> torch.Tensor:
-            B, _, C = x.shape
-            ori = torch.masked_select(x, mask_to_keep).view(B, -1, C)
-            src, dst = x[batch_idx, a_idx, :], x[batch_idx,  b_idx, :]
-            dst = dst.scatter_reduce(-2, dst_idx.unsqueeze(2).expand(B, -1, C), src, reduce=mode)
-            return torch.cat([ori, dst], dim=1)
-
-        return merge
-    
-
-
-
-
-    def merge_wavg(
-        self, merge, x: torch.Tensor, size: torch.Tensor = None
-    ): 
-        """
-        Applies the merge function by taking a weighted average based on token size.
-        Returns the merged tensor and the new token sizes.
-        """
-        if size is None:
-            size = torch.ones_like(x[..., 0, None])
-
-        x = merge(x, mode="mean")
-        # print(x.shape)
-        # size = merge(size, mode="sum")
-
-        # x = x / size
-        return x, None 
-            
     def forward(
         self,
         input_ids: torch.LongTensor=None,
@@ -149,19 +84,8 @@ class CompressedModel(nn.Module):
         else:
             return self.get_vision_features(pixel_values=pixel_values, use_compressed_hidden_state=use_compressed_hidden_state)
 
-    def dc_transform(self, x, use_reconstucted_state=False, threshold=None):
-        # cufft doesn't accept fp16
-        x = x.permute(1,0,2)
-        x_dct = dct(x.transpose(0,2), norm='ortho').transpose(0,2)
-        T, B, C = x_dct.size()
-        k = math.ceil(self.r * T)
-
-        if use_reconstucted_state:
-            x_dct = x_dct[:k, :, :]
-            x = idct(x_dct.transpose(0,2), norm='ortho').transpose(0,2)
-            # print(x)
-   
-        return x.permute(1,0,2), x_dct.permute(1,0,2)
+    def dc_transform(self, x, use_reconstucted_state=False, threshold=None, ratio=None):
+        return dct_compress(x, self.r if ratio is None else ratio, reconstruct=use_reconstucted_state)
 
     def direct(self, x, use_reconstucted_state = False):
         k = math.ceil(0.90 * x.shape[1])
@@ -180,19 +104,35 @@ class CompressedModel(nn.Module):
     def get_text_features(self, input_ids, attention_mask):
         raise NotImplementedError("This method is not implemented yet")
     
-    def compress_hidden_state(self, x, use_compressed_hidden_state, margin=0.5):
+    def init_size(self, x):
+        """Token sizes `(B, T, 1)` for proportional attention, None when it is off."""
+        return x.new_ones(x.shape[0], x.shape[1], 1) if self.prop_attn else None
+
+    def attn_bias(self, size):
+        return None if size is None else size_bias(size)
+
+    def compress_hidden_state(self, x, use_compressed_hidden_state, margin=0.5, ratio=None, size=None):
+        """Returns the compressed tokens, the DCT energy and the token sizes (None if `size` is)."""
+        ratio = self.r if ratio is None else ratio
         if self.compress_method == 'dct':
-            x_reconstructed, energy = self.dc_transform(x ,use_compressed_hidden_state ) 
-        elif self.compress_method == 'PiToMe':
-            merge = self.pitome(x, None, margin=margin) 
-            x_reconstructed, energy = self.merge_wavg(merge, x) 
-        elif self.compress_method == 'ToMe':
-            merge = self.bipartite_soft_matching(x, None) 
-            x_reconstructed, energy = self.merge_wavg(merge, x) 
+            x_reconstructed, energy = self.dc_transform(x ,use_compressed_hidden_state, ratio=ratio) 
+            if size is not None and x_reconstructed.shape[1] != x.shape[1]:
+                size = spread_size(size, x_reconstructed.shape[1])
+        elif self.compress_method in ('PiToMe', 'ToMe'):
+            r = num_merged(x.shape[1], ratio)
+            if r <= 0:
+                return x, None, size
+            if self.compress_method == 'PiToMe':
+                plan = pitome_plan(x, r, margin=margin)
+            else:
+                plan = bipartite_plan(x, r)
+            x_reconstructed, merged_size = merge(x, plan, size)
+            size = None if size is None else merged_size
+            energy = None
         else: 
-            return x, x
+            return x, x, size
 
-        return  x_reconstructed, energy
+        return  x_reconstructed, energy, size
 
     
 class CompressedHFBLIP(CompressedModel):
@@ -204,7 +144,13 @@ class CompressedHFBLIP(CompressedModel):
         self.text_model = model.text_model 
         self.vision_proj = model.visual_projection 
         self.text_proj = model.text_projection 
-        self.compress_layers = [6, 7, 8]
+        vision_config = model.config.vision_config
+        self.schedule = CompressionSchedule.uniform(
+            len(self.vision_model.encoder.layers), r, layers=[6, 7, 8],
+            num_tokens=(vision_config.image_size // vision_config.patch_size) ** 2 + 1,
+            dim=vision_config.hidden_size,
+            mlp_ratio=vision_config.intermediate_size / vision_config.hidden_size,
+        )
      
 
     
@@ -215,30 +161,39 @@ class CompressedHFBLIP(CompressedModel):
         real_mem = 0
         total_mem = 0
         ori_size = hidden_states.shape[1]
+        token_counts = []
+        size = self.init_size(hidden_states)
 
         for i, layer in enumerate(self.vision_model.encoder.layers):
-            if i in self.compress_layers:    
+            if self.schedule.compresses(i):    
                 cls = hidden_states[:, 0, :].unsqueeze(1)
-                state, cur_energy = self.compress_hidden_state(
+                state, cur_energy, state_size = self.compress_hidden_state(
                     hidden_states[:, 1:, :], 
                     use_compressed_hidden_state=use_compressed_hidden_state,
-                    # use_mean=i < len(self.compress_layers)/2
-                    margin=(0.5 if i< len(self.visual_encoder.blocks)//2 else  0.5*i/len(self.visual_encoder.blocks))
+                    margin=self.schedule.layer_margin(i),
+                    ratio=self.schedule.ratios[i],
+                    size=None if size is None else size[:, 1:],
                 )
                 hidden_states = torch.cat([cls, state], dim=1)
+                if size is not None:
+                    size = torch.cat([size[:, :1], state_size], dim=1)
                 if return_all_hidden_state or i == len(self.vision_model.encoder.layers)-1:
                     energy.append(cur_energy)
                     all_hidden_states.append(hidden_states)
                 real_mem += hidden_states.shape[1]
                 total_mem += ori_size 
 
-            hidden_states = layer(
-                hidden_states,
-                None,
-                None
-            )[0]
-
-
+            token_counts.append(hidden_states.shape[1])
+            if size is not None:
+                hidden_states = blip_layer_forward(layer, hidden_states, self.attn_bias(size))
+            else:
+                hidden_states = layer(
+                    hidden_states,
+                    None,
+                    None
+                )[0]
+
+        self.record_stats(token_counts)
         last_hidden_state = self.vision_model.post_layernorm(hidden_states)
         pooled_output = last_hidden_state[:, 0, :]
         vision_embed = self.vision_proj(pooled_output)
@@ -265,9 +220,13 @@ class CompressedLAVISBLIP(CompressedModel):
         self.text_model = model.text_encoder 
         self.vision_proj = model.vision_proj 
         self.text_proj = model.text_proj 
-        self.compress_layers = [i for i in range(1,len(self.vision_model.blocks))]
-        self.model_len = len(self.vision_model.blocks)
-        # self.compress_layers = [1,7]
+        fc1 = self.vision_model.blocks[0].mlp.fc1
+        self.schedule = CompressionSchedule.uniform(
+            len(self.vision_model.blocks), r,
+            num_tokens=self.vision_model.patch_embed.num_patches + 1,
+            dim=fc1.in_features,
+            mlp_ratio=fc1.out_features / fc1.in_features,
+        )
 
    
     def get_vision_features(self, pixel_values, use_compressed_hidden_state=True, return_all_hidden_state=False):
@@ -284,23 +243,31 @@ class CompressedLAVISBLIP(CompressedModel):
         ori_size = x.shape[1]
         real_mem = 0
         total_mem = 0
+        token_counts = []
+        size = self.init_size(x)
         for i, blk in enumerate(self.vision_model.blocks):
-            if i in self.compress_layers: 
+            if self.schedule.compresses(i): 
                 cls = x[:, 0, :].unsqueeze(1)
-                state, cur_energy = self.compress_hidden_state(
+                state, cur_energy, state_size = self.compress_hidden_state(
                     x[:, 1:, :], 
                     use_compressed_hidden_state=use_compressed_hidden_state,
-                    margin=(0.5 if i< self.model_len//2 else  0.5-0.5*i/self.model_len)
+                    margin=self.schedule.layer_margin(i),
+                    ratio=self.schedule.ratios[i],
+                    size=None if size is None else size[:, 1:],
                 )
                 x = torch.cat([cls, state], dim=1)
+                if size is not None:
+                    size = torch.cat([size[:, :1], state_size], dim=1)
 
                 if return_all_hidden_state or i == len(self.vision_model.blocks)-1:
                     energy.append(cur_energy)
                     hidden_states.append(state)
                 real_mem += x.shape[1]
                 total_mem += ori_size 
-            x = blk(x)
+            token_counts.append(x.shape[1])
+            x = blk(x) if size is None else vit_block_forward(blk, x, self.attn_bias(size))
 
+        self.record_stats(token_counts)
         # with torch.no_grad():
         x = self.vision_model.norm(x)
         vision_embed = self.vision_proj(x[:,0,:])
@@ -329,9 +296,13 @@ class CompressedHFCLIP(CompressedModel):
         self.text_model = model.text_model 
         self.vision_proj = model.visual_projection 
         self.text_proj = model.text_projection 
-        # self.compress_layers = [1, 7, 13, 19] if len(self.vision_model.encoder.layers) > 12 else [1, 7]
-        self.compress_layers = [i for i in range(1,len(self.vision_model.encoder.layers))]
-        self.len_model = len(self.vision_model.encoder.layers)
+        vision_config = model.config.vision_config
+        self.schedule = CompressionSchedule.uniform(
+            len(self.vision_model.encoder.layers), r,
+            num_tokens=(vision_config.image_size // vision_config.patch_size) ** 2 + 1,
+            dim=vision_config.hidden_size,
+            mlp_ratio=vision_config.intermediate_size / vision_config.hidden_size,
+        )
 
     def get_vision_features(self, pixel_values, use_compressed_hidden_state=True, return_all_hidden_state=False):
         energy = []
@@ -341,15 +312,21 @@ class CompressedHFCLIP(CompressedModel):
         real_mem = 0
         total_mem = 0
         ori_size = hidden_states.shape[1]
+        token_counts = []
+        size = self.init_size(hidden_states)
         for i, layer in enumerate(self.vision_model.encoder.layers):
-            if i in self.compress_layers:
+            if self.schedule.compresses(i):
                 cls = hidden_states[:, 0, :].unsqueeze(1)
-                state, cur_energy = self.compress_hidden_state(
+                state, cur_energy, state_size = self.compress_hidden_state(
                     hidden_states[:, 1:, :], 
                     use_compressed_hidden_state=use_compressed_hidden_state,
-                    margin=(0.5 if i< self.len_model//2 else  0.5-0.5*i/self.len_model)
+                    margin=self.schedule.layer_margin(i),
+                    ratio=self.schedule.ratios[i],
+                    size=None if size is None else size[:, 1:],
                 )
                 hidden_states = torch.cat([cls, state], dim=1)
+                if size is not None:
+                    size = torch.cat([size[:, :1], state_size], dim=1)
                 # print(hidden_states.shape)
             if return_all_hidden_state or i == len(self.vision_model.encoder.layers)-1:
                 energy.append(cur_energy)
@@ -357,12 +334,18 @@ class CompressedHFCLIP(CompressedModel):
             real_mem += hidden_states.shape[1]
             total_mem += ori_size 
 
+            token_counts.append(hidden_states.shape[1])
+            # CLIP adds its attention mask `(B, 1, T, T)` to the logits
+            bias = self.attn_bias(size)
+            if bias is not None:
+                bias = bias.to(hidden_states.dtype).expand(-1, -1, hidden_states.shape[1], -1)
             hidden_states = layer(
                 hidden_states,
-                None,
+                bias,
                 None
             )[0]
 
+        self.record_stats(token_counts)
         last_hidden_state = hidden_states
         pooled_output = last_hidden_state[:, 0, :]
         pooled_output = self.vision_model.post_layernorm(pooled_output)
@@ -394,9 +377,14 @@ class CompressedLAVISBLIP2(CompressedModel):
         self.text_proj = model.text_proj
         self.Qformer = model.Qformer
         self.itm_head = model.itm_head
-        # self.compress_layers = [20,22,24,26,28,30,32,34,36,38,40]
-        
-        self.compress_layers = [i for i in range(1,len(self.visual_encoder.blocks))]
+        fc1 = self.visual_encoder.blocks[0].mlp.fc1
+        self.schedule = CompressionSchedule.uniform(
+            len(self.visual_encoder.blocks), r,
+            num_tokens=self.visual_encoder.patch_embed.num_patches + 1,
+            dim=fc1.in_features,
+            mlp_ratio=fc1.out_features / fc1.in_features,
+            protected=0,
+        )
 
    
     def get_vision_features(self, pixel_values:torch.Tensor, use_compressed_hidden_state=True, return_all_hidden_state=False):
@@ -416,20 +404,26 @@ class CompressedLAVISBLIP2(CompressedModel):
             ori_size = x.shape[1]
 
             rel_pos_bias = self.visual_encoder.rel_pos_bias() if self.visual_encoder.rel_pos_bias is not None else None
+            token_counts = []
+            size = self.init_size(x)
             for i, blk in enumerate(self.visual_encoder.blocks):
-                margin = 0.5
-                if i in self.compress_layers:
-                    x, cur_energy = self.compress_hidden_state(
+                if self.schedule.compresses(i):
+                    x, cur_energy, size = self.compress_hidden_state(
                         x, 
                         use_compressed_hidden_state=use_compressed_hidden_state,
-                        margin=(margin if i< len(self.visual_encoder.blocks)//2 else  margin-margin*i/len(self.visual_encoder.blocks))
+                        margin=self.schedule.layer_margin(i),
+                        ratio=self.schedule.ratios[i],
+                        size=size,
                     )
-                x = blk(x, rel_pos_bias)
+                token_counts.append(x.shape[1])
+                # EVA adds the relative position bias to the attention logits
+                x = blk(x, rel_pos_bias if size is None else self.attn_bias(size))
                 if return_all_hidden_state or i == len(self.visual_encoder.blocks) - 1:
                     energy.append(cur_energy)
                     all_hidden_states.append(x)
                 real_mem += x.shape[1]
                 total_mem += ori_size 
+            self.record_stats(token_counts)
             vit_embeds = self.ln_vision(x)
 
 
@@ -0,0 +1,108 @@
+"""
+Declarative per-layer compression for the compressed vision towers.
+
+A schedule holds the keep ratio applied before every block (1.0 leaves the
+block alone) and the geometry of the tower, so it can estimate the FLOPs of a
+forward pass and solve a FLOPs budget into ratios:
+
+    schedule = CompressionSchedule.uniform(12, 0.925, num_tokens=197, dim=768)
+    schedule = schedule.with_budget(0.6, method='PiToMe')
+    schedule.flops_ratio('PiToMe')
+"""
+import math
+
+from .token_merging import num_merged
+
+COMPRESS_METHODS = ('dct', 'ToMe', 'PiToMe')
+
+
+def block_flops(num_tokens:int, dim:int, mlp_ratio:float=4.0):
+    """Forward FLOPs of one transformer block: qkv/out projections, attention and MLP."""
+    return 2 * (4 * num_tokens * dim ** 2 + 2 * num_tokens ** 2 * dim + 2 * mlp_ratio * num_tokens * dim ** 2)
+
+
+def kept_tokens(num_tokens:int, ratio:float, method:str):
+    """Tokens left after compressing `num_tokens` with `method` at keep ratio `ratio`."""
+    if ratio >= 1.0 or method not in COMPRESS_METHODS:
+        return num_tokens
+    if method == 'dct':
+        return math.ceil(ratio * num_tokens)
+    return num_tokens - max(num_merged(num_tokens, ratio), 0)
+
+
+class CompressionSchedule:
+    def __init__(self, ratios, num_tokens:int, dim:int, mlp_ratio:float=4.0, protected:int=1, margin:float=0.5):
+        """
+        `ratios[i]` is the keep ratio applied to the tokens entering block i, `num_tokens`
+        the tokens of an uncompressed layer of which the first `protected` (cls) are never
+        compressed.
+        """
+        self.ratios = [float(ratio) for ratio in ratios]
+        self.num_tokens = num_tokens
+        self.dim = dim
+        self.mlp_ratio = mlp_ratio
+        self.protected = protected
+        self.margin = margin
+
+    @classmethod
+    def uniform(cls, num_layers:int, r:float, layers=None, **geometry):
+        """The same ratio `r` before every block in `layers` (default: all but the first)."""
+        layers = range(1, num_layers) if layers is None else layers
+        return cls([r if i in layers else 1.0 for i in range(num_layers)], **geometry)
+
+    def _replace(self, ratios):
+        return CompressionSchedule(
+            ratios, self.num_tokens, self.dim, mlp_ratio=self.mlp_ratio, protected=self.protected, margin=self.margin
+        )
+
+    def with_ratios(self, ratios):
+        if len(ratios) != self.num_layers:
+            raise ValueError(f'expected {self.num_layers} per-layer ratios, got {len(ratios)}')
+        return self._replace(ratios)
+
+    def with_budget(self, budget:float, method:str, tol:float=1e-4):
+        """
+        Solves for the largest uniform ratio, on the layers this schedule compresses,
+        whose estimated FLOPs are at most `budget` times the uncompressed ones.
+        """
+        layers = [i for i, ratio in enumerate(self.ratios) if ratio < 1.0] or range(1, self.num_layers)
+        candidate = lambda r: self._replace([r if i in layers else 1.0 for i in range(self.num_layers)])
+        lo, hi = 0.0, 1.0
+        if candidate(lo).flops_ratio(method) > budget:
+            raise ValueError(f'a FLOPs budget of {budget} is not reachable with {method}')
+        while hi - lo > tol:
+            mid = (lo + hi) / 2
+            if candidate(mid).flops_ratio(method) <= budget:
+                lo = mid
+            else:
+                hi = mid
+        return candidate(lo)
+
+    @property
+    def num_layers(self):
+        return len(self.ratios)
+
+    def compresses(self, i:int):
+        return self.ratios[i] < 1.0
+
+    def layer_margin(self, i:int):
+        """PiToMe margin before block i: constant for the first half, then decaying linearly."""
+        if i < self.num_layers // 2:
+            return self.margin
+        return self.margin - self.margin * i / self.num_layers
+
+    def token_counts(self, method:str):
+        """Tokens entering every block."""
+        counts = []
+        num_tokens = self.num_tokens
+        for ratio in self.ratios:
+            num_tokens = self.protected + kept_tokens(num_tokens - self.protected, ratio, method)
+            counts.append(num_tokens)
+        return counts
+
+    def flops(self, token_counts):
+        return sum(block_flops(num_tokens, self.dim, self.mlp_ratio) for num_tokens in token_counts)
+
+    def flops_ratio(self, method:str):
+        """Estimated FLOPs of the blocks relative to the uncompressed tower."""
+        return self.flops(self.token_counts(method)) / self.flops([self.num_tokens] * self.num_layers)
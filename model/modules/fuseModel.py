@@ -15,6 +15,7 @@ from hyptorch.poincare.layers import UnidirectionalPoincareMLR
 from .seq_linear import LorentzSeqLinear, SeqLinear, HypSeqLinear
 from transformers import PerceiverConfig
 from typing import List, Union
+from utils.cache_utils import FeatureCache, FeatureCacheWriter
 
 class Text(object):
     pass
@@ -148,6 +149,8 @@ class FuseEncoder(nn.Module):
         self.text_head = text_head
         self.config = config
         self.mapper = mapper
+        # 'vision' / 'text' -> FeatureCache of the frozen first bodies
+        self.teacher_caches = {}
         self.dropout_text = nn.Dropout(0.1)
         self.dropout_vision = nn.Dropout(0.1)
         head_config = PerceiverConfig(
@@ -197,12 +200,62 @@ class FuseEncoder(nn.Module):
             )
     
 
+    def teacher_outputs(self, modality, keys=None, **inputs):
+        """
+        Outputs of the frozen first body, read from the feature cache when one is
+        set for `modality` and the batch carries its keys (image ids / caption indices).
+        """
+        cache = self.teacher_caches.get(modality)
+        if cache is not None and keys is not None:
+            fields = cache.read(keys, device=self.vision_fuse_proj.weight.device)
+            return fields.get('hidden'), fields['pooled'], fields['embed']
+        bodies = self.vision_bodies if modality == 'vision' else self.text_bodies
+        with torch.no_grad():
+            return bodies[0](**inputs)
+
+    @torch.no_grad()
+    def build_teacher_cache(self, loader, root, model_id, num_images, num_captions, dtype='fp16', split='train', device=None):
+        """
+        Runs the frozen first bodies once over `loader` (batches with `img_id` and
+        `caption_index`) and memory-maps their outputs: hidden states, pooled outputs
+        and embeddings per image, pooled outputs and embeddings per caption (the
+        fused text branch only uses those). Every image is encoded once. Caches
+        built before are loaded instead. Build on a single process, before the
+        distributed launch, concurrent builds would write the same files.
+        """
+        paths = {modality: FeatureCache.location(root, model_id, split, modality) for modality in ('vision', 'text')}
+        caches = {modality: FeatureCache.load(path) for modality, path in paths.items()}
+        if None in caches.values():
+            device = self.vision_fuse_proj.weight.device if device is None else device
+            vision_body, text_body = self.vision_bodies[0].to(device), self.text_bodies[0].to(device)
+            training = vision_body.training, text_body.training
+            vision_body.eval()
+            text_body.eval()
+            vision = FeatureCacheWriter(paths['vision'], num_images, dtype)
+            text = FeatureCacheWriter(paths['text'], num_captions, dtype)
+            for data in loader:
+                missing = vision.missing(data['img_id'])
+                if missing.any():
+                    hidden, pooled, embed = vision_body(pixel_values=data['pixel_values_0'][missing].to(device))
+                    vision.write(data['img_id'][missing], hidden=hidden, pooled=pooled, embed=embed)
+                _, pooled, embed = text_body(
+                    input_ids=data['input_ids_0'].to(device),
+                    attention_mask=data['attention_mask_0'].to(device),
+                )
+                text.write(data['caption_index'], pooled=pooled, embed=embed)
+            vision_body.train(training[0])
+            text_body.train(training[1])
+            caches = {'vision': vision.close(), 'text': text.close()}
+        self.teacher_caches = caches
+        return caches
+
     def forward(
             self,
             pixel_values: List[torch.FloatTensor] = None,
             input_ids: List[torch.Tensor] = None,
             attention_masks: List[torch.Tensor] = None,
             num_hidden_states: [torch.Tensor] = 1,
+            teacher_keys: torch.Tensor = None,
     ) -> torch.FloatTensor:
         last_hidden_states = []
         pooled_outputs = []
@@ -211,13 +264,12 @@ class FuseEncoder(nn.Module):
         if pixel_values is not None:
             for i in range(len(pixel_values)):
                 if i==0:
-                    with torch.no_grad():
-                        last_hidden_state, pooled_output, ori_embed = self.vision_bodies[i](
-                            pixel_values=pixel_values[i]
-                        )
-                        last_hidden_states.append(last_hidden_state)
-                        pooled_outputs.append(pooled_output)
-                        ori_feat = ori_embed 
+                    last_hidden_state, pooled_output, ori_embed = self.teacher_outputs(
+                        'vision', teacher_keys, pixel_values=pixel_values[i]
+                    )
+                    last_hidden_states.append(last_hidden_state)
+                    pooled_outputs.append(pooled_output)
+                    ori_feat = ori_embed 
                 else:
                     last_hidden_state, pooled_output, ori_embed = self.vision_bodies[i](
                         pixel_values=pixel_values[i],
@@ -241,14 +293,12 @@ class FuseEncoder(nn.Module):
         else:
             for i in range(len(input_ids)):
                 if i == 0:
-                    with torch.no_grad():
-                        last_hidden_state, pooled_output, ori_embed = self.text_bodies[i](
-                            input_ids=input_ids[i], 
-                            attention_mask=attention_masks[i],
-                        )
-                        last_hidden_states.append(last_hidden_state)
-                        pooled_outputs.append(pooled_output)
-                        ori_feat = ori_embed 
+                    last_hidden_state, pooled_output, ori_embed = self.teacher_outputs(
+                        'text', teacher_keys, input_ids=input_ids[i], attention_mask=attention_masks[i],
+                    )
+                    last_hidden_states.append(last_hidden_state)
+                    pooled_outputs.append(pooled_output)
+                    ori_feat = ori_embed 
                 else:
                     last_hidden_state, pooled_output, ori_embed = self.text_bodies[i](
                         input_ids=input_ids[i], 
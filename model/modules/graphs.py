@@ -1,17 +1,83 @@
+import functools
 import torch
 import torch.nn as nn
-from torch_geometric.data import Data, Batch
 from .seq_linear import SeqLinear, LorentzSeqLinear
 from torch_geometric.nn import GATv2Conv, global_mean_pool
 from .HypGAT import LorentzGAT
+from .star_attention import DenseStar, dense_star, star_gatv2
 from hyptorch.geoopt import ManifoldParameter
-from torch_geometric.utils import add_self_loops
 import torch.nn.functional as F
-from typing import Optional
+from typing import NamedTuple, Optional
 from hyptorch.lorentz.manifold import CustomLorentz
 from hyptorch.lorentz.layers import LorentzLinear, LorentzAct
 from torch_geometric.utils import dropout_edge 
 from lavis import BlipRetrieval
+
+
+class StarGraph(NamedTuple):
+    """A batch of star graphs laid out like `Batch.from_data_list` would, without the objects."""
+    x: torch.Tensor           # (bs * num_nodes [+ 1 root], C)
+    edge_index: torch.Tensor  # (2, E)
+    batch: torch.Tensor       # (bs * num_nodes,) graph of every node
+
+
+@functools.lru_cache(maxsize=64)
+def star_edge_index(num_nodes:int, bs:int, device:torch.device):
+    """
+    Edges of `bs` stars over `num_nodes` nodes each, node 0 (the pooled token)
+    connected both ways to every other node, followed by the self-loops, and the
+    graph of every node. Same edge order as the per-sample `Data` batch with
+    `add_self_loops`; built once per shape.
+    """
+    leaves = torch.arange(1, num_nodes, device=device)
+    center = torch.zeros_like(leaves)
+    nodes = torch.arange(num_nodes, device=device)
+    edge_index = torch.stack([
+        torch.cat([torch.stack([center, leaves], dim=-1).flatten(), nodes]),
+        torch.cat([torch.stack([leaves, center], dim=-1).flatten(), nodes]),
+    ])
+    offsets = torch.arange(bs, device=device).view(1, bs, 1) * num_nodes
+    edge_index = (edge_index.unsqueeze(1) + offsets).flatten(1)
+    return edge_index, torch.arange(bs, device=device).repeat_interleave(num_nodes)
+
+
+@functools.lru_cache(maxsize=64)
+def root_edge_index(num_nodes:int, bs:int, device:torch.device):
+    """Edges between a root appended after `bs` graphs of `num_nodes` nodes and the first node of each."""
+    root = torch.full((bs,), bs * num_nodes, device=device)
+    centers = torch.arange(bs, device=device) * num_nodes
+    return torch.stack([
+        torch.stack([root, centers], dim=-1).flatten(),
+        torch.stack([centers, root], dim=-1).flatten(),
+    ])
+
+
+def build_star_graph(x:torch.Tensor, dropout_edge_ratio:float=0.0, training:bool=False):
+    """Star graphs over the tokens of `x` `(bs, num_nodes, C)`, with edge dropout."""
+    bs, num_nodes = x.shape[:2]
+    edge_index, batch = star_edge_index(num_nodes, bs, x.device)
+    edge_index = dropout_edge(edge_index, p=dropout_edge_ratio, training=training)[0]
+    return StarGraph(x.reshape(bs * num_nodes, -1), edge_index, batch)
+
+
+def build_star_graph_pair(x_text:torch.Tensor, x_vision:torch.Tensor, dropout_edge_ratio:float=0.0, training:bool=False):
+    """Text star graphs followed by vision star graphs in one batch of `2 * bs` graphs."""
+    bs, text_nodes = x_text.shape[:2]
+    vision_nodes = x_vision.shape[1]
+    text_edge_index, text_batch = star_edge_index(text_nodes, bs, x_text.device)
+    vision_edge_index, vision_batch = star_edge_index(vision_nodes, bs, x_text.device)
+    edge_index = torch.cat([text_edge_index, vision_edge_index + bs * text_nodes], dim=-1)
+    edge_index = dropout_edge(edge_index, p=dropout_edge_ratio, training=training)[0]
+    x = torch.cat([x_text.reshape(bs * text_nodes, -1), x_vision.reshape(bs * vision_nodes, -1)])
+    return StarGraph(x, edge_index, torch.cat([text_batch, vision_batch + bs]))
+
+
+def add_star_root(graph:StarGraph, root:torch.Tensor, bs:int):
+    """Appends the `root` node and connects it to the first node of each of the `bs` graphs."""
+    edge_index = root_edge_index(graph.x.shape[0] // bs, bs, graph.x.device)
+    return graph._replace(
+        x=torch.cat([graph.x, root]), edge_index=torch.cat([graph.edge_index, edge_index], dim=-1)
+    )
 class ProjLayers(nn.Module):
   def __init__(self,  sizes=[768], hidden_sizes=[512],  dropout=0.1, shared=False):
     super().__init__()
@@ -34,7 +100,7 @@ class ProjLayers(nn.Module):
     return outputs
 
 class GraphHead(nn.Module):
-    def __init__(self, text_sizes=[768] ,vision_sizes=[768], proj_hidden_sizes=[512, 512], ft_out=512 ,dropout=0.1, graphs_hidden_channel=256, dropout_edge_ratio=0.1, shared=False, use_root=False):
+    def __init__(self, text_sizes=[768] ,vision_sizes=[768], proj_hidden_sizes=[512, 512], ft_out=512 ,dropout=0.1, graphs_hidden_channel=256, dropout_edge_ratio=0.1, shared=False, use_root=False, dense_star=True):
         super().__init__()
         self.text_sizes = text_sizes 
         self.vision_sizes = vision_sizes 
@@ -49,81 +115,20 @@ class GraphHead(nn.Module):
             self.root = None 
         # self.final_proj = LorentzSeqLinear(manifold, ft_in=ft_out*2 + 1, layer_dims=[513 ,ft_out + 1], dropout=dropout, act_func='gelu')
         self.dropout_edge_ratio = dropout_edge_ratio
+        # star attention on (B, N, C) tensors instead of message passing over the edge list
+        self.dense_star = dense_star
     
     def add_root(self, graph, bs):
-        starts = []
-        ends = []
         if self.root is not None:
-            graph_size = graph.x.shape[0] // bs 
-            graph.x = torch.cat([graph.x, self.root])
-            for i in range(bs):
-                starts.append(graph.x.shape[0]-1)
-                starts.append(i * graph_size)
-                ends.append(i * graph_size)
-                ends.append(graph.x.shape[0]-1)
-            graph.edge_index = torch.cat([graph.edge_index, torch.tensor([starts, ends], dtype=torch.long).to(graph.x.get_device())], dim=-1)
+            graph = add_star_root(graph, self.root, bs)
         return graph
-    
+
     def build_graph(self, hidden_states, x):
-        bs = x.shape[0] 
-        ends = []
-        starts = []
-        begin_index = 1
-        for i in range(len(hidden_states)):
-            for j in range(hidden_states[i].shape[-2]):
-                starts.append(0)
-                starts.append(begin_index + j)
-                ends.append(begin_index + j)
-                ends.append(0)
-            begin_index += hidden_states[i].shape[1]
-        edge_index = torch.tensor([starts, ends], dtype=torch.long).to(x.get_device())
-        edge_index = add_self_loops(edge_index)[0]
-        graphs = []
-        for i in range(bs):
-            graphs.append(Data(x=x[i,:,:], edge_index=edge_index))
-
-        data_batch = Batch.from_data_list(graphs) 
-        data_batch.edge_index = dropout_edge(data_batch.edge_index, p=self.dropout_edge_ratio, training=self.training)[0]
-        return data_batch
-        
+        # the pooled token plus every token of `hidden_states`, the topology only depends on x.shape
+        return build_star_graph(x, self.dropout_edge_ratio, self.training)
+
     def build_graph_itm(self, text_hidden_states, vision_hidden_states, x_text, x_vision):
-        bs = x_text.shape[0] 
-        ends = []
-        starts = []
-
-        begin_index = 1
-        for i in range(len(text_hidden_states)):
-            for j in range(text_hidden_states[i].shape[-2]):
-                starts.append(0)
-                starts.append(begin_index + j)
-                ends.append(begin_index + j)
-                ends.append(0)
-            begin_index += text_hidden_states[i].shape[1]
-
-        text_edge_index = torch.tensor([starts, ends], dtype=torch.long).to(x_text.get_device())
-        text_edge_index = add_self_loops(text_edge_index)[0]
-
-        ends = []
-        starts = []
-        for i in range(len(vision_hidden_states)):
-            for j in range(vision_hidden_states[i].shape[-2]):
-                starts.append(0)
-                starts.append(begin_index + j)
-                ends.append(begin_index + j)
-                ends.append(0)
-            begin_index += vision_hidden_states[i].shape[1]
-        vision_edge_index = torch.tensor([starts, ends], dtype=torch.long).to(x_text.get_device())
-        vision_edge_index= add_self_loops(vision_edge_index)[0]
-
-        graphs = []
-        for i in range(bs):
-            graphs.append(Data(x=x_text[i,:,:], edge_index=text_edge_index))
-        for i in range(bs):
-            graphs.append(Data(x=x_vision[i,:,:], edge_index=vision_edge_index))
-
-        data_batch = Batch.from_data_list(graphs) 
-        data_batch.edge_index = dropout_edge(data_batch.edge_index, p=self.dropout_edge_ratio, training=self.training)[0]
-        return data_batch
+        return build_star_graph_pair(x_text, x_vision, self.dropout_edge_ratio, self.training)
 
     def forward(self, hidden_states:torch.Tensor, pooled_output:torch.Tensor, mode='text'):
         if mode == 'text':
@@ -135,8 +140,11 @@ class GraphHead(nn.Module):
 
         bs = output.shape[0] 
         output = torch.cat([pooled_output.view(bs, 1, -1), output], dim=-2)
-        graph = self.build_graph(hidden_states=hidden_states, x=output) 
-        graph = self.add_root(graph=graph, bs=bs) 
+        if self.dense_star:
+            graph = dense_star(output, self.root, self.dropout_edge_ratio, self.training)
+        else:
+            graph = self.build_graph(hidden_states=hidden_states, x=output) 
+            graph = self.add_root(graph=graph, bs=bs) 
         graph_output, mean = self.gnn(graph, batch_size=bs, use_root=(self.root is not None))
         output = graph_output + pooled_output
 
@@ -164,7 +172,20 @@ class GNN(torch.nn.Module):
         )
         self.final_lin = nn.Linear(hidden_channels, ft_out)
 
+    def star_forward(self, star:DenseStar):
+        x, root = star_gatv2(self.conv1, star)
+        x, root = self.act1(x), None if root is None else self.act1(root)
+        x, _ = star_gatv2(self.conv2, star._replace(x=x, root=root))
+        x = self.act2(x)
+        graph_mean = x.mean(dim=1)
+        x = self.lin(x[:, 0, :])
+        x = F.dropout(x, p=0.2, training=self.training)
+        x = self.final_lin(x)
+        return x, graph_mean
+
     def forward(self, graphs, batch_size, use_root=False):
+        if isinstance(graphs, DenseStar):
+            return self.star_forward(graphs)
         x, edge_index,batch = graphs.x, graphs.edge_index, graphs.batch
         x = self.conv1(x, edge_index)
         x = self.act1(x)
@@ -261,7 +282,22 @@ class LorentzGNN(torch.nn.Module):
         )
         self.final_lin = LorentzLinear(manifold=manifold, in_features=hidden_channels+ 1, out_features=ft_out + 1, dropout=0.2)
 
+    def star_forward(self, star:DenseStar):
+        get_space = self.manifold.get_space
+        root = None if star.root is None else get_space(star.root)
+        x, root = star_gatv2(self.conv1, DenseStar(get_space(star.x), star.edge_mask, root))
+        x, root = self.act1(x), None if root is None else self.act1(root)
+        x, _ = star_gatv2(self.conv2, star._replace(x=x, root=root))
+        x = self.manifold.add_time(x)
+        graph_mean = self.manifold.centroid(x=x)
+        x = self.lin(x[:, 0, :])
+        x = self.final_lin(x)
+        self.manifold.assert_check_point_on_manifold(x)
+        return x, graph_mean
+
     def forward(self, graphs, batch_size, use_root=False):
+        if isinstance(graphs, DenseStar):
+            return self.star_forward(graphs)
         x, edge_index, _ = graphs.x, graphs.edge_index, graphs.batch
         x = self.manifold.get_space(x)
         x = self.conv1(x, edge_index)
@@ -322,7 +358,7 @@ class LorentzProjLayers(nn.Module):
     return outputs
 
 class LorentzGraphHead(nn.Module):
-    def __init__(self, manifold:CustomLorentz, ft_in=256, ft_out=512 , graphs_hidden_channel=256, dropout_edge_ratio=0.1, use_root=False):
+    def __init__(self, manifold:CustomLorentz, ft_in=256, ft_out=512 , graphs_hidden_channel=256, dropout_edge_ratio=0.1, use_root=False, dense_star=True):
         super().__init__()
         self.manifold = manifold
         self.gnn = LorentzGNN(manifold=manifold, ft_in=ft_in, hidden_channels=graphs_hidden_channel, ft_out=ft_out) 
@@ -331,89 +367,31 @@ class LorentzGraphHead(nn.Module):
         else:
             self.root = None 
         self.dropout_edge_ratio = dropout_edge_ratio
+        # star attention on (B, N, C) tensors instead of message passing over the edge list
+        self.dense_star = dense_star
     
     def add_root(self, graph, bs):
-        starts = []
-        ends = []
         if self.root is not None:
-            graph_size = graph.x.shape[0] // bs 
-            graph.x = torch.cat([graph.x, self.root])
-            for i in range(bs):
-                starts.append(graph.x.shape[0]-1)
-                starts.append(i * graph_size)
-                ends.append(i * graph_size)
-                ends.append(graph.x.shape[0]-1)
-            graph.edge_index = torch.cat([graph.edge_index, torch.tensor([starts, ends], dtype=torch.long).to(graph.x.get_device())], dim=-1)
+            graph = add_star_root(graph, self.root, bs)
         return graph
-    
+
     def build_graph(self, hidden_states, x):
-        bs = x.shape[0] 
-        ends = []
-        starts = []
-        begin_index = 1
-        for i in range(len(hidden_states)):
-            for j in range(hidden_states[i].shape[-2]):
-                starts.append(0)
-                starts.append(begin_index + j)
-                ends.append(begin_index + j)
-                ends.append(0)
-            begin_index += hidden_states[i].shape[1]
-        edge_index = torch.tensor([starts, ends], dtype=torch.long).to(x.get_device())
-        edge_index = add_self_loops(edge_index)[0]
-        graphs = []
-        for i in range(bs):
-            graphs.append(Data(x=x[i,:,:], edge_index=edge_index))
-
-        data_batch = Batch.from_data_list(graphs) 
-        data_batch.edge_index = dropout_edge(data_batch.edge_index, p=self.dropout_edge_ratio, training=self.training)[0]
-        return data_batch
-        
+        # the pooled token plus every token of `hidden_states`, the topology only depends on x.shape
+        return build_star_graph(x, self.dropout_edge_ratio, self.training)
+
     def build_graph_itm(self, text_hidden_states, vision_hidden_states, x_text, x_vision):
-        bs = x_text.shape[0] 
-        ends = []
-        starts = []
-
-        begin_index = 1
-        for i in range(len(text_hidden_states)):
-            for j in range(text_hidden_states[i].shape[-2]):
-                starts.append(0)
-                starts.append(begin_index + j)
-                ends.append(begin_index + j)
-                ends.append(0)
-            begin_index += text_hidden_states[i].shape[1]
-
-        text_edge_index = torch.tensor([starts, ends], dtype=torch.long).to(x_text.get_device())
-        text_edge_index = add_self_loops(text_edge_index)[0]
-
-        ends = []
-        starts = []
-        for i in range(len(vision_hidden_states)):
-            for j in range(vision_hidden_states[i].shape[-2]):
-                starts.append(0)
-                starts.append(begin_index + j)
-                ends.append(begin_index + j)
-                ends.append(0)
-            begin_index += vision_hidden_states[i].shape[1]
-        vision_edge_index = torch.tensor([starts, ends], dtype=torch.long).to(x_text.get_device())
-        vision_edge_index= add_self_loops(vision_edge_index)[0]
-
-        graphs = []
-        for i in range(bs):
-            graphs.append(Data(x=x_text[i,:,:], edge_index=text_edge_index))
-        for i in range(bs):
-            graphs.append(Data(x=x_vision[i,:,:], edge_index=vision_edge_index))
-
-        data_batch = Batch.from_data_list(graphs) 
-        data_batch.edge_index = dropout_edge(data_batch.edge_index, p=self.dropout_edge_ratio, training=self.training)[0]
-        return data_batch
+        return build_star_graph_pair(x_text, x_vision, self.dropout_edge_ratio, self.training)
 
     def forward(self, hidden_states:torch.Tensor, pooled_output:torch.Tensor):
 
         bs = pooled_output.shape[0] 
         output = torch.cat(hidden_states, dim =-2)
         output = torch.cat([pooled_output.view(bs, 1, -1), output], dim=-2)
-        graph = self.build_graph(hidden_states=hidden_states, x=output) 
-        graph = self.add_root(graph=graph, bs=bs) 
+        if self.dense_star:
+            graph = dense_star(output, self.root, self.dropout_edge_ratio, self.training)
+        else:
+            graph = self.build_graph(hidden_states=hidden_states, x=output) 
+            graph = self.add_root(graph=graph, bs=bs) 
         graph_output, graph_mean  = self.gnn(graph, batch_size=bs, use_root=(self.root is not None))
         # output = self.manifold.get_space(graph_output) + self.manifold.get_space(pooled_output)
         # output = self.manifold.add_time(output)
@@ -0,0 +1,15 @@
+import torch
+
+
+def sample_negatives(weights: torch.Tensor, hard_topk: int = 0) -> torch.Tensor:
+    """
+    Draws one negative index per row of the masked ITM weights `(bs, n)` with a
+    single `torch.multinomial` call, the indices stay on the device (no `.item()`).
+
+    `hard_topk > 0` restricts every draw to the `hard_topk` largest weights of the
+    row, `hard_topk=1` always picks the hardest negative.
+    """
+    if hard_topk > 0:
+        top_weights, top_index = weights.topk(min(hard_topk, weights.shape[1]), dim=1)
+        return top_index.gather(1, torch.multinomial(top_weights, 1)).squeeze(1)
+    return torch.multinomial(weights, 1).squeeze(1)
@@ -0,0 +1,144 @@
+"""
+Dense attention over the star graphs of the graph heads.
+
+The graphs built by `build_star_graph` are all stars: node 0 (the pooled
+token) has edges both ways with every other node and every node has a
+self-loop, optionally plus a root linked both ways to every center. So instead
+of scattering over an edge list, `star_gatv2` and `star_lorentz_gat` run a
+`GATv2Conv` / `LorentzGAT` with its own parameters on `(B, N, C)` tensors: the
+center attends over its N in-edges (and the root), every other node over the
+center and itself, with a masked softmax. Edge dropout is a `(3, B, N)` mask.
+"""
+from typing import NamedTuple, Optional
+
+import torch
+import torch.nn.functional as F
+
+
+class DenseStar(NamedTuple):
+    x: torch.Tensor                      # (B, N, C), node 0 is the center
+    edge_mask: torch.Tensor              # (3, B, N) kept edges, see `star_edge_mask`
+    root: Optional[torch.Tensor] = None  # (1, C) linked both ways to every center
+
+
+def star_edge_mask(bs:int, num_nodes:int, p:float=0.0, training:bool=False, device=None):
+    """
+    Edges kept by `dropout_edge`: `[0, b, j]` j -> center (`j = 0` is the center's
+    self-loop), `[1, b, j]` center -> j and `[2, b, j]` the self-loop of j
+    (`[1:, b, 0]` are unused). Root edges are never dropped, as in `add_star_root`.
+    """
+    if not training or p == 0.0:
+        return torch.ones(3, bs, num_nodes, dtype=torch.bool, device=device)
+    return torch.rand(3, bs, num_nodes, device=device) >= p
+
+
+def dense_star(x:torch.Tensor, root:torch.Tensor=None, dropout_edge_ratio:float=0.0, training:bool=False):
+    """The dense counterpart of `build_star_graph` (and `add_star_root`) for `x` `(B, N, C)`."""
+    return DenseStar(x, star_edge_mask(x.shape[0], x.shape[1], dropout_edge_ratio, training, x.device), root)
+
+
+def _masked_softmax(scores:torch.Tensor, mask:torch.Tensor, dim:int):
+    """Softmax over the kept entries, zeros for a node without in-edges (like `torch_geometric.utils.softmax`)."""
+    scores = scores.masked_fill(~mask, torch.finfo(scores.dtype).min)
+    scores = (scores - scores.amax(dim=dim, keepdim=True)).exp() * mask
+    return scores / (scores.sum(dim=dim, keepdim=True) + 1e-16)
+
+
+def _star_attention(
+    x_l, x_r, score, edge_mask, root_l=None, root_r=None, root_self_loop=False, dropout=0.0, training=False
+):
+    """
+    Sums `alpha * x_l[source]` into every target, `x_l` / `x_r` `(B, N, H, C)` the
+    source / target features, `score(x_i, x_j)` the `(..., H)` attention logits of
+    edges j -> i. Returns the nodes `(B, N, H, C)` and the root `(1, H, C)` or None.
+    """
+    to_center, from_center, self_loop = edge_mask.unsqueeze(-1)
+    center_l, center_r = x_l[:, 0], x_r[:, :1]
+
+    # center: every node of its graph, then the root
+    scores = score(center_r, x_l)
+    mask = to_center
+    if root_l is not None:
+        scores = torch.cat([scores, score(center_r, root_l.unsqueeze(1))], dim=1)
+        mask = torch.cat([mask, mask.new_ones(mask.shape[0], 1, 1)], dim=1)
+    alpha = F.dropout(_masked_softmax(scores, mask, dim=1), p=dropout, training=training)
+    center = (alpha[:, :x_l.shape[1], :, None] * x_l).sum(dim=1)
+    if root_l is not None:
+        center = center + alpha[:, -1, :, None] * root_l
+
+    # other nodes: the center and themselves
+    scores = torch.stack([score(x_r, center_l.unsqueeze(1)), score(x_r, x_l)], dim=2)
+    alpha = _masked_softmax(scores, torch.stack([from_center, self_loop], dim=2), dim=2)
+    alpha = F.dropout(alpha, p=dropout, training=training)
+    nodes = alpha[:, :, 0, :, None] * center_l.unsqueeze(1) + alpha[:, :, 1, :, None] * x_l
+    nodes = torch.cat([center.unsqueeze(1), nodes[:, 1:]], dim=1)
+
+    if root_l is None:
+        return nodes, None
+    # root: the B centers (and its self-loop)
+    scores = score(root_r, center_l)
+    sources = center_l
+    if root_self_loop:
+        scores = torch.cat([scores, score(root_r, root_l)])
+        sources = torch.cat([sources, root_l])
+    alpha = F.dropout(scores.softmax(dim=0), p=dropout, training=training)
+    return nodes, (alpha.unsqueeze(-1) * sources).sum(dim=0, keepdim=True)
+
+
+def star_gatv2(conv, star:DenseStar):
+    """
+    `GATv2Conv.forward` on the star graph `star`, returns the nodes `(B, N, C_out)`
+    and the root `(1, C_out)` (None without root). GATv2Conv replaces the graph
+    self-loops by its own, so they are never dropped.
+    """
+    x = star.x
+    B, N, _ = x.shape
+    H, C = conv.heads, conv.out_channels
+    edge_mask = star.edge_mask.clone()
+    edge_mask[0, :, 0] = True
+    edge_mask[2] = True
+
+    def score(x_i, x_j):
+        return (F.leaky_relu(x_i + x_j, conv.negative_slope) * conv.att).sum(dim=-1)
+
+    root_l = root_r = None
+    if star.root is not None:
+        root_l, root_r = conv.lin_l(star.root).view(1, H, C), conv.lin_r(star.root).view(1, H, C)
+    nodes, root = _star_attention(
+        conv.lin_l(x).view(B, N, H, C), conv.lin_r(x).view(B, N, H, C), score, edge_mask,
+        root_l, root_r, root_self_loop=True, dropout=conv.dropout, training=conv.training
+    )
+    outputs = []
+    for out, inp in [(nodes, x), (root, star.root)]:
+        if out is None:
+            outputs.append(None)
+            continue
+        out = out.flatten(-2) if conv.concat else out.mean(dim=-2)
+        if getattr(conv, 'res', None) is not None:
+            out = out + conv.res(inp)
+        if conv.bias is not None:
+            out = out + conv.bias
+        outputs.append(out)
+    return tuple(outputs)
+
+
+def star_lorentz_gat(conv, star:DenseStar):
+    """
+    `LorentzGAT.forward` on the star graph `star`, returns the nodes `(B, N, C_out + 1)`
+    and the root `(1, C_out + 1)` (None without root).
+    """
+    manifold = conv.manifold
+    att_space, att_time = manifold.get_space(conv.att), manifold.get_time(conv.att)
+
+    def score(x_i, x_j):
+        x = conv.act(manifold.projx(x_i + x_j))
+        return (manifold.get_time(x) * att_time).sum(dim=-1) - (manifold.get_space(x) * att_space).sum(dim=-1)
+
+    root_l = root_r = None
+    if star.root is not None:
+        root_l, root_r = conv.lin_l(star.root).unsqueeze(-2), conv.lin_r(star.root).unsqueeze(-2)
+    nodes, root = _star_attention(
+        conv.lin_l(star.x).unsqueeze(-2), conv.lin_r(star.x).unsqueeze(-2), score, star.edge_mask,
+        root_l, root_r, root_self_loop=False, dropout=conv.dropout, training=conv.training
+    )
+    return manifold.projx(nodes.squeeze(-2)), None if root is None else manifold.projx(root.squeeze(-2))
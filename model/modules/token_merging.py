@@ -0,0 +1,134 @@
+"""
+Token compression used by `CompressedModel`: DCT low-pass and ToMe / PiToMe merging.
+
+Merging is split into a plan (which tokens are kept, merged away and merged
+into) and `merge`, which only gathers and scatters: no boolean masks, no
+`masked_select`. `merge` also tracks how many patches every token stands for,
+so merged tokens are size-weighted averages and the sizes can be used for
+proportional attention: `size_bias` is added to the attention logits, the
+block helpers below run the LAVIS ViT and HF BLIP blocks with it (HF CLIP and
+EVA blocks take it as their attention mask / relative position bias).
+"""
+import math
+from typing import NamedTuple
+
+import torch
+import torch.nn.functional as F
+
+from .dct import dct_basis
+
+
+class MergePlan(NamedTuple):
+    keep_idx: torch.Tensor  # (B, T_keep) tokens passed through unchanged
+    src_idx: torch.Tensor   # (B, r) tokens merged away
+    dst_idx: torch.Tensor   # (B, T_dst) tokens that receive the merged ones
+    dst_pos: torch.Tensor   # (B, r) position in dst_idx each src token goes to
+
+
+def num_merged(T:int, ratio:float):
+    """Tokens to remove so that `ratio * T` remain, at most half of them."""
+    return min(math.floor(T - T * ratio), T // 2)
+
+
+def _gather(x, index):
+    return x.gather(1, index.unsqueeze(-1).expand(-1, -1, x.shape[-1]))
+
+
+def bipartite_plan(x:torch.Tensor, r:int):
+    """ToMe: split into even/odd tokens, merge the r even tokens closest to an odd one."""
+    B, T, _ = x.shape
+    with torch.no_grad():
+        x = F.normalize(x, p=2, dim=-1)
+        a, b = x[:, ::2, :], x[:, 1::2, :]
+        node_max, node_idx = (a @ b.transpose(-1, -2)).max(dim=-1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)
+        dst_pos = node_idx.gather(1, edge_idx[:, :r])
+        dst_idx = torch.arange(1, T, 2, device=x.device).expand(B, -1)
+        return MergePlan(2 * edge_idx[:, r:], 2 * edge_idx[:, :r], dst_idx, dst_pos)
+
+
+def pitome_plan(x:torch.Tensor, r:int, margin:float=0.5):
+    """
+    PiToMe: the 2r tokens with the highest energy (mean margin similarity) are
+    split in two halves and the first half is merged into the closest token of
+    the second one, all others are kept in their original order.
+    """
+    with torch.no_grad():
+        x_std = x.std(-1, keepdim=True)
+        x = F.normalize(x, p=2, dim=-1)
+        sim = x @ x.transpose(-1, -2)
+        energy = torch.where(sim > margin, sim - margin, -1.0 * x_std).mean(dim=-2)
+        order = energy.argsort(dim=-1, descending=True)
+        a_idx, b_idx = order[:, :2 * r:2], order[:, 1:2 * r:2]
+        keep_idx = order[:, 2 * r:].sort(dim=-1).values
+        # a-b similarities come from the matrix above instead of a second matmul
+        scores = sim.gather(1, a_idx.unsqueeze(-1).expand(-1, -1, sim.shape[-1])).gather(2, b_idx.unsqueeze(1).expand(-1, r, -1))
+        dst_pos = scores.argmax(dim=-1)
+        return MergePlan(keep_idx, a_idx, b_idx, dst_pos)
+
+
+def merge(x:torch.Tensor, plan:MergePlan, size:torch.Tensor=None):
+    """
+    Applies `plan` to `x` `(B, T, C)`, merged tokens are averaged weighted by `size`
+    `(B, T, 1)` (ones if None). Returns the merged tokens (kept tokens first) and
+    their sizes.
+    """
+    if size is None:
+        size = x.new_ones(x.shape[0], x.shape[1], 1)
+    dst_pos = plan.dst_pos.unsqueeze(-1)
+    src_size = _gather(size, plan.src_idx)
+    dst_size = _gather(size, plan.dst_idx).scatter_add(1, dst_pos, src_size)
+    dst = (_gather(x, plan.dst_idx) * _gather(size, plan.dst_idx)).scatter_add(
+        1, dst_pos.expand(-1, -1, x.shape[-1]), _gather(x, plan.src_idx) * src_size
+    )
+    x = torch.cat([_gather(x, plan.keep_idx), dst / dst_size], dim=1)
+    size = torch.cat([_gather(size, plan.keep_idx), dst_size], dim=1)
+    return x, size
+
+
+def dct_compress(x:torch.Tensor, ratio:float, reconstruct:bool=True):
+    """
+    Keeps the first `ceil(ratio * T)` DCT coefficients along the tokens of `x`
+    `(B, T, C)` and maps them back to as many tokens. Returns the tokens and the
+    coefficients. The DCT is a matmul with a cached orthonormal basis.
+    """
+    T = x.shape[1]
+    basis = dct_basis(T, x.dtype, x.device)
+    if not reconstruct:
+        return x, basis @ x
+    k = math.ceil(ratio * T)
+    x_dct = basis[:k] @ x
+    return dct_basis(k, x.dtype, x.device).T @ x_dct, x_dct
+
+
+def spread_size(size:torch.Tensor, num_tokens:int):
+    """Sizes after a DCT low-pass to `num_tokens` tokens: the patches are spread evenly."""
+    return (size.sum(dim=1, keepdim=True) / num_tokens).expand(-1, num_tokens, -1)
+
+
+def size_bias(size:torch.Tensor):
+    """Proportional attention: `log(size)` added to the attention logits of every key, `(B, 1, 1, T)`."""
+    return size.log().transpose(1, 2).unsqueeze(1)
+
+
+def _biased_attention(x, qkv, num_heads, bias, dropout_p):
+    B, N, C = x.shape
+    q, k, v = qkv(x).reshape(B, N, 3, num_heads, C // num_heads).permute(2, 0, 3, 1, 4)
+    x = F.scaled_dot_product_attention(q, k, v, attn_mask=bias.to(q.dtype), dropout_p=dropout_p)
+    return x.transpose(1, 2).reshape(B, N, C)
+
+
+def vit_block_forward(blk, x:torch.Tensor, bias:torch.Tensor):
+    """LAVIS (timm style) ViT block with an additive attention bias."""
+    attn = blk.attn
+    h = _biased_attention(blk.norm1(x), attn.qkv, attn.num_heads, bias, attn.attn_drop.p if attn.training else 0.0)
+    x = x + blk.drop_path(attn.proj_drop(attn.proj(h)))
+    return x + blk.drop_path(blk.mlp(blk.norm2(x)))
+
+
+def blip_layer_forward(layer, x:torch.Tensor, bias:torch.Tensor):
+    """Hugging Face `BlipEncoderLayer` with an additive attention bias."""
+    attn = layer.self_attn
+    h = _biased_attention(layer.layer_norm1(x), attn.qkv, attn.num_heads, bias, attn.dropout.p if attn.training else 0.0)
+    x = x + attn.projection(h)
+    return x + layer.mlp(layer.layer_norm2(x))
@@ -11,6 +11,7 @@ from .modules.perceiver import CoHead
 from peft import get_peft_model, LoraConfig, TaskType
 from typing import List 
 from .modules.seq_linear import SeqLinear
+from .modules.negatives import sample_negatives
 
 EUCLID = "euclidean"
 POINCARE = "poincare"
@@ -159,18 +160,12 @@ class MyModel(nn.Module):
         weights_i2t.masked_fill_(mask, 0)
         weights_t2i.masked_fill_(mask, 0) 
         # select a negative image for each text
-        img_enc_neg = []    
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-            img_enc_neg.append(imgs[neg_idx])
-        img_enc_neg = torch.stack(img_enc_neg,dim=0) 
+        neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+        img_enc_neg = imgs[neg_idx]
 
         # select a negative text for each image
-        cap_enc_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-            cap_enc_neg.append(cap[neg_idx])
-        cap_enc_neg = torch.stack(cap_enc_neg,dim=0)   
+        neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+        cap_enc_neg = cap[neg_idx]
 
         cap_enc_all = torch.cat([cap, cap, cap_enc_neg],dim=0)     
         img_enc_all = torch.cat([imgs, img_enc_neg, imgs],dim=0)
@@ -12,6 +12,7 @@ from .baseQueueModel import BaseModelWithQueue
 from copy import deepcopy
 from .modules.discriminator import Discriminator as DisModel
 from .modules.hyp_discriminator import LorentzDiscriminator as LorentzDisModel
+from .modules.negatives import sample_negatives
 from hyptorch.lorentz.layers import LorentzMLR, LorentzLinear 
 EUCLID = 'euclidean'
 POINCARE = 'poincare'
@@ -111,19 +112,12 @@ class PerceiverCLIPWithQueue(BaseModelWithQueue):
             weights_t2i.masked_fill_(mask, 0) 
 
         # select a negative image for each text
-        image_embeds_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_t2i[b], 1).item()
-            image_embeds_neg.append(image_hidden_states[neg_idx])
-        image_embeds_neg = torch.stack(image_embeds_neg, dim=0)
+        neg_idx = sample_negatives(weights_t2i, self.config.itm_hard_topk)
+        image_embeds_neg = image_hidden_states[neg_idx]
 
         # select a negative text for each image
-        text_ids_neg = []
-        for b in range(bs):
-            neg_idx = torch.multinomial(weights_i2t[b], 1).item()
-            text_ids_neg.append(text_hidden_states[neg_idx])
-
-        text_ids_neg = torch.stack(text_ids_neg, dim=0)
+        neg_idx = sample_negatives(weights_i2t, self.config.itm_hard_topk)
+        text_ids_neg = text_hidden_states[neg_idx]
 
         text_hidden_states = torch.cat(
             [text_hidden_states, text_hidden_states, text_ids_neg], dim=0
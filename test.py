@@ -1,5 +1,7 @@
+import torch
 from lavis.datasets.builders import load_dataset
-from utils.data_utils import get_fused_dataloader, get_fused_loaders
+from utils.data_utils import get_fused_dataloader, get_fused_loaders, get_loader_kwargs
+from utils.image_shards import wrap_with_shards
 from model.modules.utils import prepare_processors_and_models
 from model.baseFuseModel import BaseModelWithQueue as FuseModel
 from trainer_perceiver import MyTrainer as FuseTrainer
@@ -20,15 +22,25 @@ from config import (
 )
 
 config = parser.parse_args()
-def run(config, vis_processors, txt_processors, tokenizers, dataset, models):
+def run(config, vis_processors, txt_processors, tokenizers, dataset, models, teacher_id=None):
     train_loader, val_loader, test_loader = get_fused_loaders(
         dataset,
         vis_processors=vis_processors,
         txt_processors=txt_processors,
         tokenizers=tokenizers,
+        max_txt_len=config.max_txt_len,
+        **get_loader_kwargs(config)
     )
 
     queue_model = FuseModel(config, models) 
+    if config.teacher_cache_dir is not None:
+        queue_model.build_teacher_cache(
+            train_loader, config.teacher_cache_dir, teacher_id,
+            num_images=len(dataset['train'].img_ids),
+            num_captions=len(dataset['train']),
+            dtype=config.teacher_cache_dtype,
+            device='cuda' if torch.cuda.is_available() else 'cpu',
+        )
     trainer = FuseTrainer(
         model=queue_model,
         config=config,
@@ -57,6 +69,7 @@ if __name__ == '__main__':
     else:
         config.model_ckt = LAVIS_BLIP_BASE_COCO 
         dataset = load_dataset("coco_retrieval", vis_path=COCO_PATH, cfg_path=None)
+    dataset = wrap_with_shards(dataset, config.image_shard_dir, config.dataset)
 
 
     tokenizers, vis_processors, txt_processors, models = prepare_processors_and_models(model_ckts)
@@ -70,4 +83,4 @@ if __name__ == '__main__':
             config.use_fused_features = use_fused_feature 
             for manifold in [EUCLID, LORENTZ]:
                 config.manifold = manifold 
-                run(config, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, dataset=dataset, models=models)
\ No newline at end of file
+                run(config, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, dataset=dataset, models=models, teacher_id=model_ckts[0])
\ No newline at end of file
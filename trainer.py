@@ -1,7 +1,11 @@
 import wandb
 from accelerate import Accelerator
 from hyptorch.geoopt.optim import RiemannianAdam, RiemannianSGD
-from utils.retrivial_utils import report_metrics 
+from hyptorch.geoopt import set_validation_policy, flush_validation
+from hyptorch.lorentz.layers import fuse_lorentz
+from utils.retrivial_utils import tiled_report_metrics 
+from utils.cache_utils import EmbeddingStore, model_fingerprint, vision_cache_name
+from utils.data_utils import get_loader_kwargs
 from tqdm.auto import tqdm
 import torch
 from config import EUCLID, POINCARE, LORENTZ
@@ -47,6 +51,8 @@ class MyTrainer:
         self.enable_log = self.config.enable_log
         self.current_epoch = 0
         self.model = self.accelerator.prepare(model)
+        set_validation_policy(config.manifold_check, every=config.manifold_check_every, rows=config.manifold_check_rows)
+        self.embedding_store = EmbeddingStore(config.embedding_cache_dir) if config.embedding_cache_dir is not None else None
 
         if config.manifold == EUCLID:
             if config.optimizer == "adam":
@@ -103,6 +109,11 @@ class MyTrainer:
         if self.enable_log:
             wandb.log(stat)
 
+    def compression_stats(self):
+        # stats of the last vision forward of a compressed backbone (empty for other models)
+        backbone = getattr(self.accelerator.unwrap_model(self.model), 'model', None)
+        return getattr(backbone, 'compression_stats', {})
+
     def train(self):
         # loop over the dataset multiple times
         best_r_all = 0.0
@@ -137,6 +148,7 @@ class MyTrainer:
 
                     if (current_step + 1) % self.log_freq == 0:
                         self.log(stats)
+                        flush_validation()
                         print(stats)
                         print("Loss: {}".format(loss.item()))
                     if self.eval_freq != -1 and (current_step + 1) % self.eval_freq == 0:
@@ -169,6 +181,7 @@ class MyTrainer:
                         self.model.train()
 
                     
+        flush_validation(wait=True)
         print("Finished Training")
 
     def rerank(self, sims_matrix, vit_feats, text_ids, text_atts, num_images, num_texts, k=20):
@@ -214,13 +227,15 @@ class MyTrainer:
 
     def evaluate(self, mode='test'):
         from torch.utils.data import DataLoader
+        if self.config.fuse_lorentz:
+            fuse_lorentz(self.model)
         dataset = self.val_loader if mode == "val" else self.test_loader
         # texts = dataset.text
         # image = dataset.image
         # n_texts, n_images = len(texts), len(image)
 
         if not isinstance(dataset, DataLoader):
-            loader = self.accelerator.prepare(DataLoader(dataset, shuffle=False))
+            loader = self.accelerator.prepare(DataLoader(dataset, shuffle=False, **get_loader_kwargs(self.config)))
         else:
             loader = self.accelerator.prepare(dataset)
         text_ids = []
@@ -230,46 +245,81 @@ class MyTrainer:
         image_embeds = []
         max_len=35
         memory_used = 0
+        flops_used = 0
+        vision_time = 0
+
+        cached_text_embeds, cached_image_embeds = None, None
+        if self.embedding_store is not None:
+            fingerprint = model_fingerprint(self.model, self.model_ckt)
+            split = f'{self.config.dataset}/{mode}'
+            text_name = f'text_{self.config.max_txt_len}'
+            image_name = vision_cache_name(self.config)
+            cached_text_embeds, _ = self.embedding_store.load(fingerprint, split, text_name)
+            cached_image_embeds, image_meta = self.embedding_store.load(fingerprint, split, image_name)
+            if cached_image_embeds is not None:
+                memory_used = image_meta.get('eval memory', 0) * len(loader)
+                flops_used = image_meta.get('eval flops', 0) * len(loader)
+                vision_time = image_meta.get('eval latency', 0) * len(loader)
 
         with torch.no_grad():
-            for data in tqdm(loader):
-                text_feat, _ = self.model.get_text_features(
-                    input_ids=data["input_ids"], attention_mask=data["attention_mask"]
-                )
-                image_feat, vit_feat, eval_memory  = self.model.get_vision_features(
-                    pixel_values=data["pixel_values"], use_compressed_hidden_state=True
+            if cached_text_embeds is None or cached_image_embeds is None:
+                for data in tqdm(loader):
+                    if cached_text_embeds is None:
+                        text_feat, _ = self.model.get_text_features(
+                            input_ids=data["input_ids"], attention_mask=data["attention_mask"]
+                        )
+                        text_embeds.append(text_feat.cpu())
+                    if cached_image_embeds is None:
+                        start = time.perf_counter()
+                        image_feat, vit_feat, eval_memory  = self.model.get_vision_features(
+                            pixel_values=data["pixel_values"], use_compressed_hidden_state=True
+                        )
+                        image_embeds.append(image_feat.cpu())
+                        vision_time += time.perf_counter() - start
+                        memory_used += eval_memory
+                        flops_used += self.compression_stats().get('flops', 1.0)
+                    # cur_len = data['input_ids'].shape[-1]
+                    # input_ids = F.pad(data['input_ids'][0], (0, max_len - cur_len), "constant", 0)
+                    # attention_mask = F.pad(data['attention_mask'][0], (0, max_len - cur_len), "constant", 0) 
+                    # text_ids.append(input_ids.cpu())
+                    # text_atts.append(attention_mask.cpu())
+                    # vit_feats.append(vit_feat.cpu())
+
+
+        if cached_text_embeds is None:
+            text_embeds = torch.cat(text_embeds, dim=0)
+            if self.embedding_store is not None:
+                self.embedding_store.save(fingerprint, split, text_name, text_embeds)
+        else:
+            text_embeds = cached_text_embeds
+        if cached_image_embeds is None:
+            image_embeds = torch.cat(image_embeds, dim=0)
+            if self.embedding_store is not None:
+                self.embedding_store.save(
+                    fingerprint, split, image_name, image_embeds, meta={
+                        'eval memory': memory_used/len(loader),
+                        'eval flops': flops_used/len(loader),
+                        'eval latency': vision_time/len(loader),
+                    }
                 )
-                # cur_len = data['input_ids'].shape[-1]
-                # input_ids = F.pad(data['input_ids'][0], (0, max_len - cur_len), "constant", 0)
-                # attention_mask = F.pad(data['attention_mask'][0], (0, max_len - cur_len), "constant", 0) 
-                # text_ids.append(input_ids.cpu())
-                # text_atts.append(attention_mask.cpu())
-                # vit_feats.append(vit_feat.cpu())
-                image_embeds.append(image_feat.cpu())
-                text_embeds.append(text_feat.cpu())
-                memory_used += eval_memory
-
-
-        text_embeds = torch.cat(text_embeds, dim=0)
-        image_embeds = torch.cat(image_embeds, dim=0)
+        else:
+            image_embeds = cached_image_embeds
         # text_ids = torch.cat(text_ids, dim=0)
         # text_atts = torch.cat(text_atts, dim=0)
         # vit_feats = torch.cat(vit_feats, dim=0)
 
-        sims_matrix = []
         print(image_embeds.shape)
         print(text_embeds.shape)
-        for image_embed in image_embeds:
-            sim_q2t = image_embed @ text_embeds.T
-            sim_i2t, _ = sim_q2t.max(0)
-            sims_matrix.append(sim_i2t)
-        sims_matrix = torch.stack(sims_matrix, dim=0)
-        itc_metrics = report_metrics(
-            scores_t2i=sims_matrix.cpu().detach().T, 
-            scores_i2t=sims_matrix.cpu().detach(), 
+        # image embeds hold one embedding per query token, score is the best matching query
+        itc_metrics = tiled_report_metrics(
+            sim_func=lambda image_embed, text_embed: torch.einsum('iqd,td->iqt', image_embed, text_embed).max(1)[0],
+            image_embeds=image_embeds,
+            text_embeds=text_embeds,
             img2txt=self.img2txt, 
             txt2img=self.txt2img, 
-            mode=mode 
+            mode=mode,
+            tile_size=self.config.eval_tile_size,
+            device=self.accelerator.device,
             )
         print(itc_metrics)
 
@@ -287,6 +337,8 @@ class MyTrainer:
 
         itc_metrics["epoch"] = self.current_epoch
         itc_metrics["eval memory"] = memory_used/len(loader)
+        itc_metrics["eval flops"] = flops_used/len(loader)
+        itc_metrics["eval latency"] = vision_time/len(loader)
         # itm_metrics["epoch"] = self.current_epoch
         
         # return itc_metrics, itm_metrics
@@ -2,6 +2,7 @@ import wandb
 from accelerate import Accelerator
 from utils.data_utils import get_dataloader
 from hyptorch.geoopt.optim import RiemannianAdam, RiemannianSGD
+from hyptorch.geoopt import set_validation_policy, flush_validation
 from utils.retrivial_utils import report_metrics 
 from tqdm.auto import tqdm
 import torch
@@ -46,6 +47,7 @@ class MyTrainer:
         self.enable_log = self.config.enable_log
         self.current_epoch = 0
         self.model = self.accelerator.prepare(model)
+        set_validation_policy(config.manifold_check, every=config.manifold_check_every, rows=config.manifold_check_rows)
 
         self.optimizer = Adam8bit(
             self.model.parameters(),
@@ -113,6 +115,7 @@ class MyTrainer:
 
                     if (current_step + 1) % self.log_freq == 0:
                         self.log(stats)
+                        flush_validation()
                         print(stats)
                         print("Loss: {}".format(loss.item()))
                     if self.eval_freq != -1 and (current_step + 1) % self.eval_freq == 0:
@@ -133,6 +136,7 @@ class MyTrainer:
                         self.model.train()
 
                     
+        flush_validation(wait=True)
         print("Finished Training")
 
     def rerank(self, sims_matrix, vit_feats, text_feats, num_images, num_texts, k=20):
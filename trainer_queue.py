@@ -1,8 +1,11 @@
 import wandb
 from accelerate import Accelerator
-from utils.data_utils import get_dataloader
+from utils.data_utils import get_dataloader, get_loader_kwargs
 from hyptorch.geoopt.optim import RiemannianAdam, RiemannianSGD
-from utils.retrivial_utils import report_metrics 
+from hyptorch.geoopt import set_validation_policy, flush_validation
+from hyptorch.lorentz.layers import fuse_lorentz
+from utils.retrivial_utils import tiled_report_metrics 
+from utils.cache_utils import EmbeddingStore, model_fingerprint, vision_cache_name
 from tqdm.auto import tqdm
 import torch
 from config import CLIP_BASE_PATCH_16, CLIP_BASE_PATCH_32, CLIP_LARGE_PATCH_14, BLIP_BASE_FLICKR, BLIP_BASE_COCO, LAVIS_BLIP_BASE_FLICKR, LAVIS_BLIP_BASE_COCO
@@ -49,6 +52,8 @@ class MyTrainer:
         self.enable_log = self.config.enable_log
         self.current_epoch = 0
         self.model = self.accelerator.prepare(model)
+        set_validation_policy(config.manifold_check, every=config.manifold_check_every, rows=config.manifold_check_rows)
+        self.embedding_store = EmbeddingStore(config.embedding_cache_dir) if config.embedding_cache_dir is not None else None
 
         self.optimizer = torch.optim.Adam(
             self.model.parameters(),
@@ -80,6 +85,11 @@ class MyTrainer:
         if self.enable_log:
             wandb.log(stat)
 
+    def compression_stats(self):
+        # stats of the last vision forward of a compressed backbone (empty for other models)
+        backbone = getattr(self.accelerator.unwrap_model(self.model), 'model', None)
+        return getattr(backbone, 'compression_stats', {})
+
     def train(self):
         # loop over the dataset multiple times
         best_r_all = 0.0
@@ -119,6 +129,7 @@ class MyTrainer:
 
                     if (current_step + 1) % self.log_freq == 0:
                         self.log(stats)
+                        flush_validation()
                         print(stats)
                         print("Loss: {}".format(loss.item()))
                     if self.eval_freq != -1 and (current_step + 1) % self.eval_freq == 0:
@@ -140,6 +151,7 @@ class MyTrainer:
                         self.model.train()
 
                     
+        flush_validation(wait=True)
         print("Finished Training")
 
     def rerank(self, sims_matrix, vit_feats, text_feats, num_images, num_texts, k=20):
@@ -187,52 +199,89 @@ class MyTrainer:
         from torch.utils.data import DataLoader
         print("Evaluating current epoch", self.current_epoch)
         
-        self.model.eval()
+        if self.config.fuse_lorentz:
+            fuse_lorentz(self.model)
+        else:
+            self.model.eval()
 
         dataset = self.val_loader if mode == "val" else self.test_loader
         if not isinstance(dataset, DataLoader):
-            loader = self.accelerator.prepare(DataLoader(dataset, shuffle=False))
+            loader = self.accelerator.prepare(DataLoader(dataset, shuffle=False, **get_loader_kwargs(self.config)))
         else:
             loader = self.accelerator.prepare(dataset)
 
         all_text_embeds = []
         all_vision_embeds = []
         memory_used = 0
+        flops_used = 0
+        vision_time = 0
         step = 0
 
+        cached_text_embeds, cached_vision_embeds = None, None
+        if self.embedding_store is not None:
+            fingerprint = model_fingerprint(self.model, self.model_ckt)
+            split = f'{self.config.dataset}/{mode}'
+            text_name = f'text_{self.config.max_txt_len}'
+            vision_name = vision_cache_name(self.config)
+            cached_text_embeds, _ = self.embedding_store.load(fingerprint, split, text_name)
+            cached_vision_embeds, vision_meta = self.embedding_store.load(fingerprint, split, vision_name)
+            if cached_vision_embeds is not None:
+                memory_used = vision_meta.get('eval memory', 0) * len(loader)
+                flops_used = vision_meta.get('eval flops', 0) * len(loader)
+                vision_time = vision_meta.get('eval latency', 0) * len(loader)
+
         with torch.no_grad():
-            for data in tqdm(loader):
-                if isinstance(dataset, DataLoader): 
-                    text_embeds, _ = self.model.get_text_features(
-                        input_ids=data["input_ids"], attention_mask=data["attention_mask"]
-                    )
-                    vision_embeds, _, eval_memory = self.model.get_vision_features(
-                        pixel_values=data["pixel_values"], use_compressed_hidden_state=True
-                    )
-                else:
-                    text_embeds, _ = self.model.get_text_features(
-                        input_ids=data["input_ids"][0], attention_mask=data["attention_mask"][0]
-                    )
-                    vision_embeds, _, eval_memory = self.model.get_vision_features(
-                        pixel_values=data["pixel_values"][0], use_compressed_hidden_state=True
-                    )
-                all_text_embeds.append(text_embeds.cpu())
-                all_vision_embeds.append(vision_embeds.cpu())
-                memory_used += eval_memory
+            if cached_text_embeds is None or cached_vision_embeds is None:
+                for data in tqdm(loader):
+                    if not isinstance(dataset, DataLoader): 
+                        data = {key: value[0] for key, value in data.items() if key in ('input_ids', 'attention_mask', 'pixel_values')}
+                    if cached_text_embeds is None:
+                        text_embeds, _ = self.model.get_text_features(
+                            input_ids=data["input_ids"], attention_mask=data["attention_mask"]
+                        )
+                        all_text_embeds.append(text_embeds.cpu())
+                    if cached_vision_embeds is None:
+                        start = time.perf_counter()
+                        vision_embeds, _, eval_memory = self.model.get_vision_features(
+                            pixel_values=data["pixel_values"], use_compressed_hidden_state=True
+                        )
+                        all_vision_embeds.append(vision_embeds.cpu())
+                        vision_time += time.perf_counter() - start
+                        memory_used += eval_memory
+                        flops_used += self.compression_stats().get('flops', 1.0)
            
+            if cached_text_embeds is None:
+                all_text_embeds = torch.concat(all_text_embeds, 0)
+                if self.embedding_store is not None:
+                    self.embedding_store.save(fingerprint, split, text_name, all_text_embeds)
+            else:
+                all_text_embeds = cached_text_embeds
+            if cached_vision_embeds is None:
+                all_vision_embeds = torch.concat(all_vision_embeds, 0)
+                if self.embedding_store is not None:
+                    self.embedding_store.save(
+                        fingerprint, split, vision_name, all_vision_embeds, meta={
+                            'eval memory': memory_used/len(loader),
+                            'eval flops': flops_used/len(loader),
+                            'eval latency': vision_time/len(loader),
+                        }
+                    )
+            else:
+                all_vision_embeds = cached_vision_embeds
 
-            all_text_embeds = torch.concat(all_text_embeds, 0)
-            all_vision_embeds = torch.concat(all_vision_embeds, 0)
-
-            sims_t2i = self.model.dist_func(all_text_embeds, all_vision_embeds)
-            metrics = report_metrics(
-                scores_t2i=sims_t2i.cpu().detach(), 
-                scores_i2t=sims_t2i.T.cpu().detach(), 
+            metrics = tiled_report_metrics(
+                sim_func=self.model.dist_func,
+                image_embeds=all_vision_embeds,
+                text_embeds=all_text_embeds,
                 img2txt=self.img2txt, 
                 txt2img=self.txt2img, 
-                mode=f'{mode}'
+                mode=f'{mode}',
+                tile_size=self.config.eval_tile_size,
+                device=self.accelerator.device,
             )
             metrics["eval memory"] = memory_used/len(loader)
+            metrics["eval flops"] = flops_used/len(loader)
+            metrics["eval latency"] = vision_time/len(loader)
             self.accelerator.free_memory()
 
   
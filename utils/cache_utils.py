@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+from itertools import chain
+
+import numpy as np
+import torch
+
+
+def model_fingerprint(model:torch.nn.Module, model_ckt:str):
+    """
+    Short hash identifying a model state: the checkpoint name plus the name
+    and value of every trainable parameter (frozen weights are fixed by the
+    checkpoint, so they do not need to be hashed).
+    """
+    digest = hashlib.sha1(str(model_ckt).encode())
+    for name, param in model.named_parameters():
+        if param.requires_grad:
+            digest.update(name.encode())
+            digest.update(param.detach().float().cpu().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def vision_cache_name(config):
+    """
+    `image_{compress_method}` plus a hash of the other settings that change the
+    compressed vision embeddings and their flops / latency stats.
+    """
+    settings = [config.r, config.compress_schedule, config.flops_budget, config.prop_attn]
+    return f'image_{config.compress_method}_{hashlib.sha1(str(settings).encode()).hexdigest()[:8]}'
+
+
+def save_npy(path:str, array:np.ndarray):
+    # write through a memory map into a temporary file, then rename, so readers never see partial files
+    tmp_path = f'{path}.tmp'
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=array.dtype, shape=array.shape)
+    out[...] = array
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+
+def load_npy(path:str):
+    # copy-on-write memory map: lazily paged in, writable for torch without touching the file
+    return np.load(path, mmap_mode='c')
+
+
+class EmbeddingStore:
+    """
+    On-disk store of evaluation embeddings, laid out as
+    `{root}/{fingerprint}/{split}/{name}.npy` with a `{name}.json` sidecar for
+    extra statistics. The trainers use `{dataset}/{mode}` as split, text
+    embeddings are stored under `text_{max_txt_len}`, vision embeddings under
+    `vision_cache_name`, so runs that only change the vision compression
+    reuse the text side.
+    """
+
+    def __init__(self, root:str):
+        self.root = root
+
+    def _path(self, fingerprint, split, name, ext='npy'):
+        return os.path.join(self.root, fingerprint, split, f'{name}.{ext}')
+
+    def contains(self, fingerprint, split, name):
+        return os.path.exists(self._path(fingerprint, split, name))
+
+    def load(self, fingerprint, split, name):
+        """Returns `(embeddings, meta)` or `(None, None)` on a cache miss."""
+        if not self.contains(fingerprint, split, name):
+            return None, None
+        embeds = torch.from_numpy(load_npy(self._path(fingerprint, split, name)))
+        meta = {}
+        if os.path.exists(self._path(fingerprint, split, name, ext='json')):
+            with open(self._path(fingerprint, split, name, ext='json')) as f:
+                meta = json.load(f)
+        return embeds, meta
+
+    def save(self, fingerprint, split, name, embeds:torch.Tensor, meta:dict=None):
+        os.makedirs(os.path.dirname(self._path(fingerprint, split, name)), exist_ok=True)
+        embeds = embeds.detach().cpu()
+        if embeds.dtype == torch.bfloat16:
+            embeds = embeds.float()
+        save_npy(self._path(fingerprint, split, name), embeds.numpy())
+        if meta is not None:
+            with open(self._path(fingerprint, split, name, ext='json'), 'w') as f:
+                json.dump(meta, f)
+
+
+def tokenizer_name(tokenizer):
+    # HF processors wrap the tokenizer, LAVIS models expose a plain HF tokenizer
+    tokenizer = getattr(tokenizer, 'tokenizer', tokenizer)
+    return getattr(tokenizer, 'name_or_path', type(tokenizer).__name__)
+
+
+class TokenizedCaptions:
+    """
+    Captions tokenized once and stored as a flat int32 memmap of token ids plus
+    int64 offsets (caption i is `input_ids[offsets[i]:offsets[i + 1]]`).
+    Batches are padded on the fly, so collate functions skip the tokenizer.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+        self.input_ids = load_npy(os.path.join(path, 'input_ids.npy'))
+        self.offsets = load_npy(os.path.join(path, 'offsets.npy'))
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.pad_token_id = self.meta['pad_token_id']
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @staticmethod
+    def cache_key(captions, tokenizer, max_length, txt_processor=None):
+        digest = hashlib.sha1(f'{tokenizer_name(tokenizer)}|{max_length}'.encode())
+        if txt_processor is not None:
+            digest.update(f'{type(txt_processor).__name__}{sorted(vars(txt_processor).items())}'.encode())
+        for caption in captions:
+            digest.update(caption.encode())
+            digest.update(b'\0')
+        return f'{tokenizer_name(tokenizer).replace("/", "_")}_{max_length}_{digest.hexdigest()[:16]}'
+
+    @classmethod
+    def build(cls, path, captions, tokenizer, max_length, txt_processor=None, batch_size=8192):
+        tokenizer = getattr(tokenizer, 'tokenizer', tokenizer)
+        if txt_processor is not None:
+            captions = [txt_processor(caption) for caption in captions]
+        ids = []
+        for start in range(0, len(captions), batch_size):
+            ids.extend(tokenizer(captions[start:start + batch_size], max_length=max_length, truncation=True)['input_ids'])
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum([len(caption_ids) for caption_ids in ids], out=offsets[1:])
+
+        os.makedirs(path, exist_ok=True)
+        save_npy(os.path.join(path, 'input_ids.npy'), np.fromiter(chain.from_iterable(ids), dtype=np.int32, count=offsets[-1]))
+        save_npy(os.path.join(path, 'offsets.npy'), offsets)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'tokenizer': tokenizer_name(tokenizer), 'max_length': max_length, 'pad_token_id': tokenizer.pad_token_id}, f)
+        return cls(path)
+
+    @classmethod
+    def load_or_build(cls, root, captions, tokenizer, max_length, txt_processor=None):
+        path = os.path.join(root, cls.cache_key(captions, tokenizer, max_length, txt_processor))
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            return cls(path)
+        return cls.build(path, captions, tokenizer, max_length, txt_processor=txt_processor)
+
+    def pad(self, indices):
+        """Right-padded `input_ids`/`attention_mask` for the given caption indices, padded to the longest one."""
+        indices = np.asarray(indices)
+        starts, ends = self.offsets[indices], self.offsets[indices + 1]
+        lengths = torch.from_numpy(ends - starts)
+        input_ids = torch.full((len(indices), int(lengths.max())), self.pad_token_id, dtype=torch.long)
+        for row, (start, end) in enumerate(zip(starts, ends)):
+            input_ids[row, :end - start] = torch.from_numpy(self.input_ids[start:end])
+        attention_mask = (torch.arange(input_ids.shape[1]) < lengths.unsqueeze(1)).long()
+        return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+
+FEATURE_DTYPES = {'fp32': np.float32, 'fp16': np.float16, 'int8': np.int8}
+
+
+class FeatureCacheWriter:
+    """
+    Fills a `FeatureCache` batch by batch. Arrays are allocated on the first
+    write from the shapes it sees, `meta.json` is written by `close`, so a
+    cache that was interrupted is never picked up by `FeatureCache.load`.
+    """
+
+    def __init__(self, path:str, num_keys:int, dtype:str='fp16'):
+        assert dtype in FEATURE_DTYPES, f'dtype must be one of {list(FEATURE_DTYPES)}'
+        self.path = path
+        self.num_keys = num_keys
+        self.dtype = dtype
+        self.arrays = {}
+        self.filled = np.zeros(num_keys, dtype=bool)
+        os.makedirs(path, exist_ok=True)
+
+    def _array(self, name, shape, dtype):
+        if name not in self.arrays:
+            self.arrays[name] = np.lib.format.open_memmap(
+                os.path.join(self.path, f'{name}.npy'), mode='w+', dtype=dtype, shape=(self.num_keys, *shape)
+            )
+        return self.arrays[name]
+
+    def write(self, keys, **fields):
+        keys = np.asarray(torch.as_tensor(keys).cpu())
+        for name, value in fields.items():
+            value = value.detach().float().cpu()
+            if self.dtype == 'int8':
+                # symmetric per-vector quantization, the scale is kept next to the codes
+                scale = value.abs().amax(dim=-1, keepdim=True).clamp_min(1e-8) / 127
+                self._array(f'{name}_scale', scale.shape[1:], np.float16)[keys] = scale.numpy()
+                value = (value / scale).round().clamp_(-127, 127)
+            self._array(name, value.shape[1:], FEATURE_DTYPES[self.dtype])[keys] = value.numpy()
+        self.filled[keys] = True
+
+    def missing(self, keys):
+        """Mask of the keys that were not written yet."""
+        return torch.from_numpy(~self.filled[np.asarray(torch.as_tensor(keys).cpu())])
+
+    def close(self):
+        for array in self.arrays.values():
+            array.flush()
+        fields = sorted(name for name in self.arrays if not name.endswith('_scale'))
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({'num_keys': self.num_keys, 'dtype': self.dtype, 'fields': fields, 'filled': int(self.filled.sum())}, f)
+        return FeatureCache(self.path)
+
+
+class FeatureCache:
+    """
+    Outputs of a frozen model memory-mapped per key (an image id or a caption
+    index), one `(num_keys, ...)` array per output field, stored as fp32,
+    fp16 or int8 with per-vector scales. Laid out as
+    `{root}/{model_id}/{split}/{modality}/` by `FeatureCache.location`.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.arrays = {name: load_npy(os.path.join(path, f'{name}.npy')) for name in self.meta['fields']}
+        self.scales = {
+            name: load_npy(os.path.join(path, f'{name}_scale.npy')) for name in self.meta['fields']
+        } if self.meta['dtype'] == 'int8' else {}
+
+    @staticmethod
+    def location(root, model_id, split, modality):
+        return os.path.join(root, str(model_id).replace('/', '_'), split, modality)
+
+    @classmethod
+    def load(cls, path):
+        """The cache at `path`, None if it was not (completely) built."""
+        return cls(path) if os.path.exists(os.path.join(path, 'meta.json')) else None
+
+    def __len__(self):
+        return self.meta['num_keys']
+
+    def read(self, keys, device=None):
+        """Float32 tensors of every field for `keys`, on `device`."""
+        keys = np.asarray(torch.as_tensor(keys).cpu())
+        fields = {}
+        for name, array in self.arrays.items():
+            value = torch.from_numpy(np.ascontiguousarray(array[keys])).to(device, non_blocking=True).float()
+            if name in self.scales:
+                value = value * torch.from_numpy(np.ascontiguousarray(self.scales[name][keys])).to(device).float()
+            fields[name] = value
+        return fields
@@ -1,5 +1,4 @@
 import torch
-import pandas as pd
 from torch.utils.data import Dataset, DataLoader, Sampler
 from tqdm.auto import tqdm
 import numpy as np
@@ -8,6 +7,7 @@ from datasets import dataset_dict
 from datasets import load_dataset
 from lavis.datasets.builders import load_dataset as lavis_dataset
 from itertools import chain
+from utils.cache_utils import TokenizedCaptions
 
 
 def parse_int(sample):
@@ -15,7 +15,7 @@ def parse_int(sample):
     return sample
 
 class EvalDataset(Dataset):
-    def __init__(self, dataset, vis_processor, tokenizer, txt_processor=None, use_tokenizer=False):  
+    def __init__(self, dataset, vis_processor, tokenizer, txt_processor=None, use_tokenizer=False, max_txt_len=35):  
         self.dataset = dataset
         self.txt_processor = txt_processor
         self.vis_processor = vis_processor 
@@ -25,6 +25,7 @@ class EvalDataset(Dataset):
         self.text = dataset.text
         self.image = dataset.image
         self.use_tokenizer = use_tokenizer
+        self.max_txt_len = max_txt_len
 
     def __len__(self):
         return len(self.dataset) 
@@ -42,10 +43,10 @@ class EvalDataset(Dataset):
 
         if self.use_tokenizer:
             if isinstance(self.tokenizer, CLIPProcessor) or isinstance(self.tokenizer, BlipProcessor):
-                text_inputs = self.tokenizer(text=captions, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+                text_inputs = self.tokenizer(text=captions, max_length=self.max_txt_len, truncation=True, padding=True ,return_tensors='pt') 
                 output['pixel_values'] = self.vis_processor(images=data['image'], return_tensors='pt')['pixel_values']
             else:
-                text_inputs = self.tokenizer(captions, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+                text_inputs = self.tokenizer(captions, max_length=self.max_txt_len, truncation=True, padding=True ,return_tensors='pt') 
                 output['pixel_values'] = self.vis_processor(data['image']).unsqueeze_(0)
             output['input_ids'] = text_inputs['input_ids']
             output['attention_mask'] = text_inputs['attention_mask']
@@ -53,14 +54,31 @@ class EvalDataset(Dataset):
             output['text_input'] = captions
             output['image'] = data['image']
         output['image_id'] = data['index']
+        output['caption_index'] = cap_indexes
         return output
 
+
+class IndexedDataset(Dataset):
+    """Adds the sample index to every sample, so collators can look up per-sample caches."""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        sample = self.dataset[index]
+        sample['index'] = index
+        return sample
+
 class FuseEvalDataset(Dataset):
-    def __init__(self, dataset, vis_processors, tokenizers, txt_processors=None):  
+    def __init__(self, dataset, vis_processors, tokenizers, txt_processors=None, max_txt_len=35):  
         self.dataset = dataset
         self.txt_processors = txt_processors
         self.vis_processors = vis_processors
         self.tokenizers = tokenizers 
+        self.max_txt_len = max_txt_len
         self.img2txt = dataset.img2txt
         self.txt2img = dataset.txt2img
         self.text = dataset.text
@@ -82,10 +100,10 @@ class FuseEvalDataset(Dataset):
                     captions.append(self.text[j])
 
             if isinstance(self.tokenizers[i], CLIPProcessor) or isinstance(self.tokenizers[i], BlipProcessor):
-                text_inputs = self.tokenizers[i](text=captions, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+                text_inputs = self.tokenizers[i](text=captions, max_length=self.max_txt_len, truncation=True, padding=True ,return_tensors='pt') 
                 output[f'pixel_values_{i}'] = self.vis_processors[i](images=data['image'], return_tensors='pt')['pixel_values']
             else:
-                text_inputs = self.tokenizers[i](captions, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+                text_inputs = self.tokenizers[i](captions, max_length=self.max_txt_len, truncation=True, padding=True ,return_tensors='pt') 
                 output[f'pixel_values_{i}'] = self.vis_processors[i](data['image']).unsqueeze_(0)
             output[f'input_ids_{i}'] = text_inputs['input_ids']
             output[f'attention_mask_{i}'] = text_inputs['attention_mask']
@@ -93,173 +111,288 @@ class FuseEvalDataset(Dataset):
         return output
 
 
-class UniqueClassSampler(Sampler):
-    def __init__(self, data_source, batch_size):
-        self.data_source = data_source
+class UniqueClassBatchSampler(Sampler):
+    """
+    Batch sampler whose batches never contain two samples of the same class
+    (e.g. two captions of one image), every sample is used at most once per
+    epoch.
+
+    Each epoch the samples of every class are shuffled and the k-th sample of
+    each class goes to round k, so a round holds every class at most once.
+    Rounds are shuffled and cut into batches, the batch that straddles two
+    rounds is filled with samples whose class is not in it yet. Everything is
+    array based, so an epoch costs a few sorts over N labels.
+
+    With `drop_last=True` a straddling batch that the next round cannot fill
+    (its remaining samples all collide with it, which happens in the last,
+    small rounds) is dropped, as is the incomplete batch at the end of the
+    epoch: a few dozen of ~100k COCO captions per epoch. With
+    `drop_last=False` they are yielded as short batches instead, so every
+    sample is used exactly once.
+
+    With `num_replicas > 1` every rank gets a disjoint, equally long slice of
+    the batches (same `seed` and epoch on every rank). When the loader is
+    sharded by accelerate keep the defaults and let accelerate split batches.
+    """
+
+    def __init__(self, labels, batch_size, drop_last=True, seed=0, num_replicas=1, rank=0):
+        self.labels = np.unique(np.asarray(labels), return_inverse=True)[1]
         self.batch_size = batch_size
-        self.classes= {}
-        self.remain_sample = 0
-
-        progress = tqdm(range(len(data_source.dataset['img_id'])))
-
-        for index, img_id in enumerate(data_source.dataset['img_id']):
-            self.classes[img_id] = [data_source.cap_per_img * index + i for i in range(data_source.cap_per_img)]
-            self.remain_sample += 5
-            progress.update(1)
+        self.drop_last = drop_last
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+        self._cache = None
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _rounds(self, rng):
+        n = len(self.labels)
+        perm = rng.permutation(n)
+        labels = self.labels[perm]
+        # group by class (stable, so the order inside a class is the random permutation)
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        counts = np.diff(np.r_[starts, n])
+        rounds = np.arange(n) - np.repeat(starts, counts)
+        # random order inside each round
+        order = order[np.lexsort((rng.random(n), rounds))]
+        rounds = np.sort(rounds)
+        bounds = np.r_[0, np.flatnonzero(np.diff(rounds)) + 1, n]
+        return [perm[order[bounds[i]:bounds[i + 1]]] for i in range(len(bounds) - 1)]
+
+    def _batches(self):
+        if self._cache is not None and self._cache[0] == self.epoch:
+            return self._cache[1]
+        rng = np.random.default_rng(self.seed + self.epoch)
+        batches = []
+        pending = np.empty(0, dtype=np.int64)
+        for indices in self._rounds(rng):
+            if len(pending) > 0:
+                free = np.flatnonzero(~np.isin(self.labels[indices], self.labels[pending]))
+                take = free[:self.batch_size - len(pending)]
+                pending = np.r_[pending, indices[take]]
+                indices = np.delete(indices, take)
+                if len(pending) < self.batch_size:
+                    # the rest of this round collides with the pending batch
+                    if not self.drop_last:
+                        batches.append(pending)
+                    pending = np.empty(0, dtype=np.int64)
+                else:
+                    batches.append(pending)
+                    pending = np.empty(0, dtype=np.int64)
+            n_full = len(indices) // self.batch_size
+            batches.extend(np.split(indices[:n_full * self.batch_size], n_full) if n_full > 0 else [])
+            pending = indices[n_full * self.batch_size:]
+        if len(pending) > 0 and not self.drop_last:
+            batches.append(pending)
+
+        if self.num_replicas > 1:
+            n_batches = len(batches) - len(batches) % self.num_replicas
+            batches = batches[self.rank:n_batches:self.num_replicas]
+        self._cache = (self.epoch, batches)
+        return batches
 
     def __len__(self):
-        return len(self.data_source)
+        return len(self._batches())
 
     def __iter__(self):
-        while self.remain_sample >= self.batch_size:
-            if len(self.classes.keys()) >= self.batch_size:
-              batch_classes = np.random.choice(list(self.classes.keys()), self.batch_size, replace=False)
-            else:
-              batch_classes = list(self.classes.keys())
-            for img_id in batch_classes:
-                indices = self.classes[img_id] 
-                selected_index = np.random.choice(indices)
-                yield selected_index
-                self.classes[img_id] = np.setdiff1d(self.classes[img_id], selected_index)
-                self.remain_sample -=1
-                if len(self.classes[img_id]) == 0:
-                    self.classes.pop(img_id)
+        for batch in self._batches():
+            yield batch.tolist()
+        self.epoch += 1
+
+
+def process_images(images, vis_processor):
+    """Stacks the pixel values of a list of images into one (B, C, H, W) tensor."""
+    if isinstance(vis_processor, (CLIPProcessor, BlipProcessor)):
+        # HF processors take the whole list in one call
+        return vis_processor(images=images, return_tensors='pt')['pixel_values']
+    # LAVIS transforms work per image, write each result straight into a preallocated buffer
+    first = vis_processor(images[0])
+    pixel_values = torch.empty((len(images), *first.shape), dtype=first.dtype)
+    pixel_values[0] = first
+    for i in range(1, len(images)):
+        pixel_values[i] = vis_processor(images[i])
+    return pixel_values
+
+
+def tokenize_texts(texts, tokenizer, txt_processor=None, max_length=35):
+    if txt_processor is not None:
+        texts = [txt_processor(text) for text in texts]
+    if isinstance(tokenizer, (CLIPProcessor, BlipProcessor)):
+        return tokenizer(text=texts, max_length=max_length, truncation=True, padding=True ,return_tensors='pt') 
+    return tokenizer(texts, max_length=max_length, truncation=True, padding=True ,return_tensors='pt') 
 
 
 def collate_func(batch, processor):
-    # print(batch)
-    df = pd.DataFrame(batch)
     data = processor(
-        text=list(df['caption']), 
+        text=[sample['caption'] for sample in batch], 
         padding=True, 
         return_tensors='pt',
         truncation=True
     )
-    data['pixel_values'] = torch.from_numpy(np.concatenate(list(df['pixel_values']), 0))
-    data['img_id'] = torch.tensor(list(df['img_id'])) 
+    data['pixel_values'] = torch.from_numpy(np.concatenate([sample['pixel_values'] for sample in batch], 0))
+    data['img_id'] = torch.tensor([sample['img_id'] for sample in batch]) 
     return data
 
-def get_fused_dataloader(dataset,  vis_processors, tokenizers, txt_processors=None, mode='train', batch_size=1):
-    def coco_collate_func(batch):
-        df = pd.DataFrame(batch)
-        images = list(df['image']) 
-        texts = list(df['text_input'])
+class FusedCocoCollator:
+    """Collates raw COCO/Flickr samples for every (vis_processor, tokenizer) pair of a fused model."""
+
+    def __init__(self, vis_processors, tokenizers, txt_processors=None, max_txt_len=35):
+        self.vis_processors = vis_processors
+        self.tokenizers = tokenizers
+        self.txt_processors = txt_processors
+        self.max_txt_len = max_txt_len
+
+    def __call__(self, batch):
+        images = [sample['image'] for sample in batch]
+        texts = [sample['text_input'] for sample in batch]
         data = {}
-        for i, vis_processor in enumerate(vis_processors):
-            text_inputs = []
-            if isinstance(vis_processor, (BlipProcessor, CLIPProcessor)): 
-                pixel_values = vis_processor(images=images, return_tensors='pt')['pixel_values']
-            else:
-                pixel_values = []
-                for image in list(images):
-                    pixel_values.append(vis_processor(image).unsqueeze_(0))
-                pixel_values = torch.cat(pixel_values, dim=0)
-            for text in texts: 
-                if txt_processors[i] is not None:
-                    text_inputs.append(txt_processors[i](text))
-                else:
-                    text_inputs.append(text)
-            if isinstance(tokenizers[i], (BlipProcessor, CLIPProcessor)):
-                text_inputs = tokenizers[i](text=text_inputs, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
-            else:
-                text_inputs = tokenizers[i](text_inputs, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
-            # data[f'pixel_values_{i}'] = torch.cat(pixel_values, dim=0) 
-            data[f'pixel_values_{i}'] = pixel_values 
+        for i, vis_processor in enumerate(self.vis_processors):
+            text_inputs = tokenize_texts(texts, self.tokenizers[i], txt_processor=self.txt_processors[i], max_length=self.max_txt_len)
+            data[f'pixel_values_{i}'] = process_images(images, vis_processor)
             data[f'attention_mask_{i}'] = text_inputs['attention_mask'] 
             data[f'input_ids_{i}'] = text_inputs['input_ids'] 
 
-        data['img_id'] = torch.tensor(list(df['image_id']))
+        data['img_id'] = torch.tensor([sample['image_id'] for sample in batch])
+        if 'index' in batch[0]:
+            data['caption_index'] = torch.tensor([sample['index'] for sample in batch])
         return data
 
+
+def get_fused_dataloader(dataset,  vis_processors, tokenizers, txt_processors=None, mode='train', batch_size=1, max_txt_len=35, **loader_kwargs):
     if mode == 'train':
         return DataLoader(
-            dataset[mode], 
+            IndexedDataset(dataset[mode]), 
             batch_size=batch_size, 
-            collate_fn=coco_collate_func,
-            shuffle=True
+            collate_fn=FusedCocoCollator(vis_processors, tokenizers, txt_processors, max_txt_len=max_txt_len),
+            shuffle=True,
+            **loader_kwargs
         ) 
     else:
         cur_dataset = FuseEvalDataset(
             dataset[mode], 
             vis_processors=vis_processors,
             txt_processors=txt_processors,
-            tokenizers=tokenizers
+            tokenizers=tokenizers,
+            max_txt_len=max_txt_len
         )
         return cur_dataset
 
-def coco_eval_collate_func(batch, vis_processor, tokenizer):
-    df = pd.DataFrame(batch)
+def coco_eval_collate_func(batch, vis_processor, tokenizer, captions=None, max_txt_len=35):
     data = {}
-    pixel_values = []
-
-    for i, image in enumerate(list(df['image'])):
-        if isinstance(vis_processor, CLIPProcessor) or isinstance(vis_processor, BlipProcessor):
-            pixel_values.append(vis_processor(images=image, return_tensors='pt')['pixel_values'])
-        else:
-            pixel_values.append(vis_processor(image).unsqueeze_(0))
-
-    if isinstance(tokenizer, CLIPProcessor) or isinstance(tokenizer, BlipProcessor):
-        text_inputs = tokenizer(text=list(chain(*df['text_input'])), max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+    if captions is not None:
+        text_inputs = captions.pad(list(chain(*[sample['caption_index'] for sample in batch])))
     else:
-        text_inputs = tokenizer(list(chain(*df['text_input'])), max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+        text_inputs = tokenize_texts(list(chain(*[sample['text_input'] for sample in batch])), tokenizer, max_length=max_txt_len)
 
-    data['pixel_values'] = torch.cat(pixel_values, dim=0)
-    data['img_id'] = torch.tensor(list(df['image_id']))
+    data['pixel_values'] = process_images([sample['image'] for sample in batch], vis_processor)
+    data['img_id'] = torch.tensor([sample['image_id'] for sample in batch])
     data['input_ids'] = text_inputs['input_ids']
     data['attention_mask'] = text_inputs['attention_mask']
 
     return data
 
-def get_dataloader(dataset,  vis_processor, tokenizer, txt_processor=None, mode='train', batch_size=1):
-    def coco_collate_func(batch):
-        df = pd.DataFrame(batch)
-        data = {}
-        pixel_values = []
-        texts = []
+class CocoEvalCollator:
+    def __init__(self, vis_processor, tokenizer, captions=None, max_txt_len=35):
+        self.vis_processor = vis_processor
+        self.tokenizer = tokenizer
+        self.captions = captions
+        self.max_txt_len = max_txt_len
 
-        for i, image in enumerate(list(df['image'])):
-            if isinstance(vis_processor, CLIPProcessor) or isinstance(vis_processor, BlipProcessor):
-                pixel_values.append(vis_processor(images=image, return_tensors='pt')['pixel_values'])
-            else:
-                pixel_values.append(vis_processor(image).unsqueeze_(0))
-            if txt_processor is not None:
-                texts.append(txt_processor(list(df['text_input'])[i]))
-            else:
-                texts.append(list(df['text_input'])[i])
-        if isinstance(tokenizer, CLIPProcessor) or isinstance(tokenizer, BlipProcessor):
-            text_inputs = tokenizer(text=texts, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+    def __call__(self, batch):
+        return coco_eval_collate_func(
+            batch, vis_processor=self.vis_processor, tokenizer=self.tokenizer, captions=self.captions, max_txt_len=self.max_txt_len
+        )
+
+
+class CocoCollator:
+    """
+    Collates raw COCO/Flickr training samples (one caption per image) into model inputs.
+    With `captions` (a `TokenizedCaptions` over the annotations) the tokenizer is skipped
+    and samples must carry their `index` (see `IndexedDataset`).
+    """
+
+    def __init__(self, vis_processor, tokenizer, txt_processor=None, captions=None, max_txt_len=35):
+        self.vis_processor = vis_processor
+        self.tokenizer = tokenizer
+        self.txt_processor = txt_processor
+        self.captions = captions
+        self.max_txt_len = max_txt_len
+
+    def __call__(self, batch):
+        data = {}
+        if self.captions is not None:
+            text_inputs = self.captions.pad([sample['index'] for sample in batch])
         else:
-            text_inputs = tokenizer(texts, max_length=35, truncation=True, padding=True ,return_tensors='pt') 
+            text_inputs = tokenize_texts(
+                [sample['text_input'] for sample in batch], self.tokenizer, txt_processor=self.txt_processor, max_length=self.max_txt_len
+            )
 
-        data['pixel_values'] = torch.cat(pixel_values, dim=0)
-        data['img_id'] = torch.tensor(list(df['image_id']))
+        data['pixel_values'] = process_images([sample['image'] for sample in batch], self.vis_processor)
+        data['img_id'] = torch.tensor([sample['image_id'] for sample in batch])
         data['input_ids'] = text_inputs['input_ids']
         data['attention_mask'] = text_inputs['attention_mask']
 
         return data
 
+
+def get_loader_kwargs(config):
+    """DataLoader worker options from the data config, dropping the ones that are invalid without workers."""
+    kwargs = {'num_workers': config.num_workers, 'pin_memory': config.pin_memory}
+    if config.num_workers > 0:
+        kwargs['persistent_workers'] = config.persistent_workers
+        kwargs['prefetch_factor'] = config.prefetch_factor
+    return kwargs
+
+
+def get_tokenized_captions(dataset, mode, tokenizer, txt_processor=None, caption_cache_dir=None, max_txt_len=35):
+    """Loads (or builds once) the pre-tokenized captions of a LAVIS retrieval split, None when caching is off."""
+    if caption_cache_dir is None:
+        return None
+    if mode == 'train':
+        captions = [ann['caption'] for ann in dataset[mode].annotation]
+    else:
+        captions = dataset[mode].text
+    return TokenizedCaptions.load_or_build(caption_cache_dir, captions, tokenizer, max_txt_len, txt_processor=txt_processor)
+
+
+def get_dataloader(dataset,  vis_processor, tokenizer, txt_processor=None, mode='train', batch_size=1, caption_cache_dir=None, max_txt_len=35, unique_image_batches=False, **loader_kwargs):
+    captions = get_tokenized_captions(
+        dataset, mode, tokenizer, txt_processor=txt_processor, caption_cache_dir=caption_cache_dir, max_txt_len=max_txt_len
+    )
     if mode == 'train':
+        if unique_image_batches:
+            image_ids = [dataset[mode].img_ids[ann['image_id']] for ann in dataset[mode].annotation]
+            batching = {'batch_sampler': UniqueClassBatchSampler(image_ids, batch_size)}
+        else:
+            batching = {'batch_size': batch_size, 'shuffle': True}
         return DataLoader(
-            dataset[mode], 
-            batch_size=batch_size, 
-            collate_fn=coco_collate_func,
-            shuffle=True
+            dataset[mode] if captions is None else IndexedDataset(dataset[mode]), 
+            collate_fn=CocoCollator(vis_processor, tokenizer, txt_processor=txt_processor, captions=captions, max_txt_len=max_txt_len),
+            **batching,
+            **loader_kwargs
         ) 
     else:
         cur_dataset = EvalDataset(
             dataset[mode], 
             vis_processor=vis_processor,
             txt_processor=txt_processor,
-            tokenizer=tokenizer
+            tokenizer=tokenizer,
+            max_txt_len=max_txt_len
         )
         return  DataLoader(
             cur_dataset,
             batch_size=batch_size, 
-            collate_fn=lambda batch: coco_eval_collate_func(batch, vis_processor=vis_processor, tokenizer=tokenizer),
-            shuffle=False
+            collate_fn=CocoEvalCollator(vis_processor, tokenizer, captions=captions, max_txt_len=max_txt_len),
+            shuffle=False,
+            **loader_kwargs
         ), cur_dataset.img2txt, cur_dataset.txt2img 
 
-def get_loaders(batch_size, dataset, vis_processor, tokenizer, txt_processor=None, eval_batch_size = 20):
+def get_loaders(batch_size, dataset, vis_processor, tokenizer, txt_processor=None, eval_batch_size = 20, caption_cache_dir=None, max_txt_len=35, unique_image_batches=False, **loader_kwargs):
     train_loader  = get_dataloader(
         dataset=dataset,
         batch_size=batch_size,
@@ -267,10 +400,14 @@ def get_loaders(batch_size, dataset, vis_processor, tokenizer, txt_processor=Non
         txt_processor=txt_processor,
         tokenizer=tokenizer,
         mode='train',
+        caption_cache_dir=caption_cache_dir,
+        max_txt_len=max_txt_len,
+        unique_image_batches=unique_image_batches,
+        **loader_kwargs
     ) 
     if eval_batch_size == 1:
-        test_loader = EvalDataset(dataset['test'], vis_processor=vis_processor,txt_processor=txt_processor, tokenizer=tokenizer, use_tokenizer=True)
-        val_loader = EvalDataset(dataset['val'], vis_processor=vis_processor,txt_processor=txt_processor, tokenizer=tokenizer, use_tokenizer=True)
+        test_loader = EvalDataset(dataset['test'], vis_processor=vis_processor,txt_processor=txt_processor, tokenizer=tokenizer, use_tokenizer=True, max_txt_len=max_txt_len)
+        val_loader = EvalDataset(dataset['val'], vis_processor=vis_processor,txt_processor=txt_processor, tokenizer=tokenizer, use_tokenizer=True, max_txt_len=max_txt_len)
         return  train_loader, val_loader, test_loader, test_loader.img2txt, test_loader.txt2img, val_loader.img2txt, val_loader.txt2img
     else:
         test_loader, test_img2txt, test_txt2img  = get_dataloader(
@@ -280,6 +417,9 @@ def get_loaders(batch_size, dataset, vis_processor, tokenizer, txt_processor=Non
             txt_processor=txt_processor,
             tokenizer=tokenizer,
             mode='test',
+            caption_cache_dir=caption_cache_dir,
+            max_txt_len=max_txt_len,
+            **loader_kwargs
         ) 
         val_loader, val_img2txt, val_txt2img  = get_dataloader(
             dataset=dataset,
@@ -288,13 +428,16 @@ def get_loaders(batch_size, dataset, vis_processor, tokenizer, txt_processor=Non
             txt_processor=txt_processor,
             tokenizer=tokenizer,
             mode='val',
+            caption_cache_dir=caption_cache_dir,
+            max_txt_len=max_txt_len,
+            **loader_kwargs
         ) 
     return train_loader, val_loader, test_loader, test_img2txt, test_txt2img, val_img2txt, val_txt2img
 
 
-def get_fused_loaders(dataset, vis_processors, tokenizers, txt_processors=None):
-    train_loader = get_fused_dataloader(dataset, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, batch_size=40, mode='train') 
-    test_loader= get_fused_dataloader(dataset, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, batch_size=1, mode='test') 
-    val_loader= get_fused_dataloader(dataset, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, batch_size=1, mode='val') 
+def get_fused_loaders(dataset, vis_processors, tokenizers, txt_processors=None, max_txt_len=35, **loader_kwargs):
+    train_loader = get_fused_dataloader(dataset, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, batch_size=40, mode='train', max_txt_len=max_txt_len, **loader_kwargs) 
+    test_loader= get_fused_dataloader(dataset, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, batch_size=1, mode='test', max_txt_len=max_txt_len) 
+    val_loader= get_fused_dataloader(dataset, vis_processors=vis_processors, tokenizers=tokenizers, txt_processors=txt_processors, batch_size=1, mode='val', max_txt_len=max_txt_len) 
  
     return train_loader, val_loader, test_loader
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Packs the images of a LAVIS retrieval dataset into a few large memory-mapped
+shards, so training and evaluation stop opening and decoding one small JPEG
+per sample on the (network) filesystem.
+
+Two shard formats are supported:
+    - bytes (default): encoded image bytes in one flat uint8 array plus offsets,
+      the original files (default, the processors see exactly the same images as
+      with the image folders) or re-encoded JPEGs with the shorter side resized
+      to `size`, aspect ratio kept.
+    - raw: uint8 arrays `(n, size, size, 3)` read back without decoding. Every
+      image is center cropped (or squashed) to a square first, so this changes the
+      model inputs: random resized crops only see the center, BLIP's squash gets
+      cropped images and every image is resized twice.
+
+    python -m utils.image_shards --dataset coco_retrieval --vis_path /coco/images \
+        --out /mnt/data/image_shards/coco
+
+and train with `--image_shard_dir /mnt/data/image_shards`.
+"""
+import io
+import json
+import os
+
+import numpy as np
+from PIL import Image
+from torch.utils.data import Dataset
+from tqdm.auto import tqdm
+
+from utils.cache_utils import save_npy
+
+RAW = 'raw'
+BYTES = 'bytes'
+
+
+def resize_image(image:Image.Image, size:int, resize_mode='crop'):
+    """`crop`: shorter side to size then center crop (CLIP style), `squash`: plain resize to size x size (BLIP style)."""
+    if resize_mode == 'squash':
+        return image.resize((size, size), Image.BICUBIC)
+    scale = size / min(image.size)
+    width, height = max(size, round(image.width * scale)), max(size, round(image.height * scale))
+    image = image.resize((width, height), Image.BICUBIC)
+    left, top = (width - size) // 2, (height - size) // 2
+    return image.crop((left, top, left + size, top + size))
+
+
+def encode_image(path:str, size:int=None, quality=95):
+    if size is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    image = Image.open(path).convert('RGB')
+    if min(image.size) > size:
+        scale = size / min(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def pack_images(image_paths, vis_root, out_dir, image_format=BYTES, image_size=None, resize_mode='crop', shard_size=4096):
+    """
+    Writes `shard_{i:05d}.npy` files plus an `index.json` that maps every image
+    path (relative to `vis_root`, as stored in the LAVIS annotations) to its shard
+    and position.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    image_paths = sorted(set(image_paths))
+    index = {}
+    for shard_id, start in enumerate(tqdm(range(0, len(image_paths), shard_size))):
+        paths = image_paths[start:start + shard_size]
+        shard_path = os.path.join(out_dir, f'shard_{shard_id:05d}.npy')
+        if image_format == RAW:
+            shard = np.empty((len(paths), image_size, image_size, 3), dtype=np.uint8)
+            for i, path in enumerate(paths):
+                image = Image.open(os.path.join(vis_root, path)).convert('RGB')
+                shard[i] = np.asarray(resize_image(image, image_size, resize_mode))
+                index[path] = [shard_id, i]
+            save_npy(shard_path, shard)
+        else:
+            encoded = [encode_image(os.path.join(vis_root, path), image_size) for path in paths]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(data) for data in encoded], out=offsets[1:])
+            save_npy(shard_path, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+            for i, path in enumerate(paths):
+                index[path] = [shard_id, int(offsets[i]), int(offsets[i + 1])]
+    with open(os.path.join(out_dir, 'index.json'), 'w') as f:
+        json.dump({'format': image_format, 'image_size': image_size, 'resize_mode': resize_mode, 'images': index}, f)
+
+
+class ImageShards:
+    """Read side of `pack_images`. Shards are memory-mapped lazily in every worker process."""
+
+    def __init__(self, root:str):
+        self.root = root
+        with open(os.path.join(root, 'index.json')) as f:
+            meta = json.load(f)
+        self.format = meta['format']
+        self.index = meta['images']
+        self._shards = {}
+
+    def __getstate__(self):
+        # memmaps would be pickled as in-memory copies, reopen them in the worker instead
+        state = self.__dict__.copy()
+        state['_shards'] = {}
+        return state
+
+    def __contains__(self, path):
+        return path in self.index
+
+    def _shard(self, shard_id):
+        if shard_id not in self._shards:
+            self._shards[shard_id] = np.load(os.path.join(self.root, f'shard_{shard_id:05d}.npy'), mmap_mode='r')
+        return self._shards[shard_id]
+
+    def load(self, path:str):
+        if self.format == RAW:
+            shard_id, i = self.index[path]
+            return Image.fromarray(self._shard(shard_id)[i])
+        shard_id, start, end = self.index[path]
+        return Image.open(io.BytesIO(memoryview(self._shard(shard_id)[start:end]))).convert('RGB')
+
+
+class PackedImageDataset(Dataset):
+    """
+    Wraps a LAVIS retrieval dataset (train or eval split) and serves its images
+    from `ImageShards` instead of the image folder. Samples keep the wrapped
+    dataset's keys, other attributes (`img2txt`, `text`, ...) are forwarded.
+    """
+
+    def __init__(self, dataset, shards:ImageShards):
+        self.dataset = dataset
+        self.shards = shards
+        self.is_eval = hasattr(dataset, 'img2txt')
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getattr__(self, name):
+        if name in ('dataset', 'shards', 'is_eval'):
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __getitem__(self, index):
+        ann = self.dataset.annotation[index]
+        image = self.dataset.vis_processor(self.shards.load(ann['image']))
+        if self.is_eval:
+            return {'image': image, 'index': index}
+        return {
+            'image': image,
+            'text_input': self.dataset.text_processor(ann['caption']),
+            'image_id': self.dataset.img_ids[ann['image_id']],
+        }
+
+
+def wrap_with_shards(dataset, shard_root:str, dataset_name:str):
+    """Replaces every split of a LAVIS dataset dict by a `PackedImageDataset` reading `{shard_root}/{dataset_name}`."""
+    if shard_root is None:
+        return dataset
+    shards = ImageShards(os.path.join(shard_root, dataset_name))
+    return {split: PackedImageDataset(split_dataset, shards) for split, split_dataset in dataset.items()}
+
+
+if __name__ == '__main__':
+    import argparse
+    from lavis.datasets.builders import load_dataset
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', default='coco_retrieval', help='LAVIS dataset name, e.g. coco_retrieval or flickr30k')
+    parser.add_argument('--vis_path', required=True)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--format', default=BYTES, choices=[RAW, BYTES], help='raw crops / squashes every image to a square, see the module docstring')
+    parser.add_argument('--image_size', type=int, default=-1, help='raw: side of the stored images, bytes: max shorter side (-1 keeps the original files)')
+    parser.add_argument('--resize_mode', default='crop', choices=['crop', 'squash'], help='raw only')
+    parser.add_argument('--shard_size', type=int, default=4096)
+    args = parser.parse_args()
+    if args.format == RAW and args.image_size < 0:
+        parser.error('--format raw needs a fixed --image_size')
+
+    dataset = load_dataset(args.dataset, vis_path=args.vis_path, cfg_path=None)
+    image_paths = [ann['image'] for split in dataset.values() for ann in split.annotation]
+    pack_images(
+        image_paths,
+        vis_root=args.vis_path,
+        out_dir=args.out,
+        image_format=args.format,
+        image_size=None if args.image_size < 0 else args.image_size,
+        resize_mode=args.resize_mode,
+        shard_size=args.shard_size,
+    )
@@ -2,13 +2,69 @@ import torch
 import torch.nn.functional as F
 import numpy as np
 
+RANK_CHUNK_SIZE = 1024
+
+
+def _to_tensor(x):
+    if isinstance(x, torch.Tensor):
+        return x.detach()
+    return torch.as_tensor(np.asarray(x))
+
+
+def pad_gt_index(gt_lists, pad_value=-1):
+    # list of ground-truth index lists (ragged) -> (N, G) LongTensor padded with pad_value
+    max_len = max(len(gt) for gt in gt_lists)
+    gt_index = torch.full((len(gt_lists), max_len), pad_value, dtype=torch.long)
+    for row, gt in enumerate(gt_lists):
+        gt_index[row, :len(gt)] = torch.as_tensor(list(gt), dtype=torch.long)
+    return gt_index
+
+
+def gt_ranks(scores, gt_index, chunk_size=RANK_CHUNK_SIZE):
+    """
+    Rank of the best ground truth of every row, computed in row chunks.
+
+    The rank is the number of scores that strictly beat the highest scoring
+    ground truth of the row, which is the position of that ground truth in a
+    descending sort (ties are resolved in favour of the ground truth).
+
+    Args:
+        scores: `(N, M)` score matrix (tensor or array).
+        gt_index: `(N,)` or `(N, G)` column indices of the ground truths,
+            rows with fewer than G ground truths are padded with negative values.
+        chunk_size: number of rows compared at once, bounds the `(chunk, M)`
+            temporaries.
+
+    Returns:
+        `(N,)` float tensor of ranks, rows without any ground truth get 1e20.
+    """
+    scores = _to_tensor(scores)
+    gt_index = _to_tensor(gt_index).long().to(scores.device)
+    if gt_index.dim() == 1:
+        gt_index = gt_index.unsqueeze(1)
+    valid = gt_index >= 0
+
+    ranks = torch.empty(scores.shape[0], dtype=torch.float64, device=scores.device)
+    for start in range(0, scores.shape[0], chunk_size):
+        end = min(start + chunk_size, scores.shape[0])
+        chunk = scores[start:end]
+        chunk_valid = valid[start:end]
+        gt_scores = chunk.gather(1, gt_index[start:end].clamp_min(0))
+        gt_scores = gt_scores.masked_fill(~chunk_valid, float('-inf'))
+        best_gt = gt_scores.max(dim=1, keepdim=True).values
+        chunk_ranks = (chunk > best_gt).sum(dim=1).double()
+        ranks[start:end] = chunk_ranks.masked_fill_(~chunk_valid.any(dim=1), 1e20)
+    return ranks.cpu()
+
+
+def recall_at_k(ranks, ks=(1, 5, 10), scale=1.0):
+    return tuple(scale * (ranks < k).double().mean().item() for k in ks)
 
 
 def evaluate_recall(sims_t2i:torch.Tensor, mode='val'):
 
-    sims_t2i = sims_t2i.numpy()
     recall_t2i = t2i(sims_t2i)
-    recall_i2t = i2t(sims_t2i.T)
+    recall_i2t = i2t(_to_tensor(sims_t2i).T)
     
     r1i, r5i, r10i = recall_i2t
     r1t, r5t, r10t = recall_t2i
@@ -25,98 +81,155 @@ def evaluate_recall(sims_t2i:torch.Tensor, mode='val'):
     }
     return output 
 
-def itm_t2i(itm_t2i_logits:torch.Tensor, targets:torch.Tensor):
-    n_text = len(itm_t2i_logits)
-    itm_t2i_logits  = itm_t2i_logits.cpu().detach().numpy()
-    targets = targets.cpu().detach().numpy()
-    ranks = np.zeros(n_text)
-    
-    for index in range(int(n_text/5)):
-        for i in range(5):
-            if index in targets[5 * index + i]:
-                inds = np.argsort(itm_t2i_logits[5 * index + i])[::-1]
-                target = np.take(targets[5 * index + i], inds)
-                ranks[5 * index + i] = np.where(target == index)[0][0]
-            else:
-                ranks[5 * index + i] = 1e20 
-    # Compute metrics
-    r1 = 1.0 * len(np.where(ranks < 1)[0]) / len(ranks)
-    r5 = 1.0 * len(np.where(ranks < 5)[0]) / len(ranks)
-    r10 = 1.0 * len(np.where(ranks < 10)[0]) / len(ranks)
-    return r1, r5, r10
-
-
-def i2t(sims_i2t):
+def itm_t2i(itm_t2i_logits:torch.Tensor, targets:torch.Tensor, chunk_size=RANK_CHUNK_SIZE):
+    # logits (n_caps, k) over candidate images targets (n_caps, k), caption 5*i+j belongs to image i
+    itm_t2i_logits = _to_tensor(itm_t2i_logits)
+    targets = _to_tensor(targets).to(itm_t2i_logits.device)
+    n_text = (len(itm_t2i_logits) // 5) * 5
+    itm_t2i_logits, targets = itm_t2i_logits[:n_text], targets[:n_text]
+    gt_image = torch.arange(n_text, device=targets.device).div(5, rounding_mode='floor')
+    is_gt = targets == gt_image.unsqueeze(1)
+    # candidates that are not the ground truth image are masked out of the gt lookup
+    gt_index = torch.where(is_gt, torch.arange(targets.shape[1], device=targets.device), -1)
+    ranks = gt_ranks(itm_t2i_logits, gt_index, chunk_size=chunk_size)
+    return recall_at_k(ranks)
+
+
+def i2t(sims_i2t, chunk_size=RANK_CHUNK_SIZE):
     # sims (n_imgs, n_caps)
     n_imgs, _ = sims_i2t.shape
-    ranks = np.zeros(n_imgs)
-    for index in range(n_imgs):
-        inds = np.argsort(sims_i2t[index])[::-1]
-        rank = 1e20
-        for i in range(5 * index, 5 * index + 5, 1):
-            tmp = np.where(inds == i)[0][0]
-            if tmp < rank:
-                rank = tmp
-        ranks[index] = rank
+    gt_index = 5 * torch.arange(n_imgs).unsqueeze(1) + torch.arange(5)
+    ranks = gt_ranks(sims_i2t, gt_index, chunk_size=chunk_size)
+    return recall_at_k(ranks)
 
-    # Compute metrics
-    r1 = 1.0 * len(np.where(ranks < 1)[0]) / len(ranks)
-    r5 = 1.0 * len(np.where(ranks < 5)[0]) / len(ranks)
-    r10 = 1.0 * len(np.where(ranks < 10)[0]) / len(ranks)
-    return r1, r5, r10
 
 
-
-def t2i(sims_t2i):
+def t2i(sims_t2i, chunk_size=RANK_CHUNK_SIZE):
     # sims (n_caps, n_imgs)
-    _, n_imgs = sims_t2i.shape
-    ranks = np.zeros(5*n_imgs)
     # --> (5N(caption), N(image))
-    for index in range(n_imgs):
-        for i in range(5):
-            inds = np.argsort(sims_t2i[5 * index + i])[::-1]
-            # print(index)
-            ranks[5 * index + i] = np.where(inds == index)[0][0]
-            # print(np.where(inds == index))
+    _, n_imgs = sims_t2i.shape
+    sims_t2i = _to_tensor(sims_t2i)[:5 * n_imgs]
+    gt_index = torch.arange(n_imgs).repeat_interleave(5)
+    ranks = gt_ranks(sims_t2i, gt_index, chunk_size=chunk_size)
+    return recall_at_k(ranks)
+
+def report_metrics(scores_i2t:torch.Tensor, scores_t2i:torch.Tensor, txt2img, img2txt, mode='val', chunk_size=RANK_CHUNK_SIZE):
+    # Images->Text
+    img2txt_index = pad_gt_index([img2txt[index] for index in range(scores_i2t.shape[0])])
+    ranks = gt_ranks(scores_i2t, img2txt_index, chunk_size=chunk_size)
+    tr1, tr5, tr10 = recall_at_k(ranks, scale=100.0)
 
+    # Text->Images
+    txt2img_index = torch.as_tensor([txt2img[index] for index in range(scores_t2i.shape[0])], dtype=torch.long)
+    ranks = gt_ranks(scores_t2i, txt2img_index, chunk_size=chunk_size)
+    ir1, ir5, ir10 = recall_at_k(ranks, scale=100.0)
+
+    output = {
+        f'{mode}/r1_i2t': tr1,
+        f'{mode}/r5_i2t': tr5,
+        f'{mode}/r10_i2t': tr10,
+        f'{mode}/r_i2t': tr1 + tr5 + tr10,
+        f'{mode}/r1_t2i': ir1,
+        f'{mode}/r5_t2i': ir5,
+        f'{mode}/r10_t2i': ir10,
+        f'{mode}/r_t2i': ir1 + ir5 + ir10,
+        f'{mode}/r_all': tr1 + tr5 + tr10 + ir1 + ir5 + ir10,
+    }
+    return output
 
-    # Compute metrics
-    r1 = 1.0 * len(np.where(ranks < 1)[0]) / len(ranks)
-    r5 = 1.0 * len(np.where(ranks < 5)[0]) / len(ranks)
-    r10 = 1.0 * len(np.where(ranks < 10)[0]) / len(ranks)
-    return r1, r5, r10
 
-def report_metrics(scores_i2t:torch.Tensor, scores_t2i:torch.Tensor, txt2img, img2txt, mode='val'):
-    scores_i2t = scores_i2t.numpy()
-    scores_t2i = scores_t2i.numpy()
+class TopKAccumulator:
+    """
+    Streams similarity tiles into running top-k indices for both directions
+    of a `(N, M)` similarity matrix that is never materialized.
+    """
+
+    def __init__(self, n_rows, n_cols, k=10, device='cpu'):
+        self.k = k
+        self.row_values = torch.full((n_rows, min(k, n_cols)), float('-inf'), device=device)
+        self.row_index = torch.full((n_rows, min(k, n_cols)), -1, dtype=torch.long, device=device)
+        self.col_values = torch.full((n_cols, min(k, n_rows)), float('-inf'), device=device)
+        self.col_index = torch.full((n_cols, min(k, n_rows)), -1, dtype=torch.long, device=device)
+
+    @staticmethod
+    def _merge(values, index, tile, offset):
+        k = values.shape[1]
+        tile_index = torch.arange(offset, offset + tile.shape[1], device=tile.device).expand_as(tile)
+        values = torch.cat([values, tile], dim=1)
+        index = torch.cat([index, tile_index], dim=1)
+        values, pos = values.topk(k, dim=1)
+        return values, index.gather(1, pos)
+
+    def update(self, tile, row_start, col_start):
+        tile = tile.float().to(self.row_values.device)
+        row_end, col_end = row_start + tile.shape[0], col_start + tile.shape[1]
+        self.row_values[row_start:row_end], self.row_index[row_start:row_end] = self._merge(
+            self.row_values[row_start:row_end], self.row_index[row_start:row_end], tile, col_start
+        )
+        self.col_values[col_start:col_end], self.col_index[col_start:col_end] = self._merge(
+            self.col_values[col_start:col_end], self.col_index[col_start:col_end], tile.T, row_start
+        )
+
+
+def tiled_topk(sim_func, row_embeds, col_embeds, tile_size=1024, k=10, device=None):
+    """
+    Evaluates `sim_func(row_embeds, col_embeds)` tile by tile and keeps only
+    the top-k of every row and every column, so peak memory is bounded by
+    `tile_size x tile_size` instead of `N x M`.
+
+    Args:
+        sim_func: pairwise similarity, `(n, ...), (m, ...) -> (n, m)`.
+        row_embeds: `(N, ...)` embeddings, may live on CPU.
+        col_embeds: `(M, ...)` embeddings, may live on CPU.
+        tile_size: rows / columns per tile.
+        k: number of neighbours kept per row and column.
+        device: device the tiles are evaluated on, defaults to the embeddings' device.
+
+    Returns:
+        `TopKAccumulator` holding row (N, k) and column (M, k) top-k indices.
+    """
+    device = row_embeds.device if device is None else device
+    accumulator = TopKAccumulator(len(row_embeds), len(col_embeds), k=k, device=device)
+    with torch.no_grad():
+        for row_start in range(0, len(row_embeds), tile_size):
+            rows = row_embeds[row_start:row_start + tile_size].to(device)
+            for col_start in range(0, len(col_embeds), tile_size):
+                cols = col_embeds[col_start:col_start + tile_size].to(device)
+                accumulator.update(sim_func(rows, cols), row_start, col_start)
+    return accumulator
+
+
+def topk_ranks(topk_index, gt_index):
+    """
+    Rank of the first ground truth inside each row's top-k list, rows whose
+    ground truths all fall outside the top-k get rank k.
+    """
+    topk_index = _to_tensor(topk_index)
+    gt_index = _to_tensor(gt_index).long().to(topk_index.device)
+    if gt_index.dim() == 1:
+        gt_index = gt_index.unsqueeze(1)
+    hits = (topk_index.unsqueeze(-1) == gt_index.unsqueeze(1)) & (gt_index >= 0).unsqueeze(1)
+    hits = hits.any(dim=-1)
+    ranks = hits.int().argmax(dim=1).double()
+    return ranks.masked_fill_(~hits.any(dim=1), topk_index.shape[1]).cpu()
+
+
+def tiled_report_metrics(sim_func, image_embeds, text_embeds, txt2img, img2txt, mode='val', tile_size=1024, device=None):
+    """
+    Same output as `report_metrics`, but the image-text similarity matrix is
+    streamed tile by tile (`sim_func(image_tile, text_tile)`, shape
+    `(n_images, n_texts)`) into a top-10 accumulator.
+    """
+    accumulator = tiled_topk(sim_func, image_embeds, text_embeds, tile_size=tile_size, k=10, device=device)
 
     # Images->Text
-    ranks = np.zeros(scores_i2t.shape[0])
-    for index, score in enumerate(scores_i2t):
-        inds = np.argsort(score)[::-1]
-        # Score
-        rank = 1e20
-        for i in img2txt[index]:
-            tmp = np.where(inds == i)[0][0]
-            if tmp < rank:
-                rank = tmp
-        ranks[index] = rank
-
-    # Compute metrics
-    tr1 = 100.0 * len(np.where(ranks < 1)[0]) / len(ranks)
-    tr5 = 100.0 * len(np.where(ranks < 5)[0]) / len(ranks)
-    tr10 = 100.0 * len(np.where(ranks < 10)[0]) / len(ranks)
+    img2txt_index = pad_gt_index([img2txt[index] for index in range(len(image_embeds))])
+    tr1, tr5, tr10 = recall_at_k(topk_ranks(accumulator.row_index, img2txt_index), scale=100.0)
 
     # Text->Images
-    ranks = np.zeros(scores_t2i.shape[0])
-    for index, score in enumerate(scores_t2i):
-        inds = np.argsort(score)[::-1]
-        ranks[index] = np.where(inds == txt2img[index])[0][0]
-
-    # Compute metrics
-    ir1 = 100.0 * len(np.where(ranks < 1)[0]) / len(ranks)
-    ir5 = 100.0 * len(np.where(ranks < 5)[0]) / len(ranks)
-    ir10 = 100.0 * len(np.where(ranks < 10)[0]) / len(ranks)
+    txt2img_index = torch.as_tensor([txt2img[index] for index in range(len(text_embeds))], dtype=torch.long)
+    ir1, ir5, ir10 = recall_at_k(topk_ranks(accumulator.col_index, txt2img_index), scale=100.0)
+
     output = {
         f'{mode}/r1_i2t': tr1,
         f'{mode}/r5_i2t': tr5,
@@ -129,4 +242,3 @@ def report_metrics(scores_i2t:torch.Tensor, scores_t2i:torch.Tensor, txt2img, im
         f'{mode}/r_all': tr1 + tr5 + tr10 + ir1 + ir5 + ir10,
     }
     return output
-